@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Enregistre les signaux (cache des appartenances, index de recherche)
+        from . import signals
+        # Vérifications de la configuration (cache partagé)
+        from . import caches  # noqa: F401
+
+        post_migrate.connect(signals.search_index_installed, sender=self)
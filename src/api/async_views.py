@@ -0,0 +1,142 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+from .renderers import FastJSONRenderer
+from .views import ProjectViewSet, IssueViewSet, CommentViewSet
+
+
+class AsyncReadView(View):
+    """
+    Liste et détail en asynchrone, à servir par softdesk.asgi.
+    La configuration du ModelViewSet `viewset_class` est réutilisée
+    (authentification, permissions, portée, filtres, tri, pagination,
+    serializer, ETag) : les réponses sont les mêmes qu'en synchrone,
+    en JSON uniquement. Les lectures passent par l'ORM asynchrone
+    (acount, aaggregate, aiterator, aget) ; les querysets des vues
+    chargent déjà leurs relations, la sérialisation ne fait donc
+    aucune requête
+    """
+    viewset_class = None
+    replica_reads = True
+
+    async def get(self, request, pk=None):
+        if not settings.ASYNC_READ_VIEWS:
+            raise Http404
+        action = 'list' if pk is None else 'retrieve'
+        viewset = self.viewset_class(
+            action_map={'get': action},
+            renderer_classes=[FastJSONRenderer],
+            args=(),
+            kwargs={} if pk is None else {'pk': str(pk)},
+        )
+        drf_request = viewset.initialize_request(request)
+        viewset.request = drf_request
+        viewset.headers = viewset.default_response_headers
+        try:
+            await self.aauthenticate(drf_request)
+            # Utilisateur déjà authentifié : négociation et permissions
+            # sans requête SQL
+            viewset.initial(drf_request)
+            if pk is None:
+                response = await self.alist(viewset)
+            else:
+                response = await self.aretrieve(viewset, pk)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        response = viewset.finalize_response(drf_request, response)
+        return response.render()
+
+    async def aauthenticate(self, request):
+        """
+        Request._authenticate de DRF, avec aauthenticate pour les
+        authentifications qui le proposent (voir api.authentication) :
+        l'utilisateur est lu sans passer par un thread
+        """
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(
+                        request
+                        )
+                else:
+                    user_auth_tuple = await sync_to_async(
+                        authenticator.authenticate
+                        )(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def alist(self, viewset):
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        # Comme en synchrone : pas d'agrégat d'ETag en mode curseur
+        uses_cursor = getattr(viewset, 'uses_cursor_pagination', None)
+        conditional = not (uses_cursor and uses_cursor())
+        if conditional:
+            etag, last_modified = await viewset.alist_version(queryset)
+            if viewset.not_modified(etag, last_modified):
+                return viewset.set_version_headers(
+                    Response(status=status.HTTP_304_NOT_MODIFIED),
+                    etag,
+                    last_modified
+                )
+
+        paginator = viewset.paginator
+        page = await paginator.apaginate_queryset(
+            queryset, viewset.request, viewset
+            )
+        serializer = viewset.get_serializer(page, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        if conditional:
+            viewset.set_version_headers(response, etag, last_modified)
+        return response
+
+    async def aget_object(self, viewset, pk):
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        try:
+            instance = await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                f'No {queryset.model._meta.object_name} '
+                'matches the given query.'
+            )
+        viewset.check_object_permissions(viewset.request, instance)
+        return instance
+
+    async def aretrieve(self, viewset, pk):
+        instance = await self.aget_object(viewset, pk)
+        etag, last_modified = viewset.object_version(instance)
+        return viewset.conditional_response(
+            etag,
+            last_modified,
+            lambda: Response(viewset.get_serializer(instance).data)
+        )
+
+
+class AsyncProjectView(AsyncReadView):
+    viewset_class = ProjectViewSet
+
+    async def aretrieve(self, viewset, pk):
+        # Même cache et même réponse que ProjectViewSet.retrieve ; le
+        # cache et la sérialisation du projet chargé ne font aucune
+        # requête SQL
+        response, versions = viewset.cached_detail(pk)
+        if response is None:
+            instance = await self.aget_object(viewset, pk)
+            response = viewset.detail_response(pk, instance, versions)
+        return response
+
+
+class AsyncIssueView(AsyncReadView):
+    viewset_class = IssueViewSet
+
+
+class AsyncCommentView(AsyncReadView):
+    viewset_class = CommentViewSet
@@ -0,0 +1,223 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken
+)
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .caches import cache_is_shared
+
+
+# Claim portant la version du compte au moment de l'émission du jeton
+USER_VERSION_CLAIM = 'user_version'
+
+
+def _version_key(user_id):
+    return f'api:user-version:{user_id}'
+
+
+def get_user_version(user_id):
+    # Une version recréée (après éviction) ne reprend jamais une
+    # ancienne valeur : les jetons émis avant repassent par la base
+    key = _version_key(user_id)
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def bump_user_version(user_id):
+    """
+    Invalide les jetons émis pour un utilisateur (modification du
+    compte, désactivation, mot de passe, suppression) : ils sont de
+    nouveau vérifiés en base jusqu'au prochain rafraîchissement
+    """
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def add_user_claims(token, user):
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token[USER_VERSION_CLAIM] = get_user_version(user.pk)
+    return token
+
+
+def claims_match(token, user):
+    return (
+        token.get('username') == user.username
+        and token.get('is_staff') == user.is_staff
+        and token.get('is_superuser') == user.is_superuser
+    )
+
+
+class StatelessUser(TokenUser):
+    """
+    TokenUser dont l'id a le type de la clé primaire de User
+    (le claim est une chaîne), pour comparer directement aux
+    clés étrangères et aux appartenances
+    """
+
+    @cached_property
+    def id(self):
+        return get_user_model()._meta.pk.to_python(
+            self.token[api_settings.USER_ID_CLAIM]
+            )
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Authentification JWT sans lecture de l'utilisateur en base :
+    request.user est un StatelessUser construit à partir des claims (id,
+    username, is_staff), tant que la version du compte portée par le
+    jeton est la version actuelle. Sinon (compte modifié, version
+    inconnue), l'utilisateur est relu et vérifié en base (compte actif,
+    mot de passe inchangé) comme avec JWTAuthentication.
+    Les vues et permissions ne comparent donc que des clés primaires.
+    Sans cache partagé (voir api.caches), un compte modifié ne serait
+    invalidé que dans un processus : l'utilisateur est alors toujours
+    relu en base
+    """
+
+    def get_user(self, validated_token):
+        if cache_is_shared():
+            user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+            current = cache.get(_version_key(user_id))
+            if self.is_current(validated_token, current):
+                return StatelessUser(validated_token)
+
+        user = self.checked_user(
+            validated_token,
+            self.user_model.objects.filter(
+                **self.user_lookup(validated_token)
+                ).first()
+        )
+        if self.version_lost(validated_token, user):
+            cache.add(
+                _version_key(user.pk),
+                validated_token[USER_VERSION_CLAIM],
+                None
+            )
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        authenticate pour les vues asynchrones (voir api.async_views) :
+        même vérification, par le cache et l'ORM asynchrones
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if cache_is_shared():
+            user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+            current = await cache.aget(_version_key(user_id))
+            if self.is_current(validated_token, current):
+                return StatelessUser(validated_token)
+
+        user = self.checked_user(
+            validated_token,
+            await self.user_model.objects.filter(
+                **self.user_lookup(validated_token)
+                ).afirst()
+        )
+        if self.version_lost(validated_token, user):
+            await cache.aadd(
+                _version_key(user.pk),
+                validated_token[USER_VERSION_CLAIM],
+                None
+            )
+        return user
+
+    def is_current(self, validated_token, current):
+        version = validated_token.get(USER_VERSION_CLAIM)
+        return (
+            version is not None
+            and validated_token.get(api_settings.USER_ID_CLAIM) is not None
+            and current == version
+        )
+
+    def version_lost(self, validated_token, user):
+        # Version perdue (redémarrage du cache) : le jeton vient
+        # d'être vérifié en base, sa version redevient la référence
+        return (
+            cache_is_shared()
+            and validated_token.get(USER_VERSION_CLAIM) is not None
+            and claims_match(validated_token, user)
+        )
+
+    def user_lookup(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            ) from e
+        return {api_settings.USER_ID_FIELD: user_id}
+
+    def checked_user(self, validated_token, user):
+        """
+        Vérifications de JWTAuthentication.get_user sur l'utilisateur
+        lu en base : existe, actif, mot de passe inchangé
+        """
+        if user is None:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found'
+                )
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+                )
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code='password_changed'
+            )
+        return user
+
+
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    """
+    Ajoute aux jetons les claims lus par StatelessJWTAuthentication
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    """
+    Le jeton d'accès rafraîchi reprend les claims et la version
+    actuels du compte, après vérification en base (compte actif,
+    mot de passe inchangé)
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = JWTAuthentication().get_user(refresh)
+        data = super().validate(attrs)
+        access = add_user_claims(AccessToken(data['access']), user)
+        data['access'] = str(access)
+        return data
@@ -0,0 +1,257 @@
+import math
+from contextlib import ExitStack
+from time import perf_counter
+from django.db import connections, transaction
+from django.test import Client
+from .models import Project, Contributor, Issue, Comment
+from .datasets import SYNTHETIC_PASSWORD, generate_dataset
+from .instrumentation import RequestMetrics
+from api_user.models import User, DeletionJob
+
+
+# Endpoints mesurés : (nom de la route, méthode, chemin, corps).
+# Les chemins et corps reçoivent les ids du jeu de données :
+# project (projet du premier utilisateur), issue, comment de ce
+# projet, contributor / member (un autre contributeur du projet),
+# outsider (utilisateur qui n'en est pas contributeur), job (suppression
+# en attente d'un autre utilisateur)
+ENDPOINTS = [
+    ('api-root', 'get', '/api/', None),
+    ('project-list', 'get', '/api/projects/', None),
+    ('project-list', 'post', '/api/projects/', lambda ids: {
+        'title': 'Projet', 'description': 'Description', 'type': 'iOS',
+    }),
+    ('project-detail', 'get', '/api/projects/{project}/', None),
+    ('project-detail', 'patch', '/api/projects/{project}/', lambda ids: {
+        'title': 'Projet renommé',
+    }),
+    ('project-detail', 'delete', '/api/projects/{project}/', None),
+    (
+        'project-project-summary', 'get',
+        '/api/projects/project_summary/', None
+    ),
+    ('project-cache-stats', 'get', '/api/projects/cache_stats/', None),
+    ('project-export', 'get', '/api/projects/{project}/export/', None),
+    ('contributor-list', 'get', '/api/contributors/', None),
+    ('contributor-list', 'post', '/api/contributors/', lambda ids: {
+        'user_id': ids['outsider'], 'project_id': ids['project'],
+    }),
+    ('contributor-detail', 'get', '/api/contributors/{contributor}/', None),
+    (
+        'contributor-detail', 'delete',
+        '/api/contributors/{contributor}/', None
+    ),
+    ('contributor-bulk', 'post', '/api/contributors/bulk/', lambda ids: {
+        'project_id': ids['project'], 'user_ids': [ids['outsider']],
+    }),
+    (
+        'contributor-remove-contributor', 'delete',
+        '/api/contributors/remove_contributor/',
+        lambda ids: {'user_id': ids['member'], 'project_id': ids['project']}
+    ),
+    ('issue-list', 'get', '/api/issues/', None),
+    ('issue-list', 'get', '/api/issues/?fields=id,title,status', None),
+    ('issue-list', 'post', '/api/issues/', lambda ids: {
+        'title': 'Issue', 'description': 'Description',
+        'project_id': ids['project'], 'status': 'TO_DO',
+        'priority': 'LOW', 'tag': 'BUG',
+    }),
+    ('issue-detail', 'get', '/api/issues/{issue}/', None),
+    # IssueSerializer et CommentSerializer valident le projet / l'issue :
+    # ils sont donc renvoyés même en PATCH
+    ('issue-detail', 'patch', '/api/issues/{issue}/', lambda ids: {
+        'project_id': ids['project'], 'status': 'FINISHED',
+    }),
+    ('issue-detail', 'delete', '/api/issues/{issue}/', None),
+    ('issue-bulk', 'post', '/api/issues/bulk/', lambda ids: [
+        {
+            'title': f'Issue {index}', 'description': 'Description',
+            'project_id': ids['project'], 'status': 'TO_DO',
+            'priority': 'LOW', 'tag': 'BUG',
+        }
+        for index in range(50)
+    ]),
+    ('issue-bulk', 'patch', '/api/issues/bulk/', lambda ids: [
+        {'id': ids['issue'], 'status': 'IN_PROGRESS'},
+    ]),
+    ('comment-list', 'get', '/api/comments/', None),
+    (
+        'comment-list', 'get',
+        '/api/comments/?fields=id,description,issue_link', None
+    ),
+    ('comment-list', 'post', '/api/comments/', lambda ids: {
+        'description': 'Commentaire', 'issue_id': ids['issue'],
+    }),
+    ('comment-detail', 'get', '/api/comments/{comment}/', None),
+    ('comment-detail', 'patch', '/api/comments/{comment}/', lambda ids: {
+        'description': 'Commentaire modifié', 'issue_id': ids['issue'],
+    }),
+    ('comment-detail', 'delete', '/api/comments/{comment}/', None),
+    ('api-root', 'get', '/api_user/', None),
+    ('user-list', 'get', '/api_user/users/', None),
+    ('user-list', 'post', '/api_user/users/', lambda ids: {
+        'username': 'benchmark', 'password': SYNTHETIC_PASSWORD, 'age': 30,
+    }),
+    ('user-detail', 'get', '/api_user/users/{outsider}/', None),
+    ('user-detail', 'patch', '/api_user/users/{outsider}/', lambda ids: {
+        'age': 31,
+    }),
+    (
+        'user-delete-user', 'delete',
+        '/api_user/users/{outsider}/delete_user/', None
+    ),
+    ('deletionjob-detail', 'get', '/api_user/deletion_jobs/{job}/', None),
+]
+
+
+def router_routes():
+    """
+    Noms des routes des routers de api/urls.py et api_user/urls.py
+    """
+    from . import urls
+    from api_user import urls as user_urls
+    return {
+        pattern.name
+        for router in (urls.router, user_urls.router)
+        for pattern in router.urls
+    }
+
+
+def endpoint_key(method, path):
+    return f'{method.upper()} {path}'
+
+
+def percentile(values, rank):
+    # Rang le plus proche, sur des valeurs triées
+    index = max(0, math.ceil(rank / 100 * len(values)) - 1)
+    return values[index]
+
+
+def dataset_ids(owner):
+    project = Project.objects.filter(
+        author_id=owner
+        ).order_by('id').first()
+    issue = Issue.objects.filter(project_id=project).order_by('id').first()
+    contributor = Contributor.objects.filter(
+        project_id=project
+        ).exclude(user_id=owner).order_by('id').first()
+    outsider = User.objects.exclude(
+        contributor__project_id=project
+        ).order_by('id').first()
+    return {
+        'project': project.id,
+        'issue': issue.id,
+        'comment': Comment.objects.filter(
+            issue_id=issue
+            ).order_by('id').first().id,
+        'contributor': contributor.id,
+        'member': contributor.user_id_id,
+        'outsider': outsider.id,
+    }
+
+
+def measure(client, method, path, data, headers, repeat):
+    """
+    Exécute `repeat` fois la requête, après une requête de mise en
+    température non mesurée. Chaque requête est annulée (savepoint) :
+    les écritures ne modifient pas le jeu de données. Retourne le
+    statut, les durées (s) et le nombre de requêtes SQL de la dernière
+    requête
+    """
+    durations = []
+    for _ in range(repeat + 1):
+        metrics = RequestMetrics()
+        with transaction.atomic(), ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(metrics.record_query)
+                    )
+            start = perf_counter()
+            if data is None:
+                response = getattr(client, method)(path, **headers)
+            else:
+                response = getattr(client, method)(
+                    path, data, content_type='application/json', **headers
+                    )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            durations.append(perf_counter() - start)
+            transaction.set_rollback(True)
+    return response.status_code, sorted(durations[1:]), metrics.queries
+
+
+def run_benchmark(sizes, repeat, seed=0, host='localhost'):
+    """
+    Génère un jeu de données de taille `sizes` puis mesure chaque
+    endpoint de ENDPOINTS, authentifié en JWT avec le premier
+    utilisateur. Les données restent en base : à appeler dans une
+    transaction annulée ensuite
+    """
+    dataset = generate_dataset(seed=seed, prefix='benchmark', **sizes)
+    owner = dataset.pop('owner')
+    ids = dataset_ids(owner)
+    ids['job'] = DeletionJob.objects.create(user_id=ids['member']).pk
+
+    client = Client(SERVER_NAME=host, raise_request_exception=False)
+    token = client.post('/api/token/', {
+        'username': owner.username, 'password': SYNTHETIC_PASSWORD,
+    }).json()['access']
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    endpoints = {}
+    for route, method, path, body in ENDPOINTS:
+        status, durations, queries = measure(
+            client,
+            method,
+            path.format(**ids),
+            None if body is None else body(ids),
+            headers,
+            repeat
+        )
+        endpoints[endpoint_key(method, path)] = {
+            'route': route,
+            'status': status,
+            'p50_ms': round(percentile(durations, 50) * 1000, 2),
+            'p95_ms': round(percentile(durations, 95) * 1000, 2),
+            'p99_ms': round(percentile(durations, 99) * 1000, 2),
+            'queries': queries,
+        }
+    return {'dataset': dataset, 'endpoints': endpoints}
+
+
+def compare(baseline, results, tolerance, min_ms=2.0):
+    """
+    Régressions par rapport à la référence, pour les tailles et
+    endpoints présents des deux côtés : statut différent, requêtes SQL
+    en plus, ou médiane (p50, plus stable que p95 d'une exécution à
+    l'autre) plus lente de plus de `tolerance` (0.5 = +50 %) et d'au
+    moins `min_ms` ms
+    """
+    regressions = []
+    for scale, result in results.items():
+        reference = baseline.get(scale, {}).get('endpoints', {})
+        for key, current in result['endpoints'].items():
+            before = reference.get(key)
+            if before is None:
+                continue
+            label = f'[{scale}] {key}'
+            if current['status'] != before['status']:
+                regressions.append(
+                    f"{label} : statut {before['status']} -> "
+                    f"{current['status']}"
+                )
+            if current['queries'] > before['queries']:
+                regressions.append(
+                    f"{label} : {before['queries']} -> "
+                    f"{current['queries']} requêtes SQL"
+                )
+            limit = max(
+                before['p50_ms'] * (1 + tolerance),
+                before['p50_ms'] + min_ms
+            )
+            if current['p50_ms'] > limit:
+                regressions.append(
+                    f"{label} : p50 {before['p50_ms']} -> "
+                    f"{current['p50_ms']} ms"
+                )
+    return regressions
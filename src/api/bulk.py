@@ -0,0 +1,142 @@
+from collections import Counter
+from django.db import transaction
+from django.utils import timezone
+from .models import Contributor, Issue, Change
+from .counters import adjust_project, reconcile_counters
+from .membership import invalidate_membership
+from .response_cache import bump_project_version
+from .changes import record_changes
+from api_user.models import User
+
+
+def add_contributors(project_id, user_ids):
+    """
+    Ajoute plusieurs contributeurs à un projet : une requête IN pour
+    valider les utilisateurs, une pour les contributeurs existants,
+    puis une seule insertion. Retourne le résultat pour chaque id
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    known = set(
+        User.objects.filter(id__in=user_ids).values_list('id', flat=True)
+    )
+    already = set(
+        Contributor.objects.filter(project_id=project_id, user_id__in=user_ids)
+        .values_list('user_id', flat=True)
+    )
+
+    results = []
+    added = []
+    for user_id in user_ids:
+        if user_id not in known:
+            results.append({'user_id': user_id, 'status': 'not_found'})
+        elif user_id in already:
+            results.append(
+                {'user_id': user_id, 'status': 'already_contributor'}
+                )
+        else:
+            results.append({'user_id': user_id, 'status': 'added'})
+            added.append(user_id)
+
+    with transaction.atomic():
+        Contributor.objects.bulk_create(
+            [
+                Contributor(user_id_id=user_id, project_id_id=project_id)
+                for user_id in added
+            ],
+            ignore_conflicts=True
+        )
+        # ignore_conflicts ne renvoie pas les ids : relecture pour le journal
+        if added:
+            record_changes(
+                Change.Model.CONTRIBUTOR,
+                Contributor.objects.filter(
+                    project_id=project_id, user_id__in=added
+                    ),
+                Change.Action.CREATED
+            )
+            adjust_project(project_id, contributors=len(added), touch=True)
+
+    # bulk_create n'envoie pas post_save : invalidation manuelle
+    for user_id in added:
+        invalidate_membership(user_id)
+    if added:
+        bump_project_version(project_id)
+    return results
+
+
+def remove_contributors(project_id, user_ids):
+    """
+    Retire plusieurs contributeurs d'un projet : une lecture puis une
+    seule suppression. Les signaux de suppression regroupent leurs
+    mises à jour (tombstones, compteur, version du projet) pour tout
+    le lot, voir api.cascade. Retourne le résultat pour chaque id
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    with transaction.atomic():
+        contributors = Contributor.objects.filter(
+            project_id=project_id, user_id__in=user_ids
+            )
+        removed = set(contributors.values_list('user_id', flat=True))
+        if removed:
+            contributors.delete()
+    return [
+        {
+            'user_id': user_id,
+            'status': 'removed' if user_id in removed else 'not_contributor'
+        }
+        for user_id in user_ids
+    ]
+
+
+def create_issues(items, batch_size):
+    """
+    Crée des issues par lots de `batch_size` lignes
+    dans une seule transaction
+    """
+    issues = [Issue(**item) for item in items]
+    counts = Counter(issue.project_id_id for issue in issues)
+    with transaction.atomic():
+        issues = Issue.objects.bulk_create(issues, batch_size=batch_size)
+        record_changes(Change.Model.ISSUE, issues, Change.Action.CREATED)
+        for project_id, count in counts.items():
+            adjust_project(project_id, issues=count, activity=True)
+    # bulk_create n'envoie pas post_save : invalidation manuelle
+    for project_id in counts:
+        bump_project_version(project_id)
+    return issues
+
+
+def update_issues(issues, items, batch_size):
+    """
+    Met à jour des issues existantes (`issues` : dictionnaire id -> Issue)
+    par lots de `batch_size` lignes. Seuls les champs fournis sont écrits
+    """
+    project_ids = {issue.project_id_id for issue in issues.values()}
+    fields = set()
+    for item in items:
+        issue = issues[item['id']]
+        for name, value in item.items():
+            if name != 'id':
+                setattr(issue, name, value)
+                fields.add(name)
+
+    if fields:
+        # bulk_update ne met pas à jour les champs auto_now
+        now = timezone.now()
+        for issue in issues.values():
+            issue.updated_at = now
+        fields.add('updated_at')
+        with transaction.atomic():
+            Issue.objects.bulk_update(
+                issues.values(), fields, batch_size=batch_size
+                )
+            record_changes(
+                Change.Model.ISSUE, issues.values(), Change.Action.UPDATED
+                )
+            # Projets d'origine et de destination des issues déplacées
+            project_ids |= {issue.project_id_id for issue in issues.values()}
+            if 'project_id_id' in fields:
+                reconcile_counters(project_ids=project_ids, issue_ids=[])
+        for project_id in project_ids:
+            bump_project_version(project_id)
+    return [issues[item['id']] for item in items]
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core import checks
+
+# Backends dont les entrées sont vues par tous les processus (et
+# toutes les machines) qui servent l'application
+SHARED_CACHE_BACKENDS = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django.core.cache.backends.db.DatabaseCache',
+}
+
+
+def cache_is_shared():
+    """
+    Le cache par défaut est-il partagé entre les processus ? Les
+    invalidations (version des comptes, appartenances) n'atteignent
+    sinon que le processus qui les a faites. SHARED_CACHE force la
+    réponse (None : déduite du backend)
+    """
+    shared = getattr(settings, 'SHARED_CACHE', None)
+    if shared is not None:
+        return bool(shared)
+    return settings.CACHES['default']['BACKEND'] in SHARED_CACHE_BACKENDS
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    warnings = []
+    if (
+        getattr(settings, 'SHARED_CACHE', None)
+        and backend not in SHARED_CACHE_BACKENDS
+    ):
+        warnings.append(checks.Warning(
+            f'SHARED_CACHE est actif mais le cache par défaut ({backend}) '
+            "n'est pas un cache partagé connu",
+            hint=(
+                'Avec plusieurs processus, un jeton révoqué reste accepté '
+                'par les autres processus. Utilisez Redis ou Memcached, '
+                'ou retirez SHARED_CACHE'
+            ),
+            id='api.W001',
+        ))
+    if (
+        getattr(settings, 'MEMBERSHIP_CACHE_TIMEOUT', None)
+        and not cache_is_shared()
+    ):
+        warnings.append(checks.Warning(
+            'MEMBERSHIP_CACHE_TIMEOUT est ignoré : le cache par défaut '
+            f"({backend}) n'est pas partagé entre les processus",
+            hint=(
+                'Un contributeur retiré garderait son accès dans les '
+                'autres processus. Utilisez Redis ou Memcached, ou '
+                'mettez MEMBERSHIP_CACHE_TIMEOUT à 0'
+            ),
+            id='api.W002',
+        ))
+    return warnings
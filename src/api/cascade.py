@@ -0,0 +1,161 @@
+from collections import Counter
+from contextvars import ContextVar
+from .changes import record_tombstones
+from .counters import adjust_project, adjust_issue
+from .models import Project, Issue, Comment, Change
+from .response_cache import bump_project_version
+
+# Suppression en cours dans ce thread (ou cette tâche asynchrone)
+_current = ContextVar('api_cascade_deletion', default=None)
+
+
+class CascadeDeletion:
+    """
+    Une suppression Django (Model.delete, QuerySet.delete, action
+    d'administration, suppression d'un utilisateur...) et ses cascades.
+    Django envoie pre_delete pour tous les objets collectés avant le
+    premier post_delete : la suppression connaît donc tous les projets
+    et issues supprimés avec elle, quelle que soit son origine. Les
+    compteurs des projets et issues restants, les versions des projets
+    et les tombstones du journal sont écrits en une fois, après le
+    dernier post_delete
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.pending = 0
+        self.projects = set()
+        self.issues = set()
+        self.project_deltas = {}
+        self.touched = set()
+        self.issue_comments = Counter()
+        # Projet de chaque issue, pour les commentaires supprimés
+        self.issue_projects = {}
+        self.comment_issues = set()
+        self.versions = set()
+        self.tombstones = []
+
+    def project_delta(self, project_id):
+        return self.project_deltas.setdefault(project_id, Counter())
+
+    def collect(self, instance):
+        # pre_delete
+        self.pending += 1
+        if isinstance(instance, Project):
+            self.projects.add(instance.pk)
+        elif isinstance(instance, Issue):
+            self.issues.add(instance.pk)
+            self.issue_projects[instance.pk] = instance.project_id_id
+        elif isinstance(instance, Comment):
+            self.comment_issues.add(instance.issue_id_id)
+
+    def comment_project_id(self, comment):
+        """
+        Projet d'un commentaire supprimé : une seule requête pour tous
+        les commentaires de la suppression (leurs issues sont encore en
+        base, Django supprime les commentaires avant elles)
+        """
+        if Comment.issue_id.is_cached(comment):
+            return comment.issue_id.project_id_id
+        issue_id = comment.issue_id_id
+        if issue_id not in self.issue_projects:
+            missing = (self.comment_issues | {issue_id}) - set(
+                self.issue_projects
+            )
+            self.issue_projects.update(
+                Issue.objects.filter(pk__in=missing).values_list(
+                    'pk', 'project_id'
+                )
+            )
+        return self.issue_projects.get(issue_id)
+
+    def deleted(self, model, object_id, project_id, user_id=None):
+        self.tombstones.append((model, object_id, project_id, user_id))
+        if project_id is not None:
+            self.versions.add(project_id)
+
+    def project_deleted(self, instance):
+        self.deleted(Change.Model.PROJECT, instance.pk, instance.pk)
+
+    def contributor_deleted(self, instance):
+        project_id = instance.project_id_id
+        self.deleted(
+            Change.Model.CONTRIBUTOR,
+            instance.pk,
+            project_id,
+            instance.user_id_id
+        )
+        if project_id not in self.projects:
+            self.project_delta(project_id)['contributors'] -= 1
+            # Liste des contributeurs affichée avec le projet (ETag)
+            self.touched.add(project_id)
+
+    def issue_deleted(self, instance):
+        project_id = instance.project_id_id
+        self.deleted(Change.Model.ISSUE, instance.pk, project_id)
+        if project_id not in self.projects:
+            delta = self.project_delta(project_id)
+            delta['issues'] -= 1
+            # Ses commentaires sont décomptés ici en une fois
+            delta['comments'] -= instance.comment_count
+
+    def comment_deleted(self, instance):
+        project_id = self.comment_project_id(instance)
+        self.deleted(Change.Model.COMMENT, instance.pk, project_id)
+        # Déjà décompté si son issue est supprimée avec lui
+        if instance.issue_id_id in self.issues:
+            return
+        if project_id in self.projects:
+            return
+        self.issue_comments[instance.issue_id_id] -= 1
+        self.project_delta(project_id)['comments'] -= 1
+
+    def flush(self):
+        for issue_id, comments in self.issue_comments.items():
+            adjust_issue(issue_id, comments)
+        for project_id, delta in self.project_deltas.items():
+            adjust_project(
+                project_id,
+                issues=delta['issues'],
+                comments=delta['comments'],
+                contributors=delta['contributors'],
+                touch=project_id in self.touched
+            )
+        for project_id in self.versions:
+            bump_project_version(project_id)
+        if self.tombstones:
+            record_tombstones(self.tombstones)
+
+
+def deletion_started(instance, origin):
+    """
+    pre_delete : rattache l'objet à la suppression en cours, ou en
+    commence une nouvelle
+    """
+    deletion = _current.get()
+    if deletion is None or deletion.origin is not origin or (
+        deletion.pending == 0
+    ):
+        deletion = CascadeDeletion(origin)
+        _current.set(deletion)
+    deletion.collect(instance)
+    return deletion
+
+
+def current_deletion(instance, origin):
+    """
+    post_delete : suppression commencée par le pre_delete de l'objet
+    (ou suppression de ce seul objet, si elle n'a pas été vue)
+    """
+    deletion = _current.get()
+    if deletion is not None and deletion.origin is origin:
+        return deletion
+    return deletion_started(instance, origin)
+
+
+def deletion_finished(deletion):
+    # post_delete : après le dernier objet, mises à jour groupées
+    deletion.pending -= 1
+    if deletion.pending == 0:
+        _current.set(None)
+        deletion.flush()
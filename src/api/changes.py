@@ -0,0 +1,160 @@
+from django.db.models import Q
+from .models import Project, Contributor, Issue, Comment, Change
+from .events import publish_on_commit
+
+
+def record_change(model, object_id, project_id, action, user_id=None):
+    change = Change.objects.create(
+        model=model,
+        object_id=object_id,
+        project_id=project_id,
+        user_id=user_id,
+        action=action,
+    )
+    publish_on_commit([change])
+
+
+def record_changes(model, objects, action, project_attr='project_id_id'):
+    """
+    Journalise un lot d'objets en une seule insertion
+    (bulk_create / bulk_update n'envoient pas de signaux)
+    """
+    changes = Change.objects.bulk_create([
+        Change(
+            model=model,
+            object_id=obj.pk,
+            project_id=getattr(obj, project_attr),
+            user_id=getattr(obj, 'user_id_id', None),
+            action=action,
+        )
+        for obj in objects
+    ])
+    publish_on_commit(changes)
+
+
+def record_deletions(model, rows):
+    """
+    Tombstones d'un lot de lignes supprimées sans passer par l'ORM
+    (_raw_delete n'envoie pas de signaux).
+    rows : (id, id du projet, id de l'utilisateur ou None)
+    """
+    record_tombstones(
+        (model, object_id, project_id, user_id)
+        for object_id, project_id, user_id in rows
+    )
+
+
+def record_tombstones(rows):
+    """
+    Tombstones de plusieurs modèles en une seule insertion (suppression
+    en cascade, voir api.cascade).
+    rows : (modèle, id, id du projet, id de l'utilisateur ou None)
+    """
+    changes = Change.objects.bulk_create([
+        Change(
+            model=model,
+            object_id=object_id,
+            project_id=project_id,
+            user_id=user_id,
+            action=Change.Action.DELETED,
+        )
+        for model, object_id, project_id, user_id in rows
+    ])
+    publish_on_commit(changes)
+
+
+def _load(model, ids):
+    # Objets actuels, chargés en une requête par modèle
+    if model == Change.Model.PROJECT:
+        queryset = Project.objects.select_related(
+            'author_id'
+            ).prefetch_related('contributor_id')
+    elif model == Change.Model.CONTRIBUTOR:
+        queryset = Contributor.objects.select_related('user_id', 'project_id')
+    elif model == Change.Model.ISSUE:
+        queryset = Issue.objects.select_related('author_id', 'project_id')
+    else:
+        queryset = Comment.objects.select_related('author_id', 'issue_id')
+    return queryset.in_bulk(ids)
+
+
+def joined_projects(user_id, project_ids, rows, since):
+    """
+    Projets rejoints par l'utilisateur dans ces changements, qui ont
+    un historique antérieur à `since` : le client ne l'a jamais reçu
+    et doit resynchroniser ces projets depuis 0 (?project=)
+    """
+    joined = {
+        row.project_id for row in rows
+        if row.model == Change.Model.CONTRIBUTOR
+        and row.action == Change.Action.CREATED
+        and row.user_id == user_id
+        and row.project_id in project_ids
+    }
+    if not joined:
+        return []
+    return sorted(
+        Change.objects.filter(project_id__in=joined, sequence__lte=since)
+        .order_by()
+        .values_list('project_id', flat=True)
+        .distinct()
+    )
+
+
+def changes_since(user_id, project_ids, since, limit, project_id=None):
+    """
+    Retourne (changements, curseur suivant, reste-t-il des changements,
+    projets à resynchroniser).
+
+    Seuls les changements des projets de l'utilisateur, et ceux de ses
+    propres appartenances, sont lus ; avec `project_id`, seulement
+    ceux de ce projet (resynchronisation). Plusieurs changements d'un
+    même objet sont fusionnés en un seul (le dernier). Le curseur est
+    le numéro des changements, attribué dans l'ordre des commits : une
+    transaction encore en cours ne peut pas être sautée
+    """
+    Change.objects.assign_sequences()
+    if project_id is None:
+        scope = Q(project_id__in=project_ids) | Q(user_id=user_id)
+    else:
+        scope = Q(project_id=project_id)
+    rows = list(
+        Change.objects.filter(scope, sequence__gt=since)
+        .order_by('sequence')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    cursor = rows[-1].sequence if rows else since
+    resync = []
+    if project_id is None:
+        resync = joined_projects(user_id, set(project_ids), rows, since)
+
+    latest = {}
+    for row in rows:
+        latest.pop((row.model, row.object_id), None)
+        latest[(row.model, row.object_id)] = row
+
+    ids_by_model = {}
+    for (model, object_id), row in latest.items():
+        if row.action != Change.Action.DELETED:
+            ids_by_model.setdefault(model, []).append(object_id)
+    objects = {
+        model: _load(model, ids) for model, ids in ids_by_model.items()
+    }
+
+    changes = []
+    for (model, object_id), row in latest.items():
+        obj = objects.get(model, {}).get(object_id)
+        action = row.action
+        if obj is None:
+            # Supprimé depuis : seule la tombstone est envoyée
+            action = Change.Action.DELETED
+        changes.append({
+            'cursor': row.sequence,
+            'model': model,
+            'id': object_id,
+            'project_id': row.project_id,
+            'action': action,
+            'object': obj,
+        })
+    return changes, cursor, has_more, resync
@@ -0,0 +1,164 @@
+import zlib
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Types compressés (paramètres comme charset ignorés). Le flux
+# d'événements (text/event-stream) n'en fait pas partie : la
+# compression retiendrait les messages dans le tampon. Le HTML (API
+# navigable) non plus : il contient le jeton CSRF, que la taille
+# compressée laisserait deviner (BREACH)
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+}
+
+
+def gzip_compressor(level=None):
+    # (compresse un morceau, termine le flux)
+    if level is None:
+        level = settings.COMPRESSION_GZIP_LEVEL
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def brotli_compressor(level=None):
+    if level is None:
+        level = settings.COMPRESSION_BROTLI_QUALITY
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.finish
+
+
+# Encodages disponibles, valeur de Content-Encoding -> compresseur
+CODECS = {'gzip': gzip_compressor}
+if brotli is not None:
+    CODECS['br'] = brotli_compressor
+
+
+def compress(encoding, data, level=None):
+    process, finish = CODECS[encoding](level)
+    return process(data) + finish()
+
+
+def compress_stream(encoding, chunks):
+    """
+    Compresse un flux au fil de l'eau : un morceau compressé est
+    envoyé dès que le compresseur en produit un, la mémoire reste
+    bornée quelle que soit la taille de l'export
+    """
+    process, finish = CODECS[encoding]()
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def choose_encoding(accept_encoding):
+    """
+    Encodage à utiliser d'après l'en-tête Accept-Encoding : le mieux
+    noté (q) parmi COMPRESSION_ENCODINGS disponibles, à égalité dans
+    l'ordre de préférence du réglage. None si aucun n'est accepté
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in settings.COMPRESSION_ENCODINGS:
+        if encoding not in CODECS:
+            continue
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def encoded_etag(etag, encoding):
+    # ETag fort propre à chaque encodage : "<empreinte>-gzip"
+    if etag.startswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def strip_etag_encoding(etag):
+    """
+    ETag renvoyé par le client, sans le suffixe ajouté par
+    encoded_etag : les versions compressées correspondent à la même
+    ressource
+    """
+    for encoding in CODECS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+class CompressionMiddleware:
+    """
+    Compresse les réponses (gzip, et brotli si le paquet est installé)
+    selon l'en-tête Accept-Encoding. Les réponses de moins de
+    COMPRESSION_MIN_SIZE octets ne sont pas compressées ; les réponses
+    en flux (exports) sont compressées au fil de l'eau
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '')
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.has_header('Content-Encoding')
+            or 'no-transform' in response.get('Cache-Control', '')
+            or content_type.split(';')[0].strip() not in COMPRESSIBLE_TYPES
+        ):
+            return response
+        if response.streaming:
+            if response.is_async:
+                return response
+        elif len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.headers.get('Accept-Encoding', '')
+            )
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                encoding, response.streaming_content
+                )
+            del response['Content-Length']
+        else:
+            content = compress(encoding, response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        if response.has_header('ETag'):
+            response['ETag'] = encoded_etag(response['ETag'], encoding)
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,184 @@
+from hashlib import sha1
+from django.db import router, transaction
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from .compression import strip_etag_encoding
+
+
+def request_etags(value):
+    # ETags d'un en-tête If-None-Match / If-Match, sans le suffixe
+    # d'encodage des réponses compressées (voir api.compression)
+    return [strip_etag_encoding(etag) for etag in parse_etags(value)]
+
+
+def make_etag(*parts):
+    # ETag fort : empreinte des éléments qui déterminent la réponse
+    return '"%s"' % sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    GET conditionnel et écriture optimiste pour les ModelViewSet.
+
+    - list : ETag calculé à partir de max(updated_at) et du nombre de
+      lignes, sans passer par les serializers. Retourne 304 si le
+      client a déjà cette version. Pas de Last-Modified : une
+      suppression ne l'avancerait pas, If-Modified-Since est ignoré
+    - retrieve : ETag et Last-Modified de l'objet
+    - `related_objects` : relations affichées avec l'objet (projet
+      d'une issue...), dont updated_at entre dans la version des
+      listes et du détail
+    - update / partial_update : 412 si l'en-tête If-Match ne
+      correspond plus à la version actuelle de l'objet. La ligne est
+      lue une seule fois, verrouillée (select_for_update) jusqu'à la
+      fin de l'écriture : une écriture concurrente ne peut pas se
+      glisser entre la vérification et la mise à jour
+    """
+
+    version_aggregates = {
+        'last_modified': Max('updated_at'), 'count': Count('pk')
+    }
+
+    related_objects = ()
+
+    # Objet verrouillé et vérifié par update (If-Match)
+    lock_object = False
+    checked_object = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.lock_object:
+            return queryset.select_for_update(of=('self',))
+        return queryset
+
+    def get_object(self):
+        if self.checked_object is not None:
+            return self.checked_object
+        return super().get_object()
+
+    def get_version_aggregates(self):
+        return {
+            **self.version_aggregates,
+            **{
+                f'{name}_modified': Max(f'{name}__updated_at')
+                for name in self.related_objects
+            },
+        }
+
+    def list_etag(self, version):
+        # L'URL complète couvre la page, les filtres et le tri
+        # (le nombre de lignes suit les suppressions)
+        etag = make_etag(
+            self.request.user.pk,
+            self.request.get_full_path(),
+            version['count'],
+            version['last_modified'],
+            *(version[f'{name}_modified'] for name in self.related_objects)
+        )
+        return etag, None
+
+    def list_version(self, queryset):
+        return self.list_etag(
+            queryset.aggregate(**self.get_version_aggregates())
+            )
+
+    async def alist_version(self, queryset):
+        return self.list_etag(
+            await queryset.aaggregate(**self.get_version_aggregates())
+            )
+
+    def object_version(self, obj):
+        # Relations chargées par le select_related de la vue
+        modified = [obj.updated_at] + [
+            getattr(obj, name).updated_at for name in self.related_objects
+        ]
+        return make_etag(obj.pk, *modified), max(modified)
+
+    def not_modified(self, etag, last_modified):
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = request_etags(if_none_match)
+            return '*' in etags or etag in etags
+        since = parse_http_date_safe(
+            self.request.headers.get('If-Modified-Since')
+            )
+        return (
+            since is not None
+            and last_modified is not None
+            and int(last_modified.timestamp()) <= since
+        )
+
+    def conditional_response(self, etag, last_modified, build_response):
+        if self.not_modified(etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = build_response()
+        return self.set_version_headers(response, etag, last_modified)
+
+    def set_version_headers(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # La pagination par curseur évite tout parcours de la portée
+        # complète : l'agrégat de l'ETag n'est pas calculé dans ce cas
+        uses_cursor = getattr(self, 'uses_cursor_pagination', None)
+        if uses_cursor and uses_cursor():
+            return super().list(request, *args, **kwargs)
+
+        etag, last_modified = self.list_version(
+            self.filter_queryset(self.get_queryset())
+            )
+        return self.conditional_response(
+            etag,
+            last_modified,
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+                )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.object_version(instance)
+        return self.conditional_response(
+            etag,
+            last_modified,
+            lambda: Response(self.get_serializer(instance).data)
+        )
+
+    def update(self, request, *args, **kwargs):
+        if_match = request.headers.get('If-Match')
+        if not if_match:
+            return self.updated(super().update(request, *args, **kwargs))
+
+        using = router.db_for_write(self.queryset.model)
+        with transaction.atomic(using=using):
+            self.lock_object = True
+            instance = self.get_object()
+            etag, _ = self.object_version(instance)
+            etags = request_etags(if_match)
+            if '*' not in etags and etag not in etags:
+                return Response(
+                    {
+                        'detail': (
+                            "La ressource a été modifiée depuis "
+                            "votre dernière lecture"
+                        )
+                    },
+                    status=status.HTTP_412_PRECONDITION_FAILED
+                )
+            # Mise à jour de l'objet déjà lu et verrouillé
+            self.checked_object = instance
+            response = super().update(request, *args, **kwargs)
+        return self.updated(response)
+
+    def updated(self, response):
+        if response.status_code == status.HTTP_200_OK:
+            # Nouvelle version pour le prochain If-Match
+            instance = response.data.serializer.instance
+            response['ETag'], _ = self.object_version(instance)
+        return response
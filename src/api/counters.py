@@ -0,0 +1,110 @@
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import Project, Contributor, Issue, Comment
+
+
+def _delta(field, amount):
+    # Jamais négatif, même si le compteur a dérivé
+    return Greatest(F(field) + amount, Value(0))
+
+
+def adjust_project(
+    project_id, issues=0, comments=0, contributors=0,
+    activity=False, touch=False
+):
+    """
+    Met à jour les compteurs d'un projet en une requête atomique
+    (F()), sans relire la ligne
+    """
+    updates = {}
+    if issues:
+        updates['issue_count'] = _delta('issue_count', issues)
+    if comments:
+        updates['comment_count'] = _delta('comment_count', comments)
+    if contributors:
+        updates['contributor_count'] = _delta(
+            'contributor_count', contributors
+            )
+    if activity:
+        updates['last_activity_at'] = timezone.now()
+    if touch:
+        updates['updated_at'] = timezone.now()
+    if updates:
+        Project.objects.filter(pk=project_id).update(**updates)
+
+
+def adjust_issue(issue_id, comments, activity=False):
+    updates = {'comment_count': _delta('comment_count', comments)}
+    if activity:
+        updates['last_comment_at'] = timezone.now()
+    Issue.objects.filter(pk=issue_id).update(**updates)
+
+
+def _aggregate(model, lookup, aggregate):
+    # Agrégat corrélé à la ligne mise à jour
+    return Subquery(
+        model.objects.filter(**{lookup: OuterRef('pk')})
+        .order_by()
+        .values(lookup)
+        .annotate(value=aggregate)
+        .values('value')
+    )
+
+
+def _count(model, lookup):
+    return Coalesce(_aggregate(model, lookup, Count('id')), 0)
+
+
+def _latest(first, second):
+    # Plus grande des deux dates, NULL seulement si les deux le sont
+    return Greatest(Coalesce(first, second), Coalesce(second, first))
+
+
+def reconcile_counters(project_ids=None, issue_ids=None, fix=True):
+    """
+    Recalcule les compteurs depuis les tables, en une requête
+    UPDATE ... SET = (sous-requête) par table. Sans ids, toutes les
+    lignes sont recalculées. Retourne le nombre d'issues et de
+    projets dont un compteur avait dérivé (fix=False : compte sans
+    corriger)
+    """
+    issues = Issue.objects.all()
+    if issue_ids is not None:
+        issues = issues.filter(pk__in=issue_ids)
+    projects = Project.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+
+    issue_values = {
+        'comment_count': _count(Comment, 'issue_id'),
+        'last_comment_at': _aggregate(
+            Comment, 'issue_id', Max('time_created')
+            ),
+    }
+    project_values = {
+        'issue_count': _count(Issue, 'project_id'),
+        'comment_count': _count(Comment, 'issue_id__project_id'),
+        'contributor_count': _count(Contributor, 'project_id'),
+        'last_activity_at': _latest(
+            _aggregate(Issue, 'project_id', Max('time_created')),
+            _aggregate(Comment, 'issue_id__project_id', Max('time_created')),
+        ),
+    }
+    drifted_issues = issues.alias(
+        actual_comments=issue_values['comment_count']
+        ).exclude(comment_count=F('actual_comments')).count()
+    drifted_projects = projects.alias(
+        actual_issues=project_values['issue_count'],
+        actual_comments=project_values['comment_count'],
+        actual_contributors=project_values['contributor_count'],
+    ).exclude(
+        issue_count=F('actual_issues'),
+        comment_count=F('actual_comments'),
+        contributor_count=F('actual_contributors'),
+    ).count()
+
+    if fix:
+        issues.update(**issue_values)
+        projects.update(**project_values)
+    return drifted_issues, drifted_projects
@@ -0,0 +1,181 @@
+import random
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from .models import Project, Contributor, Issue, Comment, Change
+from .changes import record_changes
+from .counters import reconcile_counters
+from api_user.models import User
+
+
+# Mot de passe commun aux utilisateurs générés
+SYNTHETIC_PASSWORD = 'Synthetic+2024'
+
+# Tailles de jeux de données : utilisateurs, projets, contributeurs
+# par projet, issues par projet, commentaires par issue
+SCALES = {
+    'small': {
+        'users': 50, 'projects': 10, 'contributors': 5,
+        'issues': 20, 'comments': 3,
+    },
+    'medium': {
+        'users': 500, 'projects': 100, 'contributors': 10,
+        'issues': 50, 'comments': 5,
+    },
+    'large': {
+        'users': 5000, 'projects': 1000, 'contributors': 20,
+        'issues': 100, 'comments': 5,
+    },
+}
+
+PROJECT_TYPES = ['back-end', 'front-end', 'iOS', 'Android']
+
+WORDS = (
+    'connexion erreur page affichage formulaire export serveur base '
+    'lenteur bouton menu compte mot passe notification paiement panier '
+    'recherche filtre tri image fichier import mobile tablette session'
+).split()
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize()
+
+
+def generate_dataset(
+    users, projects, contributors, issues, comments,
+    seed=0, prefix='synthetic'
+):
+    """
+    Crée un jeu de données réaliste par insertions en masse : chaque
+    projet a un auteur et `contributors` contributeurs (auteur
+    compris), `issues` issues écrites par ses contributeurs, et chaque
+    issue `comments` commentaires. Le premier utilisateur
+    (`<prefix>_0`, administrateur) contribue à tous les projets et est
+    l'auteur du premier. Les créations sont journalisées comme par
+    l'API (bulk_create n'envoie pas de signaux). Retourne les nombres
+    d'objets créés et le premier utilisateur
+    """
+    rng = random.Random(seed)
+    batch_size = settings.BULK_BATCH_SIZE
+    password = make_password(SYNTHETIC_PASSWORD)
+
+    with transaction.atomic():
+        user_objects = User.objects.bulk_create(
+            [
+                User(
+                    username=f'{prefix}_{index}',
+                    email=f'{prefix}_{index}@example.com',
+                    password=password,
+                    age=rng.randint(15, 70),
+                    can_be_contacted=rng.random() < 0.5,
+                    can_data_be_shared=rng.random() < 0.3,
+                    is_staff=index == 0,
+                )
+                for index in range(users)
+            ],
+            batch_size=batch_size
+        )
+        owner = user_objects[0]
+
+        project_objects = Project.objects.bulk_create(
+            [
+                Project(
+                    title=f'Projet {index} - {sentence(rng, 2)}',
+                    description=sentence(rng, 12),
+                    type=rng.choice(PROJECT_TYPES),
+                    author_id=owner if index == 0 else rng.choice(
+                        user_objects
+                        ),
+                )
+                for index in range(projects)
+            ],
+            batch_size=batch_size
+        )
+        record_changes(
+            Change.Model.PROJECT,
+            project_objects,
+            Change.Action.CREATED,
+            project_attr='pk'
+        )
+
+        members = {}
+        contributor_objects = []
+        for project in project_objects:
+            team = {project.author_id, owner}
+            size = max(len(team), min(contributors, users))
+            while len(team) < size:
+                team.add(rng.choice(user_objects))
+            members[project.pk] = list(team)
+            contributor_objects += [
+                Contributor(user_id=user, project_id=project)
+                for user in team
+            ]
+        contributor_objects = Contributor.objects.bulk_create(
+            contributor_objects, batch_size=batch_size
+            )
+        record_changes(
+            Change.Model.CONTRIBUTOR,
+            contributor_objects,
+            Change.Action.CREATED
+        )
+
+        issue_objects = Issue.objects.bulk_create(
+            [
+                Issue(
+                    title=sentence(rng, 4),
+                    description=sentence(rng, 20),
+                    author_id=rng.choice(members[project.pk]),
+                    project_id=project,
+                    status=rng.choice(Issue.Status.values),
+                    priority=rng.choice(Issue.Priority.values),
+                    tag=rng.choice(Issue.Tag.values),
+                )
+                for project in project_objects
+                for _ in range(issues)
+            ],
+            batch_size=batch_size
+        )
+        record_changes(
+            Change.Model.ISSUE, issue_objects, Change.Action.CREATED
+            )
+
+        # Par lots d'issues, pour borner la mémoire à grande échelle
+        comment_count = 0
+        for start in range(0, len(issue_objects), batch_size):
+            comment_objects = Comment.objects.bulk_create(
+                [
+                    Comment(
+                        description=sentence(rng, 15),
+                        author_id=rng.choice(members[issue.project_id_id]),
+                        issue_id=issue,
+                    )
+                    for issue in issue_objects[start:start + batch_size]
+                    for _ in range(comments)
+                ],
+                batch_size=batch_size
+            )
+            # Projet de chaque commentaire, lu par record_changes
+            for comment in comment_objects:
+                comment.project_id_id = comment.issue_id.project_id_id
+            record_changes(
+                Change.Model.COMMENT, comment_objects, Change.Action.CREATED
+                )
+            comment_count += len(comment_objects)
+
+        # bulk_create ne tient pas les compteurs à jour
+        project_ids = [project.pk for project in project_objects]
+        reconcile_counters(
+            project_ids=project_ids,
+            issue_ids=Issue.objects.filter(
+                project_id__in=project_ids
+                ).values('id')
+        )
+
+    return {
+        'owner': owner,
+        'users': len(user_objects),
+        'projects': len(project_objects),
+        'contributors': len(contributor_objects),
+        'issues': len(issue_objects),
+        'comments': comment_count,
+    }
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+from .models import Change, Contributor
+from api_user.models import User
+
+
+# Seuls ces changements sont diffusés sur le flux d'événements
+EVENT_MODELS = (Change.Model.ISSUE, Change.Model.COMMENT)
+# Changements des appartenances : l'abonné concerné relit ses projets
+MEMBERSHIP_MODELS = (Change.Model.CONTRIBUTOR,)
+
+
+def change_event(change):
+    # Le numéro du changement sert d'identifiant SSE (Last-Event-ID)
+    return {
+        'cursor': change.sequence,
+        'model': change.model,
+        'id': change.object_id,
+        'project_id': change.project_id,
+        'action': change.action,
+    }
+
+
+def membership_event(change):
+    # Interne : jamais envoyé tel quel au client
+    return {
+        'cursor': change.sequence,
+        'model': change.model,
+        'user_id': change.user_id,
+        'project_id': change.project_id,
+    }
+
+
+def broker_event(change):
+    if change.model in MEMBERSHIP_MODELS:
+        return membership_event(change)
+    return change_event(change)
+
+
+def format_event(event):
+    return (
+        f"id: {event['cursor']}\n"
+        f"event: {event['model']}.{event['action']}\n"
+        f"data: {json.dumps(event)}\n\n"
+    )
+
+
+class Subscription:
+    """
+    Abonnement d'une connexion aux événements de ses projets, et aux
+    changements d'appartenance de son utilisateur (`project_ids` est
+    alors remplacé par le flux).
+    La file est bornée : un client trop lent qui la remplit est marqué
+    `overflowed`, ses événements suivants sont abandonnés et le flux
+    lui demande de se resynchroniser
+    """
+
+    def __init__(self, user_id, project_ids, max_size):
+        self.user_id = user_id
+        self.project_ids = frozenset(project_ids)
+        self.queue = asyncio.Queue(max_size)
+        self.loop = asyncio.get_running_loop()
+        self.overflowed = False
+
+    def offer(self, event):
+        # Appelé dans la boucle d'événements de la connexion
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """
+        Retourne le prochain événement, ou None si rien n'est arrivé
+        avant `timeout` secondes ou si l'abonnement a débordé
+        """
+        if self.overflowed:
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """
+    Diffusion en mémoire, au sein d'un seul processus : les changements
+    journalisés sont publiés après le commit de leur transaction.
+    publish() peut être appelé depuis n'importe quel thread
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id, project_ids):
+        subscription = Subscription(
+            user_id, project_ids, settings.EVENT_QUEUE_SIZE
+            )
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def dispatch(self, events):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            for event in events:
+                if event['model'] in MEMBERSHIP_MODELS:
+                    wanted = event['user_id'] == subscription.user_id
+                else:
+                    wanted = event['project_id'] in subscription.project_ids
+                if wanted:
+                    subscription.loop.call_soon_threadsafe(
+                        subscription.offer, event
+                        )
+
+    def publish(self, changes):
+        changes = [
+            change for change in changes
+            if change.model in EVENT_MODELS + MEMBERSHIP_MODELS
+        ]
+        if changes:
+            assign_cursors(changes)
+            self.dispatch([broker_event(change) for change in changes])
+
+
+class ChangeLogBroker(InProcessBroker):
+    """
+    Remplaçant local d'un broker externe : lit le journal des
+    changements toutes les EVENT_POLL_INTERVAL secondes, et diffuse
+    donc aussi les changements faits par d'autres processus (autres
+    workers, commandes). Une seule lecture par processus, quel que
+    soit le nombre de connexions
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.poller = None
+
+    def publish(self, changes):
+        # Les changements seront lus dans le journal
+        pass
+
+    def subscribe(self, user_id, project_ids):
+        subscription = super().subscribe(user_id, project_ids)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.get_running_loop().create_task(self.poll())
+        return subscription
+
+    def read_changes(self, after):
+        Change.objects.assign_sequences()
+        return list(
+            Change.objects.filter(
+                sequence__gt=after,
+                model__in=EVENT_MODELS + MEMBERSHIP_MODELS
+            ).order_by('sequence')[:settings.EVENT_QUEUE_SIZE]
+        )
+
+    async def poll(self):
+        last = await sync_to_async(
+            lambda: Change.objects.aggregate(
+                last=Max('sequence')
+                )['last'] or 0
+        )()
+        while self.subscriptions:
+            await asyncio.sleep(settings.EVENT_POLL_INTERVAL)
+            changes = await sync_to_async(self.read_changes)(last)
+            if changes:
+                last = changes[-1].sequence
+                self.dispatch([broker_event(change) for change in changes])
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+
+def assign_cursors(changes):
+    """
+    Numéros (curseurs) de changements tout juste validés : ils sont
+    numérotés ici, sauf si un autre processus l'a déjà fait
+    """
+    pending = [change for change in changes if change.sequence is None]
+    if not pending:
+        return
+    sequences = Change.objects.assign_sequences(check=False)
+    missing = [change.pk for change in pending if change.pk not in sequences]
+    if missing:
+        sequences.update(
+            Change.objects.filter(pk__in=missing).values_list('id', 'sequence')
+            )
+    for change in pending:
+        change.sequence = sequences[change.pk]
+
+
+def publish_on_commit(changes):
+    """
+    Diffuse des changements journalisés une fois leur transaction
+    validée (rien n'est diffusé en cas de rollback)
+    """
+    transaction.on_commit(lambda: get_broker().publish(changes))
+
+
+def replay_events(project_ids, after):
+    """
+    Événements manqués depuis le curseur `after` (reconnexion avec
+    Last-Event-ID). Retourne (événements, trop de retard)
+    """
+    limit = settings.EVENT_QUEUE_SIZE
+    Change.objects.assign_sequences()
+    changes = list(
+        Change.objects.filter(
+            project_id__in=project_ids,
+            model__in=EVENT_MODELS,
+            sequence__gt=after,
+        ).order_by('sequence')[:limit + 1]
+    )
+    return [change_event(change) for change in changes[:limit]], (
+        len(changes) > limit
+    )
+
+
+def subscriber_projects(user_id):
+    """
+    Projets actuels de l'abonné, lus en base (et non dans le cache
+    des appartenances, invalidé après la publication), ou None si son
+    compte a été désactivé ou supprimé
+    """
+    if not User.objects.filter(pk=user_id, is_active=True).exists():
+        return None
+    return frozenset(
+        Contributor.objects.filter(user_id=user_id)
+        .values_list('project_id', flat=True)
+    )
+
+
+async def stream_events(user_id, project_ids, last_event_id=None):
+    """
+    Générateur asynchrone du flux SSE. L'abonnement est pris avant la
+    relecture des événements manqués pour n'en perdre aucun ; les
+    doublons sont ignorés grâce au curseur. Un commentaire est envoyé
+    toutes les EVENT_HEARTBEAT_SECONDS secondes pour garder la
+    connexion ouverte. En cas de débordement, un événement `overflow`
+    est envoyé puis le flux est fermé : le client se reconnecte avec
+    Last-Event-ID ou passe par /api/changes/.
+    Les projets suivis sont relus à chaque changement d'appartenance
+    de l'utilisateur reçu du broker (la désactivation d'un compte en
+    publie un par projet, voir api.signals) : un événement
+    `membership` donne les nouveaux projets suivis, et le flux est
+    fermé après un événement `revoked` si le compte est désactivé ou
+    supprimé
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(user_id, project_ids)
+    try:
+        yield 'retry: 3000\n\n'
+        cursor = 0
+        if last_event_id is not None:
+            cursor = last_event_id
+            events, lagging = await sync_to_async(replay_events)(
+                project_ids, last_event_id
+                )
+            if lagging:
+                subscription.overflowed = True
+            for event in events:
+                yield format_event(event)
+                cursor = event['cursor']
+
+        while True:
+            event = await subscription.get(settings.EVENT_HEARTBEAT_SECONDS)
+            if subscription.overflowed:
+                yield (
+                    'event: overflow\n'
+                    f'data: {json.dumps({"cursor": cursor})}\n\n'
+                )
+                return
+            if event is not None and event['model'] in MEMBERSHIP_MODELS:
+                project_ids = await sync_to_async(subscriber_projects)(
+                    user_id
+                    )
+                if project_ids is None:
+                    yield 'event: revoked\ndata: {}\n\n'
+                    return
+                if project_ids != subscription.project_ids:
+                    subscription.project_ids = project_ids
+                    data = json.dumps({'project_ids': sorted(project_ids)})
+                    yield f'event: membership\ndata: {data}\n\n'
+            if event is None:
+                yield ': keepalive\n\n'
+            elif event['model'] in MEMBERSHIP_MODELS:
+                continue
+            elif event['project_id'] not in subscription.project_ids:
+                # Reçu avant le retrait du projet
+                continue
+            elif event['cursor'] > cursor:
+                yield format_event(event)
+                cursor = event['cursor']
+    finally:
+        broker.unsubscribe(subscription)
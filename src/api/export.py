@@ -0,0 +1,87 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from .models import Issue, Comment
+
+
+# Nombre de lignes lues par aller-retour avec la base
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    'type',
+    'id',
+    'issue_id',
+    'title',
+    'description',
+    'author_id',
+    'author_name',
+    'status',
+    'priority',
+    'tag',
+    'time_created',
+]
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_rows(project_id):
+    """
+    Parcourt les issues puis les commentaires d'un projet sous forme
+    de dictionnaires (values()), sans instancier de modèles
+    """
+    issues = (
+        Issue.objects.filter(project_id=project_id)
+        .order_by('time_created', 'id')
+        .values(
+            'id', 'title', 'description', 'author_id', 'status',
+            'priority', 'tag', 'time_created',
+            author_name=F('author_id__username'),
+        )
+    )
+    for row in issues.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {'type': 'issue', **row}
+
+    comments = (
+        Comment.objects.filter(issue_id__project_id=project_id)
+        .order_by('time_created', 'id')
+        .values(
+            'id', 'issue_id', 'description', 'author_id', 'time_created',
+            author_name=F('author_id__username'),
+        )
+    )
+    for row in comments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {'type': 'comment', **row}
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _Echo:
+    # Le writer csv écrit dans cet objet, qui renvoie la ligne produite
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        row['time_created'] = row['time_created'].isoformat()
+        yield writer.writerow(row)
+
+
+def stream_export(project_id, output):
+    """
+    Retourne un générateur de lignes NDJSON ou CSV
+    pour l'export d'un projet
+    """
+    rows = export_rows(project_id)
+    if output == 'csv':
+        return stream_csv(rows)
+    return stream_ndjson(rows)
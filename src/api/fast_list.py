@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.core.exceptions import FieldError
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+from .instrumentation import timed_serialization
+
+# Champs dont to_representation retourne la valeur lue en base
+# telle quelle : aucune conversion par ligne
+RAW_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+)
+
+# Champs dont to_representation accepte la valeur lue en base
+CONVERTED_FIELDS = (
+    serializers.DateField,
+    serializers.UUIDField,
+)
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation, avec le fuseau et le format
+    résolus une seule fois (et non par ligne)
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    if field_timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return to_representation
+
+
+class RowMapping:
+    """
+    Correspondance précompilée entre les lignes de values() et la
+    sortie d'un serializer : (nom du champ, colonne, conversion ou
+    None) pour chaque champ, dans l'ordre du serializer
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.paths = list(dict.fromkeys(path for _, path, _ in columns))
+
+    def __call__(self, row):
+        data = {}
+        for name, path, convert in self.columns:
+            value = row[path]
+            if convert is not None and value is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+
+def compile_row_mapping(serializer):
+    """
+    RowMapping des champs du serializer (après ?fields= / ?expand=),
+    ou None si un champ ne peut pas être lu depuis une colonne.
+    Les SerializerMethodField sont acceptés s'ils sont déclarés dans
+    Meta.column_fields = {champ: (colonne, méthode du serializer)}
+    """
+    column_fields = getattr(serializer.Meta, 'column_fields', {})
+    columns = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in column_fields:
+                return None
+            path, method = column_fields[name]
+            columns.append((name, path, getattr(serializer, method)))
+            continue
+        if field.source == '*':
+            return None
+        path = '__'.join(field.source_attrs)
+        if isinstance(field, serializers.MultipleChoiceField):
+            return None
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            # values() lit directement la clé étrangère
+            if field.pk_field is not None:
+                return None
+            columns.append((name, path, None))
+        elif isinstance(field, serializers.DateTimeField):
+            columns.append((name, path, datetime_converter(field)))
+        elif isinstance(field, RAW_FIELDS):
+            columns.append((name, path, None))
+        elif isinstance(field, CONVERTED_FIELDS):
+            columns.append((name, path, field.to_representation))
+        else:
+            return None
+    return RowMapping(columns)
+
+
+class FastListMixin:
+    """
+    Listes servies sans instancier d'objets ni parcourir les champs du
+    serializer par ligne : la page est lue avec values() et convertie
+    par un RowMapping. La réponse est identique à celle du serializer
+    (mêmes champs, même ordre, mêmes formats). Utilisé pour les
+    réponses JSON quand FAST_LIST_RESPONSES est actif ; sinon (API
+    navigable, champ non pris en charge) la liste classique est servie
+    """
+    # Colonnes lues par la pagination par curseur
+    fast_list_paths = ['id', 'time_created']
+
+    def get_row_mapping(self):
+        if not settings.FAST_LIST_RESPONSES:
+            return None
+        if not isinstance(self.request.accepted_renderer, JSONRenderer):
+            return None
+        return compile_row_mapping(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        mapping = self.get_row_mapping()
+        if mapping is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            rows = queryset.values(
+                *dict.fromkeys(mapping.paths + self.fast_list_paths)
+                )
+        except FieldError:
+            # Source qui n'est pas une colonne (propriété du modèle...)
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(rows)
+        with timed_serialization():
+            data = [mapping(row) for row in (rows if page is None else page)]
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
@@ -0,0 +1,70 @@
+from django.db.models import Case, When
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+def choice_rank(field, choices):
+    """
+    Rang d'un champ à choix, dans l'ordre de déclaration des choix
+    (LOW < MEDIUM < HIGH) et non dans l'ordre alphabétique des codes
+    """
+    return Case(
+        *[
+            When(**{field: value}, then=rank)
+            for rank, value in enumerate(choices.values)
+        ]
+    )
+
+
+class QueryParamFilter(BaseFilterBackend):
+    """
+    Filtres par paramètres de requête déclarés sur la vue dans
+    `filter_params` : {paramètre: (lookup, champ DRF)}.
+    La valeur est validée par le champ DRF (erreur 400 si invalide).
+    Un lookup `__in` accepte plusieurs valeurs séparées par des virgules
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        errors = {}
+        for param, (lookup, field) in view.filter_params.items():
+            value = request.query_params.get(param)
+            if value in (None, ''):
+                continue
+            try:
+                if lookup.endswith('__in'):
+                    filters[lookup] = [
+                        field.run_validation(item)
+                        for item in value.split(',')
+                        ]
+                else:
+                    filters[lookup] = field.run_validation(value)
+            except serializers.ValidationError as error:
+                errors[param] = error.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return queryset.filter(**filters)
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """
+    ?ordering= de DRF, où les champs déclarés sur la vue dans
+    `ordering_ranks` ({champ: expression}, voir choice_rank) sont
+    triés par leur rang
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        ranks = getattr(view, 'ordering_ranks', {})
+        terms = []
+        for term in ordering:
+            rank = ranks.get(term.lstrip('-'))
+            if rank is None:
+                terms.append(term)
+            elif term.startswith('-'):
+                terms.append(rank.desc())
+            else:
+                terms.append(rank.asc())
+        return queryset.order_by(*terms)
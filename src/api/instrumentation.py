@@ -0,0 +1,271 @@
+import hmac
+import logging
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden, Http404
+
+
+logger = logging.getLogger('api.performance')
+
+# Mesures de la requête en cours (None hors requête)
+_metrics = ContextVar('api_request_metrics', default=None)
+
+# Bornes (s) de l'histogramme des durées de requête
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialization_time = 0.0
+        self.statements = Counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - start
+            self.queries += 1
+            # Requêtes identiques aux paramètres près : signature du N+1
+            self.statements[sql] += 1
+
+
+class MetricsRegistry:
+    """
+    Cumul des mesures par vue et action, depuis le démarrage du
+    processus (chaque worker a le sien)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, duration, metrics, size, flagged):
+        with self.lock:
+            stats = self.views.setdefault(view, {
+                'count': 0,
+                'duration': 0.0,
+                'buckets': [0] * len(DURATION_BUCKETS),
+                'queries': 0,
+                'sql_time': 0.0,
+                'serialization_time': 0.0,
+                'response_bytes': 0,
+                'nplusone': 0,
+            })
+            stats['count'] += 1
+            stats['duration'] += duration
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][index] += 1
+            stats['queries'] += metrics.queries
+            stats['sql_time'] += metrics.sql_time
+            stats['serialization_time'] += metrics.serialization_time
+            stats['response_bytes'] += size or 0
+            stats['nplusone'] += flagged
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def prometheus(self):
+        with self.lock:
+            views = {view: dict(stats) for view, stats in self.views.items()}
+        lines = [
+            '# HELP softdesk_request_duration_seconds Durée des requêtes',
+            '# TYPE softdesk_request_duration_seconds histogram',
+        ]
+        for view, stats in sorted(views.items()):
+            for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+                lines.append(
+                    'softdesk_request_duration_seconds_bucket'
+                    f'{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines += [
+                'softdesk_request_duration_seconds_bucket'
+                f'{{view="{view}",le="+Inf"}} {stats["count"]}',
+                'softdesk_request_duration_seconds_sum'
+                f'{{view="{view}"}} {stats["duration"]:.6f}',
+                'softdesk_request_duration_seconds_count'
+                f'{{view="{view}"}} {stats["count"]}',
+            ]
+        counters = [
+            ('queries', 'softdesk_sql_queries_total', 'Requêtes SQL', 'd'),
+            ('sql_time', 'softdesk_sql_seconds_total', 'Temps SQL', '.6f'),
+            (
+                'serialization_time',
+                'softdesk_serialization_seconds_total',
+                'Temps de sérialisation',
+                '.6f',
+            ),
+            (
+                'response_bytes',
+                'softdesk_response_bytes_total',
+                'Taille des réponses',
+                'd',
+            ),
+            (
+                'nplusone',
+                'softdesk_nplusone_requests_total',
+                'Requêtes au-delà de PERF_QUERY_THRESHOLD requêtes SQL',
+                'd',
+            ),
+        ]
+        for key, name, help_text, spec in counters:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for view, stats in sorted(views.items()):
+                lines.append(f'{name}{{view="{view}"}} {stats[key]:{spec}}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def view_label(view_func, request):
+    # Vue DRF : classe et action (viewsets) ou méthode HTTP
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is not None:
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    view_class = getattr(view_func, 'view_class', None)
+    if view_class is not None:
+        return f'{view_class.__name__}.{request.method.lower()}'
+    return getattr(view_func, '__name__', 'unknown')
+
+
+class PerformanceMiddleware:
+    """
+    Mesure chaque requête : durée totale, nombre et durée des requêtes
+    SQL (execute_wrapper sur toutes les bases), temps de
+    sérialisation (InstrumentedViewMixin) et taille de la réponse.
+    Les mesures sont renvoyées dans l'en-tête Server-Timing, cumulées
+    par vue pour /api/metrics/, et une requête qui dépasse
+    PERF_QUERY_THRESHOLD requêtes SQL est signalée (en-tête
+    X-Query-Threshold-Exceeded et journal `api.performance`)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(
+                            metrics.record_query
+                            )
+                    )
+                response = self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        duration = perf_counter() - start
+
+        size = None if response.streaming else len(response.content)
+        threshold = settings.PERF_QUERY_THRESHOLD
+        flagged = threshold is not None and metrics.queries > threshold
+        if flagged:
+            statement, repeated = metrics.statements.most_common(1)[0]
+            response['X-Query-Threshold-Exceeded'] = (
+                f'{metrics.queries} > {threshold}'
+                )
+            logger.warning(
+                '%s : %d requêtes SQL (seuil %d), dont %d fois : %s',
+                metrics.view or request.path, metrics.queries, threshold,
+                repeated, statement
+            )
+        if metrics.view is not None:
+            registry.observe(metrics.view, duration, metrics, size, flagged)
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'total;dur={duration * 1000:.1f}, '
+                f'db;dur={metrics.sql_time * 1000:.1f};'
+                f'desc="{metrics.queries} queries", '
+                f'serialize;dur={metrics.serialization_time * 1000:.1f}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _metrics.get()
+        if metrics is not None:
+            metrics.view = view_label(view_func, request)
+
+
+@contextmanager
+def timed_serialization():
+    # Temps compté comme sérialisation dans Server-Timing
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _metrics.get()
+        if metrics is not None:
+            metrics.serialization_time += perf_counter() - start
+
+
+_timed_serializers = {}
+
+
+def timed_serializer_class(serializer_class):
+    """
+    Sous-classe du serializer dont to_representation est chronométré
+    (appelé par objet, y compris dans une liste many=True)
+    """
+    timed = _timed_serializers.get(serializer_class)
+    if timed is None:
+        def to_representation(self, instance):
+            with timed_serialization():
+                return super(timed, self).to_representation(instance)
+
+        timed = type(
+            serializer_class.__name__,
+            (serializer_class,),
+            {
+                '__module__': serializer_class.__module__,
+                'to_representation': to_representation,
+            }
+        )
+        _timed_serializers[serializer_class] = timed
+    return timed
+
+
+class InstrumentedViewMixin:
+    """
+    Mesure le temps de sérialisation des serializers de la vue
+    (get_serializer) pour PerformanceMiddleware
+    """
+
+    def get_serializer_class(self):
+        return timed_serializer_class(super().get_serializer_class())
+
+
+def metrics_view(request):
+    """
+    Mesures au format texte de Prometheus. Désactivé tant que
+    PERF_METRICS_TOKEN n'est pas défini ; le jeton est attendu dans
+    l'en-tête Authorization: Bearer <jeton>
+    """
+    token = settings.PERF_METRICS_TOKEN
+    if not token:
+        raise Http404
+    # Comparaison en temps constant : la durée ne révèle pas le jeton
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(
+        authorization.encode(), f'Bearer {token}'.encode()
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
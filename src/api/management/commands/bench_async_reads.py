@@ -0,0 +1,169 @@
+import asyncio
+import time
+from time import perf_counter
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from api.models import Project, Contributor, Issue, Comment
+from api_user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit des lectures synchrones (/api/...) et "
+        "asynchrones (/api/async/...) servies par l'application ASGI, "
+        "avec N requêtes simultanées. --latency simule une base distante "
+        "(délai par requête SQL). Les données créées sont supprimées "
+        "à la fin (le journal des changements garde leurs tombstones)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--issues', type=int, default=200)
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help="Délai ajouté à chaque requête SQL, en millisecondes"
+        )
+
+    def handle(self, *args, **options):
+        # Les requêtes sont servies par d'autres threads (et donc
+        # d'autres connexions) : les données doivent être validées
+        user = User.objects.create_user(username='bench_async_reads')
+        try:
+            paths = self.create_data(user, options['issues'])
+            if options['latency']:
+                self.add_latency(options['latency'] / 1000)
+            # Routes désactivées par défaut (ASYNC_READ_VIEWS)
+            with override_settings(ASYNC_READ_VIEWS=True):
+                asyncio.run(self.run(user, paths, options))
+        finally:
+            connection_created.disconnect(dispatch_uid='bench_async_reads')
+            connection.execute_wrappers.clear()
+            user.delete()
+
+    def create_data(self, user, count):
+        project = Project.objects.create(
+            title='Benchmark',
+            description='Lectures asynchrones',
+            type='back-end',
+            author_id=user
+        )
+        Contributor.objects.create(user_id=user, project_id=project)
+        Issue.objects.bulk_create([
+            Issue(
+                title=f'Issue {index}',
+                description='Description',
+                author_id=user,
+                project_id=project,
+                status=Issue.Status.TO_DO,
+                priority=Issue.Priority.LOW,
+                tag=Issue.Tag.BUG,
+            )
+            for index in range(count)
+        ])
+        issue = Issue.objects.filter(project_id=project).first()
+        Comment.objects.bulk_create([
+            Comment(description='Commentaire', author_id=user, issue_id=issue)
+            for _ in range(20)
+        ])
+        # Mélange de lectures : listes paginées et détails
+        return [
+            f'projects/{project.id}/',
+            f'issues/?project_id={project.id}',
+            f'issues/?project_id={project.id}&page=3',
+            f'issues/{issue.id}/',
+            f'comments/?issue_id={issue.id}',
+        ]
+
+    def add_latency(self, delay):
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_execute)
+
+        connection_created.connect(install, dispatch_uid='bench_async_reads')
+        connection.execute_wrappers.append(slow_execute)
+
+    async def run(self, user, paths, options):
+        application = get_asgi_application()
+        token = str(AccessToken.for_user(user))
+        for label, prefix in [('sync', '/api/'), ('async', '/api/async/')]:
+            urls = [
+                prefix + paths[index % len(paths)]
+                for index in range(options['requests'])
+            ]
+            # Échauffement (connexions, caches)
+            await self.load(application, urls[:len(paths)], token, 1)
+            start = perf_counter()
+            durations = await self.load(
+                application, urls, token, options['concurrency']
+                )
+            self.report(label, durations, perf_counter() - start)
+
+    async def load(self, application, urls, token, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(url):
+            async with semaphore:
+                start = perf_counter()
+                status = await self.call(application, url, token)
+                if status != 200:
+                    raise RuntimeError(f'{url} : statut {status}')
+                return perf_counter() - start
+
+        return await asyncio.gather(*(timed(url) for url in urls))
+
+    async def call(self, application, url, token):
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'authorization', f'Bearer {token}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b''}
+            # Le client reste connecté jusqu'à la fin de la réponse
+            await asyncio.Future()
+
+        response = {}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+
+        await application(scope, receive, send)
+        return response.get('status')
+
+    def report(self, label, durations, elapsed):
+        durations = sorted(durations)
+        count = len(durations)
+        p50 = durations[count // 2] * 1000
+        p95 = durations[int(count * 0.95) - 1] * 1000
+        self.stdout.write(
+            f'{label:<6} {count:>6} requêtes en {elapsed:6.2f} s '
+            f'-> {count / elapsed:7.0f} req/s '
+            f'(p50 {p50:6.1f} ms, p95 {p95:6.1f} ms)'
+        )
@@ -0,0 +1,91 @@
+from time import process_time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIClient
+from api.compression import CODECS, compress
+from api.datasets import generate_dataset
+from api.models import Project
+
+
+class Rollback(Exception):
+    pass
+
+
+# Niveaux mesurés par encodage
+LEVELS = {'gzip': [1, 6, 9], 'br': [4, 5, 11]}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure, pour des réponses de plusieurs tailles (listes, résumé "
+        "des projets, export), les octets envoyés et le temps CPU de "
+        "chaque encodage disponible (gzip, brotli) et niveau. Les "
+        "données générées sont annulées à la fin"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issues', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        cache.clear()
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        owner = generate_dataset(
+            users=50, projects=5, contributors=10,
+            issues=options['issues'], comments=3,
+            prefix='bench_compression'
+        )['owner']
+        project = Project.objects.filter(author_id=owner).first()
+        client = APIClient(HTTP_HOST=options['host'])
+        client.force_authenticate(user=owner)
+
+        self.stdout.write(
+            f"{'réponse':<22} {'encodage':<9} {'octets':>10} "
+            f"{'ratio':>6} {'CPU µs':>9} {'Mo/s':>8}"
+        )
+        for label, path in [
+            ('issues (10)', '/api/issues/'),
+            ('issues (100)', '/api/issues/?pagination=cursor&page_size=100'),
+            ('project_summary', '/api/projects/project_summary/'),
+            ('export ndjson', f'/api/projects/{project.pk}/export/'),
+        ]:
+            response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f'{path} : statut {response.status_code}')
+            if response.streaming:
+                content = b''.join(response.streaming_content)
+            else:
+                content = response.content
+            self.report(label, 'identity', len(content), len(content), 0)
+            for encoding in CODECS:
+                for level in LEVELS[encoding]:
+                    size, seconds = self.measure(
+                        encoding, level, content, options['repeat']
+                        )
+                    self.report(
+                        label, f'{encoding}-{level}', len(content),
+                        size, seconds
+                    )
+
+    def measure(self, encoding, level, content, repeat):
+        # Temps CPU moyen d'une compression complète
+        start = process_time()
+        for _ in range(repeat):
+            size = len(compress(encoding, content, level))
+        return size, (process_time() - start) / repeat
+
+    def report(self, label, encoding, raw, size, seconds):
+        throughput = f'{raw / seconds / 1e6:8.1f}' if seconds else ' ' * 8
+        self.stdout.write(
+            f'{label:<22} {encoding:<9} {size:>10} {raw / size:>6.1f} '
+            f'{seconds * 1e6:>9.0f} {throughput}'
+        )
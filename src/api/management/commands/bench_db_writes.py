@@ -0,0 +1,110 @@
+import threading
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from api.models import Project, Contributor, Issue, Comment
+from api_user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit d'écriture (écritures/s) de la base configurée "
+        "avec plusieurs threads qui créent en parallèle des issues et "
+        "des commentaires (signaux et journal des changements compris). "
+        "Comparer les profils avec les variables DB_* (voir "
+        "softdesk/database.py). Les données créées sont supprimées à "
+        "la fin (le journal des changements garde leurs tombstones)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--writes', type=int, default=200,
+            help="Nombre d'écritures par thread"
+        )
+
+    def handle(self, *args, **options):
+        # Les threads ont chacun leur connexion : les données de
+        # départ doivent être validées
+        user = User.objects.create_user(username='bench_db_writes')
+        try:
+            project = Project.objects.create(
+                title='Benchmark',
+                description='Écritures concurrentes',
+                type='back-end',
+                author_id=user
+            )
+            Contributor.objects.create(user_id=user, project_id=project)
+            issue = self.create_issue(user, project, 0)
+            self.describe()
+            self.run(user, project, issue, options)
+        finally:
+            user.delete()
+
+    def describe(self):
+        settings = connection.settings_dict
+        line = f"{connection.vendor} {settings['NAME']}"
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+                cursor.execute('PRAGMA synchronous')
+                synchronous = cursor.fetchone()[0]
+            line += (
+                f' (journal_mode={journal_mode}, synchronous={synchronous})'
+            )
+        else:
+            line += f" (CONN_MAX_AGE={settings['CONN_MAX_AGE']})"
+        self.stdout.write(line)
+
+    def create_issue(self, user, project, index):
+        return Issue.objects.create(
+            title=f'Issue {index}',
+            description='Description',
+            author_id=user,
+            project_id=project,
+            status=Issue.Status.TO_DO,
+            priority=Issue.Priority.LOW,
+            tag=Issue.Tag.BUG,
+        )
+
+    def run(self, user, project, issue, options):
+        errors = []
+
+        def worker():
+            try:
+                for index in range(options['writes']):
+                    try:
+                        if index % 2:
+                            Comment.objects.create(
+                                description='Commentaire',
+                                author_id=user,
+                                issue_id=issue
+                            )
+                        else:
+                            self.create_issue(user, project, index)
+                    except OperationalError as error:
+                        # ex : "database is locked" sous SQLite
+                        errors.append(str(error))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(options['threads'])
+        ]
+        start = perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - start
+
+        attempted = options['threads'] * options['writes']
+        written = attempted - len(errors)
+        self.stdout.write(
+            f"{options['threads']} threads, {written}/{attempted} "
+            f'écritures en {elapsed:.2f} s -> {written / elapsed:.0f} '
+            f'écritures/s, {len(errors)} échecs'
+        )
+        for error in sorted(set(errors)):
+            self.stdout.write(f'  {error}')
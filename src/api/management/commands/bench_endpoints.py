@@ -0,0 +1,121 @@
+import json
+import platform
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.benchmarks import run_benchmark, compare
+from api.datasets import SCALES
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence (p50 / p95 / p99) et le nombre de requêtes SQL "
+        "de chaque endpoint des routers, sur des jeux de données "
+        "générés de plusieurs tailles, et compare le résultat à la "
+        "référence enregistrée (--save pour la remplacer). Les données "
+        "générées sont annulées à la fin ; le cache est vidé avant "
+        "chaque taille"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='small,medium',
+            help=f"Tailles, parmi {', '.join(SCALES)}"
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Requêtes mesurées par endpoint'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline',
+            default=settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Enregistre le résultat comme nouvelle référence'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Ralentissement de la médiane toléré (0.5 = +50 %%)'
+        )
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        scales = options['scales'].split(',')
+        unknown = [scale for scale in scales if scale not in SCALES]
+        if unknown:
+            raise CommandError(f"Tailles inconnues : {', '.join(unknown)}")
+
+        results = {}
+        for scale in scales:
+            # Les ids du jeu annulé peuvent être réutilisés
+            cache.clear()
+            try:
+                with transaction.atomic():
+                    results[scale] = run_benchmark(
+                        SCALES[scale],
+                        options['repeat'],
+                        seed=options['seed'],
+                        host=options['host']
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+            self.report(scale, results[scale])
+
+        if options['save']:
+            with open(options['baseline'], 'w') as baseline:
+                json.dump(
+                    {
+                        'environment': {
+                            'python': platform.python_version(),
+                            'database': connection.vendor,
+                            'machine': platform.machine(),
+                            'repeat': options['repeat'],
+                        },
+                        'scales': results,
+                    },
+                    baseline,
+                    indent=2,
+                    sort_keys=True
+                )
+                baseline.write('\n')
+            self.stdout.write(f"Référence enregistrée : {options['baseline']}")
+            return
+
+        try:
+            with open(options['baseline']) as baseline:
+                reference = json.load(baseline)['scales']
+        except FileNotFoundError:
+            self.stdout.write('Pas de référence : relancer avec --save')
+            return
+        regressions = compare(reference, results, options['tolerance'])
+        for regression in regressions:
+            self.stdout.write(regression)
+        if regressions:
+            raise CommandError(f'{len(regressions)} régression(s)')
+        self.stdout.write('Aucune régression par rapport à la référence')
+
+    def report(self, scale, result):
+        dataset = result['dataset']
+        self.stdout.write(
+            f'{scale} : ' + ', '.join(
+                f'{count} {name}' for name, count in dataset.items()
+                )
+        )
+        self.stdout.write(
+            f"{'endpoint':<48} {'statut':>6} {'p50':>8} {'p95':>8} "
+            f"{'p99':>8} {'SQL':>5}"
+        )
+        for key, stats in result['endpoints'].items():
+            self.stdout.write(
+                f"{key:<48} {stats['status']:>6} {stats['p50_ms']:>8.2f} "
+                f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+                f"{stats['queries']:>5}"
+            )
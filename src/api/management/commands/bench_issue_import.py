@@ -0,0 +1,91 @@
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api.models import Project, Contributor
+from api.views import IssueViewSet
+from api_user.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit (issues/s) de l'import unitaire (POST /issues/) "
+        "et de l'import en masse (POST /issues/bulk/). "
+        "Toutes les données créées sont annulées à la fin"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--single-count', type=int, default=500,
+            help="Nombre d'issues créées une par une pour la comparaison"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        user = User.objects.create_user(username='bench_issue_import')
+        project = Project.objects.create(
+            title='Benchmark',
+            description='Import en masse',
+            type='back-end',
+            author_id=user
+        )
+        Contributor.objects.create(user_id=user, project_id=project)
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+
+        def issue_data(index):
+            return {
+                'title': f'Issue {index}',
+                'description': 'Description',
+                'project_id': project.id,
+                'status': 'To Do',
+                'priority': 'LOW',
+                'tag': 'BUG',
+            }
+
+        create = IssueViewSet.as_view({'post': 'create'})
+        count = options['single_count']
+        start = perf_counter()
+        for index in range(count):
+            request = factory.post(
+                '/api/issues/', issue_data(index), format='json'
+                )
+            force_authenticate(request, user=user)
+            create(request)
+        self.report('unitaire', count, perf_counter() - start)
+
+        bulk = IssueViewSet.as_view({'post': 'bulk'})
+        count = options['count']
+        request = factory.post(
+            f"/api/issues/bulk/?batch_size={options['batch_size']}",
+            [issue_data(index) for index in range(count)],
+            format='json'
+        )
+        force_authenticate(request, user=user)
+        start = perf_counter()
+        response = bulk(request)
+        elapsed = perf_counter() - start
+        if response.status_code != 201:
+            self.stderr.write(str(response.data))
+            return
+        self.report(
+            f"en masse (lots de {options['batch_size']})", count, elapsed
+            )
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(
+            f'{label:<28} {count:>7} issues en {elapsed:7.2f} s '
+            f'-> {count / elapsed:10.0f} issues/s'
+        )
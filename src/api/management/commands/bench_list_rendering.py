@@ -0,0 +1,87 @@
+from time import perf_counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.datasets import generate_dataset
+from api.fast_list import compile_row_mapping
+from api.renderers import FastJSONRenderer
+from api.serializers import IssueSerializer, CommentSerializer
+from api.views import IssueViewSet, CommentViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit (lignes/s) des listes d'issues et de "
+        "commentaires rendues par les serializers et JSONRenderer, et "
+        "par values() et FastJSONRenderer (voir api.fast_list). "
+        "Les deux sorties doivent être identiques. Les données "
+        "générées sont annulées à la fin"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rows = options['rows']
+        generate_dataset(
+            users=20, projects=1, contributors=5, issues=rows, comments=1,
+            prefix='bench_list_rendering'
+        )
+        request = Request(
+            APIRequestFactory(SERVER_NAME='localhost').get('/api/')
+            )
+        context = {'request': request}
+        for label, viewset, serializer_class in [
+            ('issues', IssueViewSet, IssueSerializer),
+            ('commentaires', CommentViewSet, CommentSerializer),
+        ]:
+            queryset = viewset.queryset.filter(
+                author_id__username__startswith='bench_list_rendering'
+                ).order_by('time_created', 'id')[:rows]
+
+            def serialized():
+                return JSONRenderer().render(serializer_class(
+                    list(queryset), many=True, context=context
+                    ).data)
+
+            def fast():
+                mapping = compile_row_mapping(
+                    serializer_class(context=context)
+                    )
+                return FastJSONRenderer().render([
+                    mapping(row) for row in queryset.values(*mapping.paths)
+                ])
+
+            if serialized() != fast():
+                raise CommandError(f'{label} : sorties différentes')
+            before = self.best(serialized, options['repeat'])
+            after = self.best(fast, options['repeat'])
+            self.stdout.write(
+                f'{label:<13} serializers {rows / before:10.0f} lignes/s'
+                f'   values() {rows / after:10.0f} lignes/s'
+                f'   x{before / after:.1f}'
+            )
+
+    def best(self, function, repeat):
+        # Meilleur temps sur `repeat` exécutions (lecture SQL comprise)
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            function()
+            timings.append(perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,60 @@
+from time import perf_counter
+from django.core.management.base import BaseCommand, CommandError
+from api.datasets import SCALES, SYNTHETIC_PASSWORD, generate_dataset
+from api_user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données réaliste (utilisateurs, projets, "
+        "contributeurs, issues et commentaires) dans la base configurée. "
+        "--scale choisit une taille prédéfinie, que les autres options "
+        "remplacent"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        parser.add_argument('--users', type=int)
+        parser.add_argument('--projects', type=int)
+        parser.add_argument(
+            '--contributors', type=int,
+            help='Contributeurs par projet, auteur compris'
+        )
+        parser.add_argument('--issues', type=int, help='Issues par projet')
+        parser.add_argument(
+            '--comments', type=int, help='Commentaires par issue'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help="Préfixe des noms d'utilisateur (<prefix>_0, <prefix>_1...)"
+        )
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        if sizes['users'] < 1:
+            raise CommandError('Il faut au moins un utilisateur')
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'Des utilisateurs {prefix}_* existent déjà : '
+                'choisir un autre --prefix'
+            )
+
+        start = perf_counter()
+        result = generate_dataset(
+            seed=options['seed'], prefix=prefix, **sizes
+            )
+        elapsed = perf_counter() - start
+        self.stdout.write(
+            f"{result['users']} utilisateurs, {result['projects']} projets, "
+            f"{result['contributors']} contributeurs, "
+            f"{result['issues']} issues, {result['comments']} commentaires "
+            f'créés en {elapsed:.2f} s'
+        )
+        self.stdout.write(
+            f"Connexion : {result['owner'].username} / {SYNTHETIC_PASSWORD}"
+        )
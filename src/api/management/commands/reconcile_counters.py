@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.counters import reconcile_counters
+from api.models import Project, Issue
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les compteurs des projets (issues, commentaires, "
+        "contributeurs, dernière activité) et des issues (commentaires, "
+        "dernier commentaire) depuis les tables, par lots de projets "
+        "(une transaction par lot)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Projets (avec leurs issues) recalculés par transaction'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Compte les lignes qui ont dérivé sans les corriger'
+        )
+
+    def handle(self, *args, **options):
+        project_ids = list(
+            Project.objects.order_by('id').values_list('id', flat=True)
+            )
+        batch_size = options['batch_size']
+        drifted_issues = drifted_projects = 0
+        for start in range(0, len(project_ids), batch_size):
+            batch = project_ids[start:start + batch_size]
+            with transaction.atomic():
+                issues, projects = reconcile_counters(
+                    project_ids=batch,
+                    issue_ids=Issue.objects.filter(
+                        project_id__in=batch
+                        ).values('id'),
+                    fix=not options['dry_run']
+                )
+            drifted_issues += issues
+            drifted_projects += projects
+
+        verb = 'à corriger' if options['dry_run'] else 'corrigés'
+        self.stdout.write(
+            f'{len(project_ids)} projets vérifiés : compteurs {verb} sur '
+            f'{drifted_projects} projets et {drifted_issues} issues'
+        )
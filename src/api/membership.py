@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.core.cache import cache
+from .caches import cache_is_shared
+from .models import Project, Contributor
+
+
+class Membership:
+    """
+    Projets auxquels un utilisateur contribue et projets dont il
+    est l'auteur, chargés une seule fois par requête
+    """
+
+    def __init__(self, project_ids, authored_project_ids):
+        self.project_ids = frozenset(project_ids)
+        self.authored_project_ids = frozenset(authored_project_ids)
+
+    def is_contributor(self, project_id):
+        return _to_int(project_id) in self.project_ids
+
+    def is_author(self, project_id):
+        return _to_int(project_id) in self.authored_project_ids
+
+
+def _to_int(value):
+    # Accepte un id, une instance de Project ou une valeur de requête
+    value = getattr(value, 'pk', value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cache_key(user_id):
+    return f'api:membership:{user_id}'
+
+
+def _cache_timeout():
+    # Cache inter-requêtes désactivé si le délai est nul ou absent,
+    # ou si le cache n'est pas partagé entre les processus
+    if not cache_is_shared():
+        return None
+    return getattr(settings, 'MEMBERSHIP_CACHE_TIMEOUT', None)
+
+
+def load_membership(user_id):
+    """
+    Charge les appartenances d'un utilisateur, en passant par le
+    cache Django si MEMBERSHIP_CACHE_TIMEOUT est défini et le cache
+    partagé
+    """
+    timeout = _cache_timeout()
+    if timeout:
+        cached = cache.get(_cache_key(user_id))
+        if cached is not None:
+            return Membership(*cached)
+
+    project_ids = list(
+        Contributor.objects.filter(user_id=user_id)
+        .values_list('project_id', flat=True)
+    )
+    authored_project_ids = list(
+        Project.objects.filter(author_id=user_id)
+        .values_list('id', flat=True)
+    )
+    if timeout:
+        cache.set(
+            _cache_key(user_id),
+            (project_ids, authored_project_ids),
+            timeout
+        )
+    return Membership(project_ids, authored_project_ids)
+
+
+def invalidate_membership(user_id):
+    if _cache_timeout():
+        cache.delete(_cache_key(user_id))
+
+
+def get_membership(request):
+    """
+    Retourne les appartenances de l'utilisateur de la requête,
+    mémorisées sur la requête Django sous-jacente pour être
+    partagées entre permissions, vues et serializers
+    """
+    http_request = getattr(request, '_request', request)
+    membership = getattr(http_request, '_membership', None)
+    if membership is None:
+        membership = load_membership(request.user.pk)
+        http_request._membership = membership
+    return membership
+
+
+class MemberQuerysetMixin:
+    """
+    Restreint le queryset d'une vue aux projets dont l'utilisateur
+    est contributeur, par une jointure SQL sur Contributor.
+    `project_lookup` indique le chemin vers le projet depuis le modèle
+    """
+    project_lookup = 'project_id'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user_lookup = f'{self.project_lookup}__contributor__user_id'
+        return queryset.filter(**{user_lookup: self.request.user.pk})
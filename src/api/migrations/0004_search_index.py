@@ -0,0 +1,108 @@
+from django.db import migrations
+
+
+# Copie figée du schéma de api.search au moment de la migration :
+# tables FTS5 à contenu externe et triggers qui tiennent l'index à
+# jour
+SQLITE_FORWARD = [
+    '''
+    CREATE VIRTUAL TABLE api_issue_fts USING fts5(
+        title, description,
+        content='api_issue', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE VIRTUAL TABLE api_comment_fts USING fts5(
+        description,
+        content='api_comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER api_issue_fts_insert
+    AFTER INSERT ON api_issue BEGIN
+        INSERT INTO api_issue_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER api_issue_fts_delete
+    AFTER DELETE ON api_issue BEGIN
+        INSERT INTO api_issue_fts(
+            api_issue_fts, rowid, title, description
+        ) VALUES ('delete', old.id, old.title, old.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER api_issue_fts_update
+    AFTER UPDATE OF title, description ON api_issue BEGIN
+        INSERT INTO api_issue_fts(
+            api_issue_fts, rowid, title, description
+        ) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO api_issue_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER api_comment_fts_insert
+    AFTER INSERT ON api_comment BEGIN
+        INSERT INTO api_comment_fts(rowid, description)
+        VALUES (new.id, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER api_comment_fts_delete
+    AFTER DELETE ON api_comment BEGIN
+        INSERT INTO api_comment_fts(api_comment_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER api_comment_fts_update
+    AFTER UPDATE OF description ON api_comment BEGIN
+        INSERT INTO api_comment_fts(api_comment_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO api_comment_fts(rowid, description)
+        VALUES (new.id, new.description);
+    END
+    ''',
+    # Indexation des lignes existantes
+    "INSERT INTO api_issue_fts(api_issue_fts) VALUES ('rebuild')",
+    "INSERT INTO api_comment_fts(api_comment_fts) VALUES ('rebuild')",
+]
+
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS api_issue_fts_insert',
+    'DROP TRIGGER IF EXISTS api_issue_fts_delete',
+    'DROP TRIGGER IF EXISTS api_issue_fts_update',
+    'DROP TRIGGER IF EXISTS api_comment_fts_insert',
+    'DROP TRIGGER IF EXISTS api_comment_fts_delete',
+    'DROP TRIGGER IF EXISTS api_comment_fts_update',
+    'DROP TABLE IF EXISTS api_issue_fts',
+    'DROP TABLE IF EXISTS api_comment_fts',
+]
+
+
+class SQLiteRunSQL(migrations.RunSQL):
+    # Les autres bases utilisent un autre moteur (SEARCH_BACKEND)
+
+    def database_forwards(self, app_label, schema_editor, *args):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, *args)
+
+    def database_backwards(self, app_label, schema_editor, *args):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, *args)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_issue_comment_cursor_indexes'),
+    ]
+
+    operations = [
+        SQLiteRunSQL(SQLITE_FORWARD, SQLITE_BACKWARD),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+CHOICES = {
+    'status': ['TO_DO', 'IN_PROGRESS', 'FINISHED'],
+    'priority': ['LOW', 'MEDIUM', 'HIGH'],
+    'tag': ['BUG', 'FEATURE', 'TASK'],
+}
+
+
+def normalize(value):
+    # "In progress", "in_progress " -> "IN_PROGRESS"
+    return value.strip().upper().replace(' ', '_')
+
+
+def normalize_choices(apps, schema_editor):
+    """
+    Réécrit les variantes d'écriture des codes (casse, espaces). Une
+    valeur qui ne correspond à aucun code arrête la migration : elle
+    doit être corrigée à la main, rien n'est remplacé en silence
+    """
+    Issue = apps.get_model('api', 'Issue')
+    unknown = {}
+    for field, choices in CHOICES.items():
+        values = Issue.objects.exclude(**{f'{field}__in': choices})
+        for value in values.values_list(field, flat=True).distinct():
+            if normalize(value) not in choices:
+                unknown.setdefault(field, []).append(value)
+    if unknown:
+        details = '; '.join(
+            f"{field} : {', '.join(map(repr, sorted(values)))} "
+            f"(attendu : {', '.join(CHOICES[field])})"
+            for field, values in unknown.items()
+        )
+        raise ValueError(f'Valeurs inconnues dans api_issue : {details}')
+
+    for field, choices in CHOICES.items():
+        values = Issue.objects.exclude(**{f'{field}__in': choices})
+        for value in values.values_list(field, flat=True).distinct():
+            Issue.objects.filter(**{field: value}).update(
+                **{field: normalize(value)}
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Retour arrière : les codes restent des valeurs valides des
+        # anciennes colonnes libres, seule l'écriture d'origine est perdue
+        migrations.RunPython(normalize_choices, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='issue',
+            name='priority',
+            field=models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High')], max_length=6),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='status',
+            field=models.CharField(choices=[('TO_DO', 'To Do'), ('IN_PROGRESS', 'In Progress'), ('FINISHED', 'Finished')], max_length=11),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='tag',
+            field=models.CharField(choices=[('BUG', 'Bug'), ('FEATURE', 'Feature'), ('TASK', 'Task')], max_length=7),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project_id', 'status', 'priority'], name='issue_project_status_prio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project_id', 'time_created', 'id'], name='issue_project_time_id_idx'),
+        ),
+    ]
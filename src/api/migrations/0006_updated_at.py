@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_time_created(apps, schema_editor):
+    # Les lignes existantes n'ont pas été modifiées depuis leur création
+    for name in ('Project', 'Issue', 'Comment'):
+        model = apps.get_model('api', name)
+        model.objects.update(updated_at=F('time_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_issue_choices_and_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(copy_time_created, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue_id', 'updated_at'], name='comment_issue_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project_id', 'updated_at'], name='issue_project_updated_idx'),
+        ),
+    ]
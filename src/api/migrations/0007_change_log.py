@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Les données existantes sont publiées comme des créations pour
+    # qu'une première synchronisation (since=0) les récupère
+    Change = apps.get_model('api', 'Change')
+    sources = [
+        ('project', 'Project', 'id', None),
+        ('contributor', 'Contributor', 'project_id', 'user_id'),
+        ('issue', 'Issue', 'project_id', None),
+        ('comment', 'Comment', 'issue_id__project_id', None),
+    ]
+    for name, model_name, project_lookup, user_lookup in sources:
+        model = apps.get_model('api', model_name)
+        rows = model.objects.order_by('id').values_list(
+            'id', project_lookup, user_lookup or 'id'
+            )
+        Change.objects.bulk_create(
+            [
+                Change(
+                    model=name,
+                    object_id=object_id,
+                    project_id=project_id,
+                    user_id=user_id if user_lookup else None,
+                    action='created',
+                )
+                for object_id, project_id, user_id in rows.iterator()
+            ],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('project', 'Project'), ('contributor', 'Contributor'), ('issue', 'Issue'), ('comment', 'Comment')], max_length=11)),
+                ('object_id', models.BigIntegerField()),
+                ('project_id', models.BigIntegerField(null=True)),
+                ('user_id', models.BigIntegerField(null=True)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7)),
+                ('time_created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project_id', 'id'], name='change_project_id_idx'), models.Index(fields=['user_id', 'id'], name='change_user_id_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:47
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill(apps, schema_editor):
+    # Compteurs des données existantes (même calcul que
+    # api.counters.reconcile_counters)
+    Project = apps.get_model('api', 'Project')
+    Contributor = apps.get_model('api', 'Contributor')
+    Issue = apps.get_model('api', 'Issue')
+    Comment = apps.get_model('api', 'Comment')
+
+    def aggregate(model, lookup, value):
+        return Subquery(
+            model.objects.filter(**{lookup: OuterRef('pk')})
+            .order_by()
+            .values(lookup)
+            .annotate(value=value)
+            .values('value')
+        )
+
+    Issue.objects.update(
+        comment_count=Coalesce(aggregate(Comment, 'issue_id', Count('id')), 0),
+        last_comment_at=aggregate(Comment, 'issue_id', Max('time_created')),
+    )
+    last_issue = aggregate(Issue, 'project_id', Max('time_created'))
+    last_comment = aggregate(
+        Comment, 'issue_id__project_id', Max('time_created')
+        )
+    Project.objects.update(
+        issue_count=Coalesce(aggregate(Issue, 'project_id', Count('id')), 0),
+        comment_count=Coalesce(
+            aggregate(Comment, 'issue_id__project_id', Count('id')), 0
+            ),
+        contributor_count=Coalesce(
+            aggregate(Contributor, 'project_id', Count('id')), 0
+            ),
+        last_activity_at=Greatest(
+            Coalesce(last_issue, last_comment),
+            Coalesce(last_comment, last_issue)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='last_comment_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='contributor_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issue_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_activity_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill(apps, schema_editor):
+    # Les curseurs déjà donnés aux clients (des ids) restent valides
+    Change = apps.get_model('api', 'Change')
+    Change.objects.update(sequence=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_project_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_user_id_idx',
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='sequence',
+            field=models.BigIntegerField(null=True, unique=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['project_id', 'sequence'], name='change_project_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user_id', 'sequence'], name='change_user_seq_idx'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 import uuid
-from django.db import models
+from django.db import models, router, transaction
 from api_user.models import User
 
 
@@ -14,6 +14,15 @@ class Project(models.Model):
         )
     contributor_id = models.ManyToManyField(User, through='Contributor')
     time_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Compteurs tenus à jour à chaque création / suppression (voir
+    # api.counters), recalculés par `manage.py reconcile_counters`.
+    # last_activity_at : création de la dernière issue ou du dernier
+    # commentaire
+    issue_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    contributor_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True)
 
 
 class Contributor(models.Model):
@@ -26,14 +35,58 @@ class Contributor(models.Model):
 
 
 class Issue(models.Model):
+
+    class Status(models.TextChoices):
+        TO_DO = 'TO_DO', 'To Do'
+        IN_PROGRESS = 'IN_PROGRESS', 'In Progress'
+        FINISHED = 'FINISHED', 'Finished'
+
+    class Priority(models.TextChoices):
+        LOW = 'LOW', 'Low'
+        MEDIUM = 'MEDIUM', 'Medium'
+        HIGH = 'HIGH', 'High'
+
+    class Tag(models.TextChoices):
+        BUG = 'BUG', 'Bug'
+        FEATURE = 'FEATURE', 'Feature'
+        TASK = 'TASK', 'Task'
+
     title = models.CharField(max_length=100)
     description = models.TextField()
     author_id = models.ForeignKey(User, on_delete=models.CASCADE)
     project_id = models.ForeignKey(Project, on_delete=models.CASCADE)
-    status = models.CharField(max_length=100)
-    priority = models.CharField(max_length=100)
-    tag = models.CharField(max_length=100)
+    status = models.CharField(max_length=11, choices=Status.choices)
+    priority = models.CharField(max_length=6, choices=Priority.choices)
+    tag = models.CharField(max_length=7, choices=Tag.choices)
     time_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Compteurs tenus à jour (voir Project)
+    comment_count = models.PositiveIntegerField(default=0)
+    last_comment_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # index pour la pagination par curseur (time_created, id)
+            models.Index(
+                fields=['time_created', 'id'],
+                name='issue_time_created_id_idx'
+                ),
+            # index pour les tableaux filtrés par statut et priorité
+            models.Index(
+                fields=['project_id', 'status', 'priority'],
+                name='issue_project_status_prio_idx'
+                ),
+            # index pour les listes d'un projet triées par date
+            models.Index(
+                fields=['project_id', 'time_created', 'id'],
+                name='issue_project_time_id_idx'
+                ),
+            # index pour l'ETag d'un projet (max(updated_at))
+            models.Index(
+                fields=['project_id', 'updated_at'],
+                name='issue_project_updated_idx'
+                ),
+        ]
 
 
 class Comment(models.Model):
@@ -41,5 +94,96 @@ class Comment(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     description = models.TextField()
     time_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     author_id = models.ForeignKey(User, on_delete=models.CASCADE)
     issue_id = models.ForeignKey('Issue', on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            # index pour la pagination par curseur (time_created, id)
+            models.Index(
+                fields=['time_created', 'id'],
+                name='comment_time_created_id_idx'
+                ),
+            # index pour l'ETag d'une issue (max(updated_at))
+            models.Index(
+                fields=['issue_id', 'updated_at'],
+                name='comment_issue_updated_idx'
+                ),
+        ]
+
+
+class ChangeManager(models.Manager):
+
+    def assign_sequences(self, check=True):
+        """
+        Numérote, dans l'ordre de leurs ids, les changements validés
+        qui n'ont pas encore de numéro, et retourne {id: numéro}.
+        Le numéro est attribué après le commit : une transaction
+        longue qui valide ses ids après ceux d'une transaction plus
+        courte reçoit des numéros plus grands, qu'aucun curseur n'a
+        encore dépassés. `check` évite la transaction (et le verrou
+        d'écriture) quand il n'y a rien à numéroter
+        """
+        if check and not self.filter(sequence=None).exists():
+            return {}
+        using = router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            # Un seul numérotage à la fois : les lignes en attente
+            # sont verrouillées jusqu'à la fin
+            pending = list(
+                self.select_for_update().filter(sequence=None)
+                .order_by('id').values_list('id', flat=True)
+            )
+            if not pending:
+                return {}
+            last = self.aggregate(last=models.Max('sequence'))['last']
+            offset = (last or 0) - pending[0] + 1
+            self.filter(pk__in=pending).update(
+                sequence=models.F('id') + offset
+                )
+        return {pk: pk + offset for pk in pending}
+
+
+class Change(models.Model):
+    """
+    Journal des créations, modifications et suppressions, lu par
+    l'endpoint de synchronisation. Le numéro `sequence`, attribué
+    dans l'ordre des commits (voir ChangeManager), sert de curseur.
+    Les ids sont de simples entiers (pas de clés étrangères) pour que
+    les lignes supprimées gardent une trace (tombstone)
+    """
+
+    class Model(models.TextChoices):
+        PROJECT = 'project', 'Project'
+        CONTRIBUTOR = 'contributor', 'Contributor'
+        ISSUE = 'issue', 'Issue'
+        COMMENT = 'comment', 'Comment'
+
+    class Action(models.TextChoices):
+        CREATED = 'created', 'Created'
+        UPDATED = 'updated', 'Updated'
+        DELETED = 'deleted', 'Deleted'
+
+    model = models.CharField(max_length=11, choices=Model.choices)
+    object_id = models.BigIntegerField()
+    project_id = models.BigIntegerField(null=True)
+    # utilisateur concerné par un changement de contributeur
+    user_id = models.BigIntegerField(null=True)
+    action = models.CharField(max_length=7, choices=Action.choices)
+    time_created = models.DateTimeField(auto_now_add=True)
+    # None jusqu'au numérotage qui suit le commit
+    sequence = models.BigIntegerField(null=True, unique=True)
+
+    objects = ChangeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['project_id', 'sequence'],
+                name='change_project_seq_idx'
+                ),
+            models.Index(
+                fields=['user_id', 'sequence'], name='change_user_seq_idx'
+                ),
+        ]
@@ -0,0 +1,169 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur sur le couple (time_created, id).
+    Contrairement à PageNumberPagination, aucune requête COUNT(*)
+    ni OFFSET n'est exécutée : la page N coûte autant que la page 1
+    grâce aux index composites (time_created, id)
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Curseur invalide'
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by('time_created', 'id')
+        if position is not None:
+            time_created, pk = position
+            # La première condition permet un parcours d'index par plage
+            queryset = queryset.filter(
+                Q(time_created__gt=time_created) | Q(id__gt=pk),
+                time_created__gte=time_created,
+            )
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        return self.set_page([
+            obj async for obj in queryset.aiterator(chunk_size=self.page_size)
+        ])
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(
+                request.query_params[self.page_size_query_param]
+                )
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            time_created, pk = urlsafe_b64decode(
+                encoded.encode('ascii')
+                ).decode('ascii').rsplit('|', 1)
+            time_created = parse_datetime(time_created)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if time_created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return time_created, pk
+
+    def encode_cursor(self, obj):
+        if isinstance(obj, dict):
+            # Ligne de values() (voir api.fast_list)
+            position = f"{obj['time_created'].isoformat()}|{obj['id']}"
+        else:
+            position = f'{obj.time_created.isoformat()}|{obj.pk}'
+        return urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+            )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string', 'nullable': True, 'format': 'uri'
+                    },
+                'results': schema,
+            },
+        }
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """
+    Pagination par numéro de page de DRF, avec une variante
+    asynchrone (COUNT(*) et lecture de la page par l'ORM asynchrone)
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count est une cached_property : la valeur calculée ici évite
+        # un COUNT(*) synchrone dans paginator.page()
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+                ))
+        self.page.object_list = [
+            obj async for obj in
+            self.page.object_list.aiterator(chunk_size=page_size)
+        ]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+class SelectablePaginationMixin:
+    """
+    Permet de choisir la pagination par curseur pour une requête
+    avec ?pagination=cursor (ou dès qu'un ?cursor= est fourni).
+    Sinon, la pagination de la vue (pagination_class) est utilisée
+    """
+    cursor_pagination_class = KeysetPagination
+
+    def uses_cursor_pagination(self):
+        params = self.request.query_params
+        return (
+            params.get('pagination') == 'cursor'
+            or KeysetPagination.cursor_query_param in params
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.uses_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
@@ -1,5 +1,6 @@
 from rest_framework import permissions
-from .models import Contributor, Issue, Comment
+from .models import Issue, Comment
+from .membership import get_membership
 
 
 class ProjectPermission(permissions.BasePermission):
@@ -21,7 +22,8 @@ class ProjectPermission(permissions.BasePermission):
 
         # Autorise les actions d'écriture (PUT, DELETE) uniquement
         # si l'utilisateur est l'auteur du projet
-        return obj.author_id == request.user
+        # Comparaison des clés : request.user peut être un TokenUser
+        return obj.author_id_id == request.user.pk
 
 
 class ContributorPermission(permissions.BasePermission):
@@ -43,9 +45,9 @@ class ContributorPermission(permissions.BasePermission):
         # Obtenez l'ID du projet selon que l'objet
         # est une "Issue", un "Comment", ou autre.
         if isinstance(obj, Issue):
-            project_id = obj.project_id.id
+            project_id = obj.project_id_id
         elif isinstance(obj, Comment):
-            project_id = obj.issue_id.project_id.id
+            project_id = obj.issue_id.project_id_id
         else:
             project_id = view.kwargs.get('project_id')
 
@@ -54,6 +56,4 @@ class ContributorPermission(permissions.BasePermission):
             return False
 
         # Vérifie si l'utilisateur est un contributeur du projet associé.
-        return Contributor.objects.filter(
-            project_id=project_id, user_id=request.user
-            ).exists()
+        return get_membership(request).is_contributor(project_id)
@@ -0,0 +1,46 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Types qu'orjson ne connaît pas, et dates : comme JSONRenderer
+encoder_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encodé par orjson s'il est installé, avec la même
+    sortie octet pour octet que celui de DRF (compact, UTF-8, dates
+    au format de son JSONEncoder, \\u2028 et \\u2029 échappés).
+    Sans orjson, en mode indenté, ou si orjson refuse une valeur
+    (entier de plus de 64 bits...), le rendu de DRF est utilisé
+    """
+    if orjson is not None:
+        # Clés non textuelles converties comme par json.dumps
+        options = (
+            orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_NON_STR_KEYS
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=encoder_default, option=self.options
+                )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+            ).replace(b'\xe2\x80\xa9', b'\\u2029')
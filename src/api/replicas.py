@@ -0,0 +1,167 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject
+from .caches import cache_is_shared
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# État de routage de la requête en cours (None hors requête :
+# commandes, shell, tâches)
+_routing = ContextVar('api_replica_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        # Vue lisible sur une réplique (voir ReplicaRoutingMiddleware)
+        self.replica_allowed = False
+        self.wrote = False
+        self.sticky = None
+        # Au moins une lecture servie par une réplique
+        self.read_replica = False
+
+
+# Cookie signé posé après une écriture : suit le client quel que soit
+# le processus qui sert sa requête suivante
+STICKY_COOKIE = 'api_sticky_primary'
+STICKY_SALT = 'api.replicas.sticky'
+
+
+def _sticky_key(user_id):
+    return f'api:sticky-primary:{user_id}'
+
+
+def request_user_id(request):
+    # Utilisateur authentifié par DRF, qui remplace request.user.
+    # L'objet paresseux de Django n'est pas évalué ici : il lit la
+    # session en base, ce qui repasserait par le routeur
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, SimpleLazyObject):
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+def read_from_replica():
+    """
+    Vrai si la requête en cours a lu sur une réplique : ses données
+    peuvent être en retard sur la base principale
+    """
+    state = _routing.get()
+    return state is not None and state.read_replica
+
+
+def is_sticky(state):
+    """
+    Vrai si l'utilisateur a écrit il y a moins de
+    REPLICA_STICKY_SECONDS secondes : ses lectures restent sur la
+    base principale tant que les répliques peuvent être en retard.
+    L'écriture est connue par le cookie signé du client ou, pour les
+    clients sans cookies, par le cache s'il est partagé entre les
+    processus (un cache local ne voit que ses propres écritures)
+    """
+    if state.sticky is None:
+        user_id = request_user_id(state.request)
+        if user_id is None:
+            return False
+        cookie = state.request.get_signed_cookie(
+            STICKY_COOKIE,
+            default=None,
+            salt=STICKY_SALT,
+            max_age=settings.REPLICA_STICKY_SECONDS
+        )
+        state.sticky = cookie == str(user_id) or (
+            cache_is_shared() and bool(cache.get(_sticky_key(user_id)))
+        )
+    return state.sticky
+
+
+class ReplicaRouter:
+    """
+    Envoie les lectures des requêtes GET / HEAD / OPTIONS des vues
+    marquées `replica_reads` vers une des bases de DATABASE_REPLICAS.
+    Tout le reste va sur la base principale : écritures, lectures
+    après une écriture dans la même requête ou dans une transaction,
+    et lectures d'un utilisateur qui vient d'écrire
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if (
+            state is None
+            or not replicas
+            or not state.replica_allowed
+            or state.wrote
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+            or is_sticky(state)
+        ):
+            return DEFAULT_DB_ALIAS
+        state.read_replica = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les répliques ont les mêmes données que la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Les répliques reçoivent le schéma par réplication
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Prépare le routage de chaque requête pour ReplicaRouter et, après
+    une requête qui a écrit, garde les lectures de l'utilisateur sur
+    la base principale pendant REPLICA_STICKY_SECONDS secondes
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        user_id = request_user_id(request)
+        if state.wrote and user_id is not None:
+            response.set_signed_cookie(
+                STICKY_COOKIE,
+                user_id,
+                salt=STICKY_SALT,
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite='Lax'
+            )
+            if cache_is_shared():
+                cache.set(
+                    _sticky_key(user_id),
+                    True,
+                    settings.REPLICA_STICKY_SECONDS
+                )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # `cls` pour les vues DRF, `view_class` pour les vues Django
+        view_class = getattr(
+            view_func, 'cls', getattr(view_func, 'view_class', None)
+            )
+        state = _routing.get()
+        if state is not None:
+            state.replica_allowed = (
+                request.method in SAFE_METHODS
+                and getattr(view_class, 'replica_reads', False)
+            )
@@ -0,0 +1,121 @@
+import pickle
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .replicas import read_from_replica
+
+
+def _version_key(project_id):
+    return f'api:project-version:{project_id}'
+
+
+def _new_version():
+    # Une version recréée après éviction ne reprend jamais une
+    # ancienne valeur : les anciennes entrées restent inaccessibles
+    return time.time_ns()
+
+
+def _bump(project_id):
+    key = _version_key(project_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def bump_project_version(project_id):
+    """
+    Invalide toutes les réponses en cache d'un projet. La version est
+    incrémentée tout de suite, puis de nouveau après le commit pour
+    qu'une lecture concurrente ne mette pas en cache des données
+    non encore validées
+    """
+    if project_id is None:
+        return
+    _bump(project_id)
+    transaction.on_commit(lambda: _bump(project_id))
+
+
+def get_project_versions(project_ids):
+    keys = {_version_key(project_id): project_id for project_id in project_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, project_id in keys.items():
+        if project_id not in versions:
+            cache.add(key, _new_version(), None)
+            versions[project_id] = cache.get(key)
+    return versions
+
+
+class ProjectResponseCache:
+    """
+    Cache de fragments de réponse par projet, indexé par
+    (nom, id du projet, version du projet, variante). La variante
+    distingue les réponses qui dépendent de la requête (hôte des liens).
+    Les entrées plus grosses que RESPONSE_CACHE_MAX_ENTRY_SIZE
+    ne sont pas stockées, ni celles lues sur une réplique : une
+    réplique en retard mettrait en cache, sous la nouvelle version,
+    les données d'avant la dernière écriture
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def key(self, project_id, version, variant):
+        return f'api:response:{self.name}:{project_id}:{version}:{variant}'
+
+    def get_many(self, project_ids, variant=''):
+        """
+        Retourne (entrées trouvées par id de projet, versions lues).
+        Les versions doivent être repassées à set_many
+        """
+        versions = get_project_versions(project_ids)
+        keys = {
+            self.key(project_id, versions[project_id], variant): project_id
+            for project_id in project_ids
+        }
+        found = cache.get_many(keys)
+        entries = {keys[key]: value for key, value in found.items()}
+        self.count('hits', len(entries))
+        self.count('misses', len(project_ids) - len(entries))
+        return entries, versions
+
+    def set_many(self, entries, versions, variant=''):
+        if read_from_replica():
+            self.count('replica_reads', len(entries))
+            return
+        max_size = settings.RESPONSE_CACHE_MAX_ENTRY_SIZE
+        to_store = {}
+        for project_id, value in entries.items():
+            if len(pickle.dumps(value)) > max_size:
+                self.count('oversized', 1)
+                continue
+            key = self.key(project_id, versions[project_id], variant)
+            to_store[key] = value
+        cache.set_many(to_store, settings.RESPONSE_CACHE_TIMEOUT)
+
+    def count(self, counter, value):
+        if not value:
+            return
+        key = f'api:response-stats:{self.name}:{counter}'
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key, value)
+
+    def stats(self):
+        counters = ['hits', 'misses', 'oversized', 'replica_reads']
+        keys = [
+            f'api:response-stats:{self.name}:{counter}'
+            for counter in counters
+        ]
+        found = cache.get_many(keys)
+        return {
+            counter: found.get(key, 0) for counter, key in zip(counters, keys)
+        }
+
+
+project_detail_cache = ProjectResponseCache('project-detail')
+project_summary_cache = ProjectResponseCache('project-summary')
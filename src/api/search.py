@@ -0,0 +1,253 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.functions import Length, Lower, Replace
+from django.utils.module_loading import import_string
+from .models import Issue, Comment
+
+
+# Tables FTS5 à contenu externe : l'index ne stocke que les termes,
+# le texte reste dans api_issue / api_comment. Les triggers gardent
+# l'index à jour, y compris pour bulk_create et bulk_update qui
+# n'envoient pas de signaux.
+SQLITE_SEARCH_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_issue_fts USING fts5(
+        title, description,
+        content='api_issue', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_comment_fts USING fts5(
+        description,
+        content='api_comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS api_issue_fts_insert
+    AFTER INSERT ON api_issue BEGIN
+        INSERT INTO api_issue_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS api_issue_fts_delete
+    AFTER DELETE ON api_issue BEGIN
+        INSERT INTO api_issue_fts(
+            api_issue_fts, rowid, title, description
+        ) VALUES ('delete', old.id, old.title, old.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS api_issue_fts_update
+    AFTER UPDATE OF title, description ON api_issue BEGIN
+        INSERT INTO api_issue_fts(
+            api_issue_fts, rowid, title, description
+        ) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO api_issue_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS api_comment_fts_insert
+    AFTER INSERT ON api_comment BEGIN
+        INSERT INTO api_comment_fts(rowid, description)
+        VALUES (new.id, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS api_comment_fts_delete
+    AFTER DELETE ON api_comment BEGIN
+        INSERT INTO api_comment_fts(api_comment_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS api_comment_fts_update
+    AFTER UPDATE OF description ON api_comment BEGIN
+        INSERT INTO api_comment_fts(api_comment_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO api_comment_fts(rowid, description)
+        VALUES (new.id, new.description);
+    END
+    ''',
+]
+
+
+def install_sqlite_search(connection):
+    """
+    Crée (si besoin) les tables FTS5 et leurs triggers. Appelée après
+    chaque migrate, car SQLite supprime les triggers quand Django
+    reconstruit une table lors d'un AlterField (la migration 0004 a
+    sa propre copie du schéma)
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in SQLITE_SEARCH_SCHEMA:
+            cursor.execute(statement)
+
+
+class BaseSearchBackend:
+    """
+    Interface des moteurs de recherche : `search` retourne au plus
+    `limit` résultats (dictionnaires) classés par pertinence, limités
+    aux projets dont l'utilisateur est contributeur
+    """
+
+    def search(self, query, user_id, limit, offset):
+        raise NotImplementedError
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Recherche par icontains, sans index : utilisée pour les bases
+    qui n'ont pas de moteur dédié. Les résultats sont classés par
+    nombre d'occurrences des mots cherchés, puis du plus récent au
+    plus ancien
+    """
+
+    def occurrences(self, terms, *fields):
+        # Occurrences des mots dans les champs, calculées par la base :
+        # (longueur - longueur sans le mot) / longueur du mot
+        score = Value(0)
+        for field in fields:
+            text = Lower(field)
+            for term in terms:
+                score += (
+                    Length(text) - Length(Replace(text, Value(term)))
+                ) / len(term)
+        return score
+
+    def search(self, query, user_id, limit, offset):
+        terms = [term.lower() for term in query.split()]
+        issue_filter = Q()
+        comment_filter = Q()
+        for term in terms:
+            issue_filter &= (
+                Q(title__icontains=term) | Q(description__icontains=term)
+            )
+            comment_filter &= Q(description__icontains=term)
+
+        issues = (
+            Issue.objects.filter(
+                issue_filter, project_id__contributor__user_id=user_id
+                )
+            .annotate(
+                score=self.occurrences(terms, 'title', 'description')
+                )
+            .order_by('-score', '-time_created')
+            .values(
+                'id', 'project_id', 'title', 'description', 'score',
+                'time_created'
+                )
+        )
+        comments = (
+            Comment.objects.filter(
+                comment_filter,
+                issue_id__project_id__contributor__user_id=user_id
+                )
+            .annotate(score=self.occurrences(terms, 'description'))
+            .order_by('-score', '-time_created')
+            .values(
+                'id', 'issue_id', 'description',
+                'issue_id__project_id', 'issue_id__title', 'score',
+                'time_created'
+                )
+        )
+
+        rows = [
+            ({
+                'type': 'issue',
+                'id': row['id'],
+                'project_id': row['project_id'],
+                'issue_id': row['id'],
+                'title': row['title'],
+                'snippet': row['description'][:200],
+                # Négatif comme bm25 : les plus pertinents en premier
+                'rank': -row['score'],
+            }, row['time_created'])
+            for row in issues[:offset + limit]
+        ] + [
+            ({
+                'type': 'comment',
+                'id': row['id'],
+                'project_id': row['issue_id__project_id'],
+                'issue_id': row['issue_id'],
+                'title': row['issue_id__title'],
+                'snippet': row['description'][:200],
+                'rank': -row['score'],
+            }, row['time_created'])
+            for row in comments[:offset + limit]
+        ]
+        # Fusion des deux listes déjà classées
+        rows.sort(key=lambda row: row[1], reverse=True)
+        rows.sort(key=lambda row: row[0]['rank'])
+        return [hit for hit, _ in rows[offset:offset + limit]]
+
+
+class SqliteFTS5Backend(BaseSearchBackend):
+    """
+    Recherche plein texte SQLite sur les tables FTS5 api_issue_fts et
+    api_comment_fts (créées par la migration 0004 et maintenues par
+    des triggers). Les résultats sont classés avec bm25
+    """
+    sql = '''
+        SELECT 'issue', i.id, i.project_id_id, i.id, i.title,
+               snippet(api_issue_fts, -1, '[', ']', '...', 12),
+               bm25(api_issue_fts) AS rank
+        FROM api_issue_fts
+        JOIN api_issue i ON i.id = api_issue_fts.rowid
+        WHERE api_issue_fts MATCH %s
+          AND i.project_id_id IN (
+              SELECT project_id_id FROM api_contributor
+              WHERE user_id_id = %s)
+        UNION ALL
+        SELECT 'comment', c.id, i.project_id_id, i.id, i.title,
+               snippet(api_comment_fts, 0, '[', ']', '...', 12),
+               bm25(api_comment_fts) AS rank
+        FROM api_comment_fts
+        JOIN api_comment c ON c.id = api_comment_fts.rowid
+        JOIN api_issue i ON i.id = c.issue_id_id
+        WHERE api_comment_fts MATCH %s
+          AND i.project_id_id IN (
+              SELECT project_id_id FROM api_contributor
+              WHERE user_id_id = %s)
+        ORDER BY rank
+        LIMIT %s OFFSET %s
+    '''
+    columns = ['type', 'id', 'project_id', 'issue_id', 'title', 'snippet',
+               'rank']
+
+    def match_expression(self, query):
+        # Chaque mot est mis entre guillemets : la syntaxe FTS5 saisie
+        # par l'utilisateur ne peut pas provoquer d'erreur
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def search(self, query, user_id, limit, offset):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                self.sql, [match, user_id, match, user_id, limit, offset]
+                )
+            rows = cursor.fetchall()
+        return [dict(zip(self.columns, row)) for row in rows]
+
+
+def get_search_backend():
+    """
+    Retourne le moteur défini par SEARCH_BACKEND, ou à défaut
+    FTS5 sous SQLite et la recherche simple sinon
+    """
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'sqlite':
+        return SqliteFTS5Backend()
+    return BasicSearchBackend()
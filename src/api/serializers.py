@@ -1,7 +1,10 @@
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 from .models import Project, Contributor, Issue, Comment
-from api_user.models import User
+from .membership import get_membership
+from .sparse import SparseFieldsSerializerMixin
+from .bulk import add_contributors, create_issues, update_issues
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -21,7 +24,8 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
 
     def get_contributors(self, obj):
-        # Retourne la liste des contributeurs associés au projet
+        # Retourne la liste des contributeurs associés au projet.
+        # .all() lit le cache du prefetch_related de la vue
         contributors = obj.contributor_id.all()
         return [
             {'id': contributor.id, 'username': contributor.username}
@@ -29,22 +33,26 @@ class ProjectSerializer(serializers.ModelSerializer):
             ]
 
     def get_author(self, obj):
-        # Retourne l'auteur du projet
+        # Retourne l'auteur du projet (chargé par select_related)
         return {'id': obj.author_id.id, 'username': obj.author_id.username}
 
     def create(self, validated_data):
         # Récupérer l'utilisateur authentifié
         user = self.context['request'].user
         validated_data.pop('author_id', None)
+        validated_data.pop('author_id_id', None)
 
         # Créer le projet avec l'utilisateur comme auteur
-        project = Project.objects.create(author_id=user, **validated_data)
+        project = Project.objects.create(
+            author_id_id=user.pk, **validated_data
+            )
 
-        # Ajouter les contributeurs au projet
+        # Ajouter les contributeurs au projet en une seule insertion
         contributors_data = self.initial_data.get('contributors', [])
-        for contributor_id in contributors_data:
-            contributor = User.objects.get(id=contributor_id)
-            Contributor.objects.create(user_id=contributor, project_id=project)
+        add_contributors(
+            project.id,
+            [int(contributor_id) for contributor_id in contributors_data]
+        )
 
         return project
 
@@ -81,7 +89,21 @@ class ContributorSerializer(serializers.ModelSerializer):
         return Contributor.objects.create(user_id=user, project_id=project)
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class ContributorBulkSerializer(serializers.Serializer):
+    """
+    Liste d'utilisateurs à ajouter ou retirer d'un projet
+    """
+    project_id = serializers.IntegerField()
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class IssueSerializer(
+    SparseFieldsSerializerMixin, serializers.ModelSerializer
+):
     author_name = serializers.CharField(
         source='author_id.username', read_only=True
         )
@@ -105,14 +127,16 @@ class IssueSerializer(serializers.ModelSerializer):
             'time_created'
         ]
         read_only_fields = ['author_id', 'author_name', 'project_name']
+        expandable = {
+            'author': ('author_id', ['author_name']),
+            'project': ('project_id', ['project_name']),
+        }
 
     def validate(self, data):
         # Vérifier que l'utilisateur est un contributeur du projet
         project = data.get('project_id')
-        user = self.context['request'].user
-        if not Contributor.objects.filter(
-            project_id=project, user_id=user
-        ).exists():
+        membership = get_membership(self.context['request'])
+        if not membership.is_contributor(project):
             raise serializers.ValidationError(
                 "Vous devez être contributeur du projet"
             )
@@ -120,7 +144,87 @@ class IssueSerializer(serializers.ModelSerializer):
         return data
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class IssueBulkListSerializer(serializers.ListSerializer):
+    """
+    Création et mise à jour d'issues en masse. L'appartenance est
+    vérifiée une seule fois par projet distinct, et les écritures
+    sont faites par lots (voir api.bulk)
+    """
+
+    def validate(self, attrs):
+        membership = get_membership(self.context['request'])
+        project_ids = {
+            item['project_id_id'] for item in attrs if 'project_id_id' in item
+            }
+        refused = sorted(
+            project_id for project_id in project_ids
+            if not membership.is_contributor(project_id)
+            )
+        if refused:
+            raise serializers.ValidationError(
+                f"Vous devez être contributeur des projets {refused}"
+            )
+
+        if self.instance is None:
+            # Les clés primaires sont attribuées par la base
+            if any('id' in item for item in attrs):
+                raise serializers.ValidationError(
+                    "Une issue à créer ne doit pas avoir d'id"
+                )
+        else:
+            if any('id' not in item for item in attrs):
+                raise serializers.ValidationError(
+                    "Chaque issue à modifier doit avoir un id"
+                )
+            ids = [item['id'] for item in attrs]
+            self.issues = self.instance.in_bulk(ids)
+            missing = [pk for pk in ids if pk not in self.issues]
+            if missing:
+                raise serializers.ValidationError(
+                    f"Issues introuvables : {missing}"
+                )
+        return attrs
+
+    def create(self, validated_data):
+        return create_issues(validated_data, self.context['batch_size'])
+
+    def update(self, instance, validated_data):
+        return update_issues(
+            self.issues, validated_data, self.context['batch_size']
+            )
+
+
+class IssueBulkSerializer(serializers.ModelSerializer):
+    """
+    Issue à plat pour l'import en masse : le projet est un simple id,
+    sans requête par ligne. `id` n'est accepté qu'en modification
+    (PATCH), voir IssueBulkListSerializer.validate
+    """
+    id = serializers.IntegerField(required=False)
+    author_id = serializers.IntegerField(
+        source='author_id_id', read_only=True
+        )
+    project_id = serializers.IntegerField(source='project_id_id')
+
+    class Meta:
+        model = Issue
+        fields = [
+            'id',
+            'title',
+            'description',
+            'author_id',
+            'project_id',
+            'status',
+            'priority',
+            'tag',
+            'time_created'
+        ]
+        list_serializer_class = IssueBulkListSerializer
+
+
+class CommentSerializer(
+    SparseFieldsSerializerMixin, serializers.ModelSerializer
+):
     author_name = serializers.CharField(
         source='author_id.username', read_only=True
         )
@@ -143,23 +247,39 @@ class CommentSerializer(serializers.ModelSerializer):
             'issue_link'
         ]
         read_only_fields = ['author_id', 'author_name', 'issue_title']
+        expandable = {
+            'author': ('author_id', ['author_name']),
+            'issue': ('issue_id', ['issue_title']),
+        }
+        # Listes rapides (voir api.fast_list)
+        column_fields = {'issue_link': ('issue_id', 'issue_link_for')}
+
+    @cached_property
+    def issue_link_parts(self):
+        # URL d'une issue résolue une seule fois (le serializer enfant
+        # est partagé par toute la liste), autour de la clé 0
+        link = reverse(
+            'issue-detail',
+            kwargs={'pk': 0},
+            request=self.context.get('request')
+            )
+        prefix, _, suffix = link.rpartition('0')
+        return prefix, suffix
+
+    def issue_link_for(self, issue_id):
+        # Sans jointure sur l'issue ni reverse() par commentaire
+        prefix, suffix = self.issue_link_parts
+        return f'{prefix}{issue_id}{suffix}'
 
     def get_issue_link(self, obj):
-        request = self.context.get('request')
-        issue_link = reverse(
-            'issue-detail', kwargs={'pk': obj.issue_id.pk}, request=request
-            )
-        return issue_link
+        return self.issue_link_for(obj.issue_id_id)
 
     def validate(self, data):
-        user = self.context['request'].user
         issue = data.get('issue_id')
 
         # Vérifier que l'utilisateur est contributeur du projet lié à l'issue
-        project = issue.project_id
-        if not Contributor.objects.filter(
-            project_id=project, user_id=user
-        ).exists():
+        membership = get_membership(self.context['request'])
+        if not membership.is_contributor(issue.project_id_id):
             raise serializers.ValidationError(
                 "Vous devez être contributeur du projet pour commenter."
             )
@@ -168,15 +288,27 @@ class CommentSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = self.context['request'].user
-        validated_data['author_id'] = user
+        validated_data['author_id_id'] = user.pk
         return super().create(validated_data)
 
 
-class ProjectDetailSerializer(serializers.ModelSerializer):
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    """
+    Résumé borné d'un projet : compteurs agrégés et dernières
+    issues/commentaires. Les données imbriquées sont préchargées
+    par la vue dans le contexte (voir api.summary)
+    """
     author = serializers.CharField(source='author_id.username', read_only=True)
     contributors = serializers.SerializerMethodField()
-    issues = IssueSerializer(many=True, read_only=True, source='issue_set')
+    issue_count = serializers.IntegerField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    last_activity = serializers.SerializerMethodField()
+    issues_by_status = serializers.SerializerMethodField()
+    issues_by_priority = serializers.SerializerMethodField()
+    issues = serializers.SerializerMethodField()
+    issues_next = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
+    comments_next = serializers.SerializerMethodField()
 
     class Meta:
         model = Project
@@ -188,19 +320,56 @@ class ProjectDetailSerializer(serializers.ModelSerializer):
             'time_created',
             'author',
             'contributors',
+            'issue_count',
+            'comment_count',
+            'last_activity',
+            'issues_by_status',
+            'issues_by_priority',
             'issues',
-            'comments'
+            'issues_next',
+            'comments',
+            'comments_next'
             ]
 
     def get_contributors(self, obj):
-        # Retourne les contributeurs du projet
-        contributors = Contributor.objects.filter(project_id=obj.id)
-        return [{
-            "id": contrib.user_id.id,
-            "username": contrib.user_id.username}
-            for contrib in contributors]
+        # Lit le cache du prefetch_related
+        return [
+            {'id': contributor.id, 'username': contributor.username}
+            for contributor in obj.contributor_id.all()
+            ]
+
+    def get_last_activity(self, obj):
+        # Date la plus récente entre le projet, ses issues et commentaires
+        if obj.last_activity_at is None:
+            return obj.time_created
+        return max(obj.time_created, obj.last_activity_at)
+
+    def get_issues_by_status(self, obj):
+        return self.context['issues_by_status'][obj.id]
+
+    def get_issues_by_priority(self, obj):
+        return self.context['issues_by_priority'][obj.id]
+
+    def get_issues(self, obj):
+        return self.context['issues'][obj.id]
+
+    def get_issues_next(self, obj):
+        # Lien "voir plus" si toutes les issues ne sont pas affichées
+        if obj.issue_count > len(self.context['issues'][obj.id]):
+            return (
+                f"{self.context['issue_url']}"
+                f"?project_id={obj.id}&pagination=cursor"
+                )
+        return None
 
     def get_comments(self, obj):
-        # Retourne les commentaires associés aux issues du projet
-        comments = Comment.objects.filter(issue_id__project_id=obj.id)
-        return CommentSerializer(comments, many=True).data
+        return self.context['comments'][obj.id]
+
+    def get_comments_next(self, obj):
+        # Lien "voir plus" si tous les commentaires ne sont pas affichés
+        if obj.comment_count > len(self.context['comments'][obj.id]):
+            return (
+                f"{self.context['comment_url']}"
+                f"?project_id={obj.id}&pagination=cursor"
+                )
+        return None
@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.db import connections
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Project, Contributor, Issue, Comment, Change
+from .authentication import bump_user_version
+from .cascade import deletion_started, current_deletion, deletion_finished
+from .changes import record_change, record_changes
+from .counters import adjust_project, adjust_issue
+from .membership import invalidate_membership
+from .response_cache import bump_project_version
+from .search import install_sqlite_search
+
+
+def change_action(kwargs):
+    # post_save fournit `created`, post_delete non
+    if 'created' not in kwargs:
+        return Change.Action.DELETED
+    if kwargs['created']:
+        return Change.Action.CREATED
+    return Change.Action.UPDATED
+
+
+@receiver(pre_delete, sender=Project)
+@receiver(pre_delete, sender=Contributor)
+@receiver(pre_delete, sender=Issue)
+@receiver(pre_delete, sender=Comment)
+def object_deleting(sender, instance, origin=None, **kwargs):
+    # Compteurs d'une suppression et de ses cascades : voir api.cascade
+    deletion_started(instance, origin)
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+def contributor_changed(sender, instance, **kwargs):
+    # Un ajout ou retrait de contributeur change ses appartenances
+    invalidate_membership(instance.user_id_id)
+    action = change_action(kwargs)
+    if action == Change.Action.DELETED:
+        # Compteurs, versions et tombstones : voir api.cascade
+        deletion = current_deletion(instance, kwargs.get('origin'))
+        deletion.contributor_deleted(instance)
+        deletion_finished(deletion)
+        return
+    if action == Change.Action.CREATED:
+        # et la liste des contributeurs affichée avec le projet (ETag)
+        adjust_project(instance.project_id_id, contributors=1, touch=True)
+    bump_project_version(instance.project_id_id)
+    record_change(
+        Change.Model.CONTRIBUTOR,
+        instance.pk,
+        instance.project_id_id,
+        action,
+        user_id=instance.user_id_id
+    )
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, instance, **kwargs):
+    # Les projets dont l'utilisateur est l'auteur sont aussi en cache
+    invalidate_membership(instance.author_id_id)
+    action = change_action(kwargs)
+    if action == Change.Action.DELETED:
+        deletion = current_deletion(instance, kwargs.get('origin'))
+        deletion.project_deleted(instance)
+        deletion_finished(deletion)
+        return
+    bump_project_version(instance.pk)
+    record_change(Change.Model.PROJECT, instance.pk, instance.pk, action)
+
+
+@receiver([post_save, post_delete], sender=Issue)
+def issue_changed(sender, instance, **kwargs):
+    action = change_action(kwargs)
+    if action == Change.Action.DELETED:
+        deletion = current_deletion(instance, kwargs.get('origin'))
+        deletion.issue_deleted(instance)
+        deletion_finished(deletion)
+        return
+    if action == Change.Action.CREATED:
+        adjust_project(instance.project_id_id, issues=1, activity=True)
+    bump_project_version(instance.project_id_id)
+    record_change(
+        Change.Model.ISSUE,
+        instance.pk,
+        instance.project_id_id,
+        action
+    )
+
+
+def comment_project_id(comment):
+    # Évite une requête si l'issue est déjà chargée
+    if Comment.issue_id.is_cached(comment):
+        return comment.issue_id.project_id_id
+    return Issue.objects.filter(
+        pk=comment.issue_id_id
+        ).values_list('project_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    action = change_action(kwargs)
+    if action == Change.Action.DELETED:
+        deletion = current_deletion(instance, kwargs.get('origin'))
+        deletion.comment_deleted(instance)
+        deletion_finished(deletion)
+        return
+    project_id = comment_project_id(instance)
+    if action == Change.Action.CREATED:
+        adjust_issue(instance.issue_id_id, 1, activity=True)
+        adjust_project(project_id, comments=1, activity=True)
+    bump_project_version(project_id)
+    record_change(Change.Model.COMMENT, instance.pk, project_id, action)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    # Évite qu'un id réutilisé hérite d'un cache obsolète
+    invalidate_membership(instance.pk)
+    # Les jetons déjà émis sont de nouveau vérifiés en base
+    bump_user_version(instance.pk)
+    if change_action(kwargs) == Change.Action.UPDATED:
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'username' in update_fields:
+            user_projects_changed(instance.pk)
+    if change_action(kwargs) == Change.Action.UPDATED and (
+        not instance.is_active
+    ):
+        # Les flux d'événements ouverts du compte le découvrent comme
+        # un changement de ses appartenances (voir api.events)
+        record_changes(
+            Change.Model.CONTRIBUTOR,
+            Contributor.objects.filter(user_id=instance.pk),
+            Change.Action.UPDATED
+        )
+
+
+def user_projects_changed(user_id):
+    """
+    Le nom de l'utilisateur est affiché avec les projets dont il est
+    l'auteur ou contributeur : leurs réponses en cache sont invalidées
+    et leur updated_at (ETag des projets et de leurs issues) avancé
+    """
+    project_ids = set(
+        Project.objects.filter(
+            Q(author_id=user_id) | Q(contributor_id=user_id)
+        ).values_list('pk', flat=True)
+    )
+    if not project_ids:
+        return
+    Project.objects.filter(pk__in=project_ids).update(
+        updated_at=timezone.now()
+        )
+    for project_id in project_ids:
+        bump_project_version(project_id)
+
+
+def search_index_installed(sender, using, **kwargs):
+    # Recrée les triggers FTS5 supprimés par une reconstruction de
+    # table, tant que l'index existe (migration 0004 non annulée)
+    connection = connections[using]
+    if 'api_issue_fts' in connection.introspection.table_names():
+        install_sqlite_search(connection)
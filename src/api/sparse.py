@@ -0,0 +1,107 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def split_param(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Champs choisis par le client, transmis par la vue dans le contexte :
+    context['fields'] (liste de champs) et context['expand'] (liste de
+    relations). Sans l'un ni l'autre, tous les champs sont retournés.
+
+    Meta.expandable = {relation: (champ FK, [champs lus sur la
+    relation])} : ces champs demandent une jointure et ne sont
+    retournés en mode allégé que si la relation est dans `expand`, ou
+    s'ils sont nommés dans `fields`. Les champs retirés ne sont jamais
+    évalués (SerializerMethodField compris)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        expand = self.context.get('expand')
+        if fields is None and expand is None:
+            return
+        keep = set(self.fields) if fields is None else set(fields)
+        for relation, (_, names) in self.Meta.expandable.items():
+            if expand and relation in expand:
+                keep.update(names)
+            elif fields is None:
+                keep.difference_update(names)
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def sparse_relations(cls, fields, expand):
+        """
+        Champs FK à joindre (select_related) pour ces paramètres
+        """
+        return [
+            lookup
+            for relation, (lookup, names) in cls.Meta.expandable.items()
+            if relation in (expand or [])
+            or set(names) & set(fields or [])
+        ]
+
+
+class SparseFieldsMixin:
+    """
+    Lectures allégées pour les ModelViewSet : ?fields=id,title limite
+    les champs retournés et ?expand=author,project ajoute les champs
+    lus sur ces relations (voir SparseFieldsSerializerMixin). Seules
+    les relations demandées sont jointes. Les écritures retournent
+    toujours tous les champs
+    """
+
+    def get_sparse_params(self):
+        # (fields, expand), None si le paramètre est absent. Lus une
+        # fois par requête
+        if not hasattr(self, '_sparse_params'):
+            self._sparse_params = self.parse_sparse_params()
+        return self._sparse_params
+
+    def parse_sparse_params(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None, None
+        params = request.query_params
+        serializer_class = self.get_serializer_class()
+        fields = expand = None
+        if 'fields' in params:
+            fields = split_param(params['fields'])
+            unknown = set(fields) - set(serializer_class.Meta.fields)
+            if unknown:
+                raise serializers.ValidationError(
+                    {'fields': f'Champs inconnus : {sorted(unknown)}'}
+                )
+        if 'expand' in params:
+            expand = split_param(params['expand'])
+            unknown = set(expand) - set(serializer_class.Meta.expandable)
+            if unknown:
+                raise serializers.ValidationError(
+                    {'expand': f'Relations inconnues : {sorted(unknown)}'}
+                )
+        return fields, expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_sparse_params()
+        if fields is None and expand is None:
+            return queryset
+        relations = self.get_serializer_class().sparse_relations(
+            fields, expand
+            )
+        queryset = queryset.select_related(None)
+        # select_related() sans argument suivrait toutes les clés
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self.get_sparse_params()
+        return context
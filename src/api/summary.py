@@ -0,0 +1,109 @@
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.reverse import reverse
+from .models import Project, Issue, Comment
+
+
+# Nombre maximum d'issues et de commentaires imbriqués par projet
+SUMMARY_ISSUES_LIMIT = 5
+SUMMARY_COMMENTS_LIMIT = 5
+
+
+def summary_queryset():
+    """
+    Retourne les projets avec leurs compteurs d'issues et de
+    commentaires et leur dernière activité, tenus à jour dans la
+    table des projets (voir api.counters)
+    """
+    return (
+        Project.objects.select_related('author_id')
+        .prefetch_related('contributor_id')
+        .order_by('-time_created', '-id')
+    )
+
+
+def _count_by(project_ids, field):
+    # Une seule requête GROUP BY (projet, champ) pour toute la page
+    counts = {project_id: {} for project_id in project_ids}
+    rows = (
+        Issue.objects.filter(project_id__in=project_ids)
+        .order_by()
+        .values_list('project_id', field)
+        .annotate(total=Count('id'))
+    )
+    for project_id, value, total in rows:
+        counts[project_id][value] = total
+    return counts
+
+
+def _latest_per_project(queryset, partition, limit):
+    # Les `limit` lignes les plus récentes de chaque projet
+    return (
+        queryset.annotate(
+            rank=Window(
+                expression=RowNumber(),
+                partition_by=[F(partition)],
+                order_by=[F('time_created').desc(), F('id').desc()],
+            )
+        )
+        .filter(rank__lte=limit)
+        .order_by('-time_created', '-id')
+    )
+
+
+def build_summary_context(projects, request):
+    """
+    Charge en un nombre fixe de requêtes les données imbriquées
+    (compteurs par statut/priorité, dernières issues et
+    derniers commentaires) pour une page de projets
+    """
+    project_ids = [project.id for project in projects]
+    issue_url = reverse('issue-list', request=request)
+
+    issues = {project_id: [] for project_id in project_ids}
+    latest_issues = _latest_per_project(
+        Issue.objects.filter(project_id__in=project_ids)
+        .select_related('author_id'),
+        'project_id',
+        SUMMARY_ISSUES_LIMIT,
+    )
+    for issue in latest_issues:
+        issues[issue.project_id_id].append({
+            'id': issue.id,
+            'title': issue.title,
+            'author_id': issue.author_id_id,
+            'author_name': issue.author_id.username,
+            'status': issue.status,
+            'priority': issue.priority,
+            'tag': issue.tag,
+            'time_created': issue.time_created,
+        })
+
+    comments = {project_id: [] for project_id in project_ids}
+    latest_comments = _latest_per_project(
+        Comment.objects.filter(issue_id__project_id__in=project_ids)
+        .select_related('author_id', 'issue_id'),
+        'issue_id__project_id',
+        SUMMARY_COMMENTS_LIMIT,
+    )
+    for comment in latest_comments:
+        comments[comment.issue_id.project_id_id].append({
+            'id': comment.id,
+            'uuid': comment.uuid,
+            'description': comment.description,
+            'time_created': comment.time_created,
+            'author_id': comment.author_id_id,
+            'author_name': comment.author_id.username,
+            'issue_id': comment.issue_id_id,
+            'issue_title': comment.issue_id.title,
+            'issue_link': f'{issue_url}{comment.issue_id_id}/',
+        })
+
+    return {
+        'issue_url': issue_url,
+        'comment_url': reverse('comment-list', request=request),
+        'issues_by_status': _count_by(project_ids, 'status'),
+        'issues_by_priority': _count_by(project_ids, 'priority'),
+        'issues': issues,
+        'comments': comments,
+    }
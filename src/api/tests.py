@@ -1,3 +1,2243 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from .models import Project, Contributor, Issue, Comment, Change
+from .events import get_broker, stream_events
+from .replicas import ReplicaRoutingMiddleware, STICKY_COOKIE
+from .replicas import read_from_replica
+from .instrumentation import registry
+from .benchmarks import ENDPOINTS, router_routes, compare
+from .datasets import generate_dataset
+from .renderers import FastJSONRenderer
+from .compression import CODECS, choose_encoding
+from .views import IssueViewSet, ChangesView
+from .membership import load_membership
+from .caches import cache_is_shared, check_shared_cache
+from .response_cache import project_summary_cache
+from .summary import SUMMARY_ISSUES_LIMIT, SUMMARY_COMMENTS_LIMIT
+from api_user.models import User, DeletionJob
+from api_user.deletion import claim, delete_chunk, run_job, STEPS
+from api_user.deletion import run_pending_jobs
+from softdesk.database import database_config
 
-# Create your tests here.
+
+class ProjectTestCase(APITestCase):
+    """
+    Base des tests de l'API : l'utilisateur 'robert', authentifié,
+    auteur et contributeur du projet self.project. Les helpers créent
+    les objets avec les valeurs par défaut des tests, modifiables par
+    mots-clés
+    """
+    # Mot de passe des comptes créés (None : pas de mot de passe)
+    password = None
+    # Client authentifié par force_authenticate
+    authenticate = True
+
+    def setUp(self):
+        self.user = self.create_user('robert')
+        if self.authenticate:
+            self.client.force_authenticate(user=self.user)
+        self.project = self.create_project(self.user)
+
+    def create_user(self, username):
+        return User.objects.create_user(
+            username=username, password=self.password
+            )
+
+    def create_project(self, author, members=None, **fields):
+        # members : contributeurs du projet (par défaut, l'auteur)
+        project = Project.objects.create(**{
+            'title': 'Projet',
+            'description': 'Description',
+            'type': 'back-end',
+            'author_id': author,
+            **fields,
+        })
+        for user in [author] if members is None else members:
+            Contributor.objects.create(user_id=user, project_id=project)
+        return project
+
+    def create_issue(self, author, project, **fields):
+        return Issue.objects.create(**{
+            'title': 'Issue',
+            'description': 'Description',
+            'author_id': author,
+            'project_id': project,
+            'status': 'TO_DO',
+            'priority': 'LOW',
+            'tag': 'BUG',
+            **fields,
+        })
+
+    def create_comment(self, author, issue, **fields):
+        return Comment.objects.create(**{
+            'description': 'Commentaire',
+            'author_id': author,
+            'issue_id': issue,
+            **fields,
+        })
+
+
+class ProjectListQueryCountTest(ProjectTestCase):
+    """
+    Vérifie que la liste des projets exécute un nombre
+    constant de requêtes, quelle que soit la taille de la page
+    """
+
+    def setUp(self):
+        self.user = self.create_user('robert')
+        self.client.force_authenticate(user=self.user)
+
+    def create_projects(self, count):
+        for index in range(count):
+            author = self.create_user(f'auteur{Project.objects.count()}')
+            self.create_project(
+                author, [author, self.user], title=f'Projet {index}'
+                )
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/projects/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.create_projects(2)
+        small_page = self.count_list_queries()
+
+        self.create_projects(8)
+        full_page = self.count_list_queries()
+
+        self.assertEqual(small_page, full_page)
+
+
+class ProjectSummaryQueryCountTest(ProjectTestCase):
+    """
+    Vérifie que le résumé des projets exécute un nombre fixe de
+    requêtes et borne les issues et commentaires imbriqués
+    """
+
+    def setUp(self):
+        self.user = self.create_user('robert')
+        self.client.force_authenticate(user=self.user)
+
+    def create_filled_project(self, issues, comments_per_issue):
+        project = self.create_project(self.user)
+        for index in range(issues):
+            issue = self.create_issue(
+                self.user,
+                project,
+                title=f'Issue {index}',
+                priority='HIGH' if index % 2 else 'LOW'
+            )
+            for _ in range(comments_per_issue):
+                self.create_comment(self.user, issue)
+        return project
+
+    def get_summary(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/projects/project_summary/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_query_count_is_fixed(self):
+        self.create_filled_project(issues=1, comments_per_issue=1)
+        _, small = self.get_summary()
+
+        for _ in range(4):
+            self.create_filled_project(issues=8, comments_per_issue=3)
+        _, large = self.get_summary()
+
+        self.assertEqual(small, large)
+
+    def test_nested_rows_are_capped(self):
+        project = self.create_filled_project(issues=8, comments_per_issue=3)
+        response, _ = self.get_summary()
+        summary = response.data['results'][0]
+
+        self.assertEqual(summary['issue_count'], 8)
+        self.assertEqual(summary['comment_count'], 24)
+        self.assertEqual(summary['issues_by_status'], {'TO_DO': 8})
+        self.assertEqual(
+            summary['issues_by_priority'], {'HIGH': 4, 'LOW': 4}
+            )
+        self.assertEqual(len(summary['issues']), SUMMARY_ISSUES_LIMIT)
+        self.assertEqual(len(summary['comments']), SUMMARY_COMMENTS_LIMIT)
+        self.assertTrue(
+            summary['issues_next'].endswith(
+                f'?project_id={project.id}&pagination=cursor'
+                )
+            )
+        self.assertTrue(
+            summary['comments_next'].endswith(
+                f'?project_id={project.id}&pagination=cursor'
+                )
+            )
+
+
+class IssueCursorPaginationTest(ProjectTestCase):
+    """
+    Vérifie la pagination par curseur (time_created, id) des issues
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.issues = [
+            self.create_issue(self.user, self.project, title=f'Issue {index}')
+            for index in range(7)
+        ]
+
+    def test_walks_every_issue_once(self):
+        url = '/api/issues/?pagination=cursor&page_size=3'
+        seen = []
+        query_counts = []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            queries = [query['sql'] for query in context.captured_queries]
+            self.assertFalse(any('COUNT(' in sql for sql in queries))
+            query_counts.append(len(queries))
+            seen.extend(issue['id'] for issue in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [issue.id for issue in self.issues])
+        # Deux pages pleines coûtent le même nombre de requêtes
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/issues/?cursor=invalide')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination_by_default(self):
+        response = self.client.get('/api/issues/')
+        self.assertEqual(response.data['count'], 7)
+
+
+class MembershipTest(ProjectTestCase):
+    """
+    Vérifie que les appartenances sont chargées une seule fois
+    par requête et que le cache est invalidé par les signaux
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.contributor = Contributor.objects.get(
+            user_id=self.user, project_id=self.project
+            )
+        self.issue = self.create_issue(self.user, self.project)
+
+    def test_membership_loaded_once_per_request(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                f'/api/issues/{self.issue.id}/',
+                {'title': 'Nouveau titre', 'project_id': self.project.id}
+                )
+        self.assertEqual(response.status_code, 200)
+        membership_queries = [
+            query for query in context.captured_queries
+            if 'FROM "api_contributor"' in query['sql']
+        ]
+        self.assertLessEqual(len(membership_queries), 1)
+
+    def test_cache_invalidated_when_contributor_removed(self):
+        self.assertTrue(
+            load_membership(self.user.id).is_contributor(self.project.id)
+            )
+        self.contributor.delete()
+        self.assertFalse(
+            load_membership(self.user.id).is_contributor(self.project.id)
+            )
+
+    @override_settings(MEMBERSHIP_CACHE_TIMEOUT=300)
+    def test_cache_requires_shared_cache(self):
+        key = f'api:membership:{self.user.id}'
+        load_membership(self.user.id)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['api.W002']
+        )
+
+        with override_settings(SHARED_CACHE=True):
+            load_membership(self.user.id)
+            self.assertIsNotNone(cache.get(key))
+            self.contributor.delete()
+            self.assertIsNone(cache.get(key))
+
+    def test_non_contributor_cannot_create_issue(self):
+        self.contributor.delete()
+        response = self.client.post('/api/issues/', {
+            'title': 'Issue',
+            'description': 'Description',
+            'project_id': self.project.id,
+            'status': 'TO_DO',
+            'priority': 'LOW',
+            'tag': 'BUG',
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class MemberQuerysetTest(ProjectTestCase):
+    """
+    Vérifie que les listes ne contiennent que les données
+    des projets dont l'utilisateur est contributeur
+    """
+
+    def setUp(self):
+        self.user = self.create_user('robert')
+        self.other = self.create_user('julie')
+        self.client.force_authenticate(user=self.user)
+        self.own_issue = self.create_member_issue(self.user, 'Mon projet')
+        self.other_issue = self.create_member_issue(
+            self.other, 'Autre projet'
+            )
+
+    def create_member_issue(self, user, title):
+        # Projet de l'utilisateur, avec une issue commentée
+        project = self.create_project(user, title=title)
+        issue = self.create_issue(user, project, title=title)
+        self.create_comment(user, issue)
+        return issue
+
+    def list_ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_issues_are_scoped(self):
+        self.assertEqual(self.list_ids('/api/issues/'), [self.own_issue.id])
+
+    def test_comments_are_scoped(self):
+        comment = self.own_issue.comment_set.get()
+        self.assertEqual(self.list_ids('/api/comments/'), [comment.id])
+
+    def test_contributors_are_scoped(self):
+        contributor = Contributor.objects.get(user_id=self.user)
+        self.assertEqual(
+            self.list_ids('/api/contributors/'), [contributor.id]
+            )
+
+    def test_other_project_issue_is_hidden(self):
+        response = self.client.get(f'/api/issues/{self.other_issue.id}/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ContributorBulkTest(ProjectTestCase):
+    """
+    Vérifie l'ajout et le retrait de contributeurs en masse
+    """
+
+    def setUp(self):
+        self.user = self.create_user('robert')
+        self.client.force_authenticate(user=self.user)
+        # Projet sans contributeur
+        self.project = self.create_project(self.user, [])
+        self.users = [
+            self.create_user(f'membre{index}') for index in range(20)
+        ]
+
+    def test_bulk_add_reports_each_id(self):
+        Contributor.objects.create(
+            user_id=self.users[0], project_id=self.project
+            )
+        user_ids = [user.id for user in self.users] + [999999]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                '/api/contributors/bulk/',
+                {'project_id': self.project.id, 'user_ids': user_ids},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        # Le nombre de requêtes ne dépend pas du nombre d'ids
+        # (21 ids ici, journal des changements compris)
+        self.assertLessEqual(len(context.captured_queries), 12)
+
+        statuses = {
+            row['user_id']: row['status'] for row in response.data['results']
+            }
+        self.assertEqual(statuses[self.users[0].id], 'already_contributor')
+        self.assertEqual(statuses[self.users[1].id], 'added')
+        self.assertEqual(statuses[999999], 'not_found')
+        self.assertEqual(
+            Contributor.objects.filter(project_id=self.project).count(), 20
+            )
+
+    def test_bulk_remove(self):
+        for user in self.users[:3]:
+            Contributor.objects.create(user_id=user, project_id=self.project)
+        response = self.client.delete(
+            '/api/contributors/bulk/',
+            {
+                'project_id': self.project.id,
+                'user_ids': [self.users[0].id, self.users[5].id]
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['status'] for row in response.data['results']],
+            ['removed', 'not_contributor']
+        )
+        self.assertEqual(
+            Contributor.objects.filter(project_id=self.project).count(), 2
+            )
+
+    def test_bulk_remove_query_count(self):
+        def remove(users):
+            for user in users:
+                Contributor.objects.create(
+                    user_id=user, project_id=self.project
+                    )
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.delete(
+                    '/api/contributors/bulk/',
+                    {
+                        'project_id': self.project.id,
+                        'user_ids': [user.id for user in users]
+                    },
+                    format='json'
+                )
+            self.assertEqual(response.status_code, 200)
+            return len(context.captured_queries)
+
+        # Le nombre de requêtes ne dépend pas du nombre de contributeurs
+        self.assertEqual(remove(self.users[:2]), remove(self.users[2:]))
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.contributor_count, 0)
+        self.assertEqual(
+            Change.objects.filter(
+                model=Change.Model.CONTRIBUTOR, action=Change.Action.DELETED
+                ).count(),
+            20
+        )
+        self.assertFalse(
+            load_membership(self.users[0].id).is_contributor(self.project.id)
+            )
+
+    def test_only_author_can_bulk_add(self):
+        other = self.create_user('julie')
+        self.client.force_authenticate(user=other)
+        response = self.client.post(
+            '/api/contributors/bulk/',
+            {'project_id': self.project.id, 'user_ids': [other.id]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class IssueBulkTest(ProjectTestCase):
+    """
+    Vérifie l'import et la mise à jour d'issues en masse
+    """
+
+    def issue_data(self, index, project_id=None):
+        return {
+            'title': f'Issue {index}',
+            'description': 'Description',
+            'project_id': project_id or self.project.id,
+            'status': 'TO_DO',
+            'priority': 'LOW',
+            'tag': 'BUG',
+        }
+
+    def test_bulk_create_in_batches(self):
+        data = [self.issue_data(index) for index in range(25)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                '/api/issues/bulk/?batch_size=10', data, format='json'
+                )
+        self.assertEqual(response.status_code, 201)
+        inserts = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "api_issue"')
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(Issue.objects.filter(author_id=self.user).count(), 25)
+        self.assertEqual(response.data[0]['author_id'], self.user.id)
+
+    def test_bulk_create_requires_membership(self):
+        other = self.create_project(self.user, [], title='Autre')
+        data = [self.issue_data(0), self.issue_data(1, project_id=other.id)]
+        response = self.client.post('/api/issues/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Issue.objects.exists())
+
+    def test_bulk_create_rejects_id(self):
+        self.client.post(
+            '/api/issues/bulk/', [self.issue_data(0)], format='json'
+            )
+        existing = Issue.objects.get()
+        # Id libre ou déjà pris : refusé, sans erreur 500
+        for issue_id in [999, existing.id]:
+            data = [{**self.issue_data(1), 'id': issue_id}]
+            response = self.client.post(
+                '/api/issues/bulk/', data, format='json'
+                )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            list(Issue.objects.values_list('id', flat=True)), [existing.id]
+            )
+
+    def test_bulk_update(self):
+        self.client.post(
+            '/api/issues/bulk/',
+            [self.issue_data(index) for index in range(3)],
+            format='json'
+        )
+        issues = list(Issue.objects.order_by('id'))
+        data = [
+            {'id': issue.id, 'status': 'FINISHED'} for issue in issues[:2]
+            ]
+        response = self.client.patch('/api/issues/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        statuses = Issue.objects.order_by('id').values_list(
+            'status', flat=True
+            )
+        self.assertEqual(list(statuses), ['FINISHED', 'FINISHED', 'TO_DO'])
+
+    def test_bulk_update_unknown_issue(self):
+        response = self.client.patch(
+            '/api/issues/bulk/', [{'id': 999999, 'status': 'FINISHED'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ProjectExportTest(ProjectTestCase):
+    """
+    Vérifie l'export en flux d'un projet
+    """
+
+    def setUp(self):
+        super().setUp()
+        issue = self.create_issue(self.user, self.project)
+        self.create_comment(self.user, issue)
+
+    def export(self, output):
+        response = self.client.get(
+            f'/api/projects/{self.project.id}/export/?output={output}'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        lines = self.export('ndjson').splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['type'] for row in rows], ['issue', 'comment'])
+        self.assertEqual(rows[0]['author_name'], 'robert')
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual([row['type'] for row in rows], ['issue', 'comment'])
+        self.assertEqual(rows[1]['description'], 'Commentaire')
+
+    def test_requires_membership(self):
+        other = self.create_user('julie')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f'/api/projects/{self.project.id}/export/')
+        self.assertEqual(response.status_code, 403)
+
+
+class SearchTest(ProjectTestCase):
+    """
+    Vérifie la recherche plein texte limitée aux projets de l'utilisateur
+    """
+
+    def setUp(self):
+        self.user = self.create_user('robert')
+        self.other = self.create_user('julie')
+        self.client.force_authenticate(user=self.user)
+        self.issue = self.create_member_issue(
+            self.user, 'Erreur de connexion'
+            )
+        self.create_member_issue(self.other, 'Erreur de connexion ailleurs')
+        self.create_comment(
+            self.user,
+            self.issue,
+            description='La connexion échoue aussi sur mobile'
+        )
+
+    def create_member_issue(self, user, title):
+        # Issue dans un projet de l'utilisateur
+        return self.create_issue(
+            user, self.create_project(user), title=title
+            )
+
+    def search(self, query):
+        response = self.client.get('/api/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_hits_are_scoped_to_user_projects(self):
+        comment = self.issue.comment_set.get()
+        hits = self.search('connexion')
+        self.assertEqual(
+            sorted((hit['type'], hit['id']) for hit in hits),
+            [('comment', comment.id), ('issue', self.issue.id)]
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        Issue.objects.filter(id=self.issue.id).update(title='Plantage')
+        self.assertEqual(
+            [hit['type'] for hit in self.search('plantage')], ['issue']
+            )
+        self.issue.delete()
+        self.assertEqual(self.search('plantage'), [])
+
+    def test_accents_are_ignored(self):
+        self.assertEqual(
+            [hit['type'] for hit in self.search('echoue')], ['comment']
+            )
+
+    @override_settings(SEARCH_BACKEND='api.search.BasicSearchBackend')
+    def test_basic_backend(self):
+        hits = self.search('connexion')
+        self.assertEqual(
+            sorted(hit['type'] for hit in hits), ['comment', 'issue']
+            )
+
+    @override_settings(SEARCH_BACKEND='api.search.BasicSearchBackend')
+    def test_basic_backend_ranks_by_occurrences(self):
+        comment = self.create_comment(
+            self.user,
+            self.issue,
+            description='Connexion refusée, puis connexion perdue'
+        )
+        hits = self.search('connexion')
+        self.assertEqual(
+            (hits[0]['type'], hits[0]['id'], hits[0]['rank']),
+            ('comment', comment.id, -2)
+        )
+        self.assertEqual([hit['rank'] for hit in hits[1:]], [-1, -1])
+
+    def test_query_is_required(self):
+        response = self.client.get('/api/search/')
+        self.assertEqual(response.status_code, 400)
+
+
+class IssueFilterTest(ProjectTestCase):
+    """
+    Vérifie le filtrage et le tri des issues par paramètres de requête
+    """
+
+    def setUp(self):
+        super().setUp()
+        for status_, priority in [
+            ('TO_DO', 'HIGH'), ('IN_PROGRESS', 'LOW'),
+            ('FINISHED', 'HIGH'), ('TO_DO', 'LOW'),
+        ]:
+            self.create_issue(
+                self.user,
+                self.project,
+                title=f'{status_} {priority}',
+                status=status_,
+                priority=priority
+            )
+
+    def titles(self, params):
+        response = self.client.get('/api/issues/', params)
+        self.assertEqual(response.status_code, 200)
+        return [issue['title'] for issue in response.data['results']]
+
+    def test_filter_by_status_and_priority(self):
+        self.assertEqual(
+            self.titles({'status': 'TO_DO,IN_PROGRESS', 'priority': 'LOW'}),
+            ['IN_PROGRESS LOW', 'TO_DO LOW']
+        )
+
+    def test_ordering(self):
+        self.assertEqual(
+            self.titles({'ordering': '-id', 'project_id': self.project.id}),
+            ['TO_DO LOW', 'FINISHED HIGH', 'IN_PROGRESS LOW', 'TO_DO HIGH']
+        )
+
+    def test_priority_ordering_by_importance(self):
+        self.create_issue(
+            self.user, self.project, title='TO_DO MEDIUM', priority='MEDIUM'
+            )
+        priorities = [
+            title.split()[1]
+            for title in self.titles({'ordering': 'priority,id'})
+        ]
+        self.assertEqual(priorities, ['LOW', 'LOW', 'MEDIUM', 'HIGH', 'HIGH'])
+        self.assertEqual(
+            self.titles({'ordering': '-priority,id'})[:3],
+            ['TO_DO HIGH', 'FINISHED HIGH', 'TO_DO MEDIUM']
+        )
+
+    def test_time_range(self):
+        self.assertEqual(
+            self.titles({'created_after': '2999-01-01T00:00:00Z'}), []
+            )
+
+    def test_invalid_value(self):
+        response = self.client.get('/api/issues/', {'status': 'UNKNOWN'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.data)
+
+
+class ConditionalRequestTest(ProjectTestCase):
+    """
+    Vérifie les réponses 304 (ETag / Last-Modified) et 412 (If-Match)
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.issue = self.create_issue(self.user, self.project)
+
+    def test_list_not_modified(self):
+        response = self.client.get('/api/issues/')
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Seul l'agrégat est exécuté, pas la liste paginée
+        self.assertEqual(len(context.captured_queries), 1)
+
+        self.issue.title = 'Nouveau titre'
+        self.issue.save()
+        response = self.client.get('/api/issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_version_includes_related_rows(self):
+        self.create_comment(self.user, self.issue)
+        # Le projet affiché dans la liste des issues est renommé
+        etag = self.client.get('/api/issues/')['ETag']
+        Project.objects.filter(pk=self.project.pk).update(
+            title='Renommé', updated_at=timezone.now()
+            )
+        response = self.client.get('/api/issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # De même pour l'issue des commentaires
+        etag = self.client.get('/api/comments/')['ETag']
+        Issue.objects.filter(pk=self.issue.pk).update(
+            title='Renommée', updated_at=timezone.now()
+            )
+        response = self.client.get(
+            '/api/comments/', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_version_includes_related_rows(self):
+        comment = self.create_comment(self.user, self.issue)
+        url = f'/api/issues/{self.issue.id}/'
+        etag = self.client.get(url)['ETag']
+        Project.objects.filter(pk=self.project.pk).update(
+            title='Renommé', updated_at=timezone.now()
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['project_name'], 'Renommé')
+
+        url = f'/api/comments/{comment.id}/'
+        etag = self.client.get(url)['ETag']
+        Issue.objects.filter(pk=self.issue.pk).update(
+            title='Renommée', updated_at=timezone.now()
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_ignores_if_modified_since(self):
+        response = self.client.get('/api/issues/')
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        since = http_date(time.time() + 3600)
+
+        Issue.objects.filter(pk=self.issue.pk).delete()
+        response = self.client.get(
+            '/api/issues/', HTTP_IF_MODIFIED_SINCE=since
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get('/api/issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        response = self.client.get(f'/api/projects/{self.project.id}/')
+        response = self.client.get(
+            f'/api/projects/{self.project.id}/',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_contributor_changes_project_etag(self):
+        url = f'/api/projects/{self.project.id}/'
+        etag = self.client.get(url)['ETag']
+        other = self.create_user('julie')
+        Contributor.objects.create(user_id=other, project_id=self.project)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_match(self):
+        url = f'/api/issues/{self.issue.id}/'
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.patch(
+            url,
+            {'title': 'Premier', 'project_id': self.project.id},
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # L'ancienne version n'est plus valide
+        response = self.client.patch(
+            url,
+            {'title': 'Second', 'project_id': self.project.id},
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.title, 'Premier')
+
+    def test_if_match_reads_object_once(self):
+        url = f'/api/issues/{self.issue.id}/'
+        data = {'title': 'Premier', 'project_id': self.project.id}
+
+        def issue_reads(**headers):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.patch(url, data, **headers)
+            self.assertEqual(response.status_code, 200)
+            return [
+                query for query in context.captured_queries
+                if query['sql'].startswith('SELECT')
+                and 'FROM "api_issue"' in query['sql']
+            ]
+
+        without = issue_reads()
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(len(issue_reads(HTTP_IF_MATCH=etag)), len(without))
+
+        # La lecture vérifiée est verrouillée jusqu'à l'écriture
+        etag = self.client.get(url)['ETag']
+        with mock.patch(
+            'django.db.models.QuerySet.select_for_update', autospec=True,
+            side_effect=lambda queryset, **kwargs: queryset
+        ) as select_for_update:
+            issue_reads(HTTP_IF_MATCH=etag)
+        select_for_update.assert_called_once()
+
+
+class ProjectResponseCacheTest(ProjectTestCase):
+    """
+    Vérifie le cache versionné du détail et du résumé des projets
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.issue = self.create_issue(self.user, self.project)
+        self.url = f'/api/projects/{self.project.id}/'
+
+    def test_detail_hit_without_queries(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['title'], 'Projet')
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_detail_hit_checks_permissions(self):
+        self.client.get(self.url)
+        with mock.patch(
+            'api.permissions.ProjectPermission.has_object_permission',
+            return_value=False
+        ) as has_object_permission:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        checked = has_object_permission.call_args.args[2]
+        self.assertEqual(checked.author_id_id, self.user.pk)
+
+    def test_detail_invalidated_by_user_rename(self):
+        etag = self.client.get(self.url)['ETag']
+        issue_url = f'/api/issues/{self.issue.id}/'
+        issue_etag = self.client.get(issue_url)['ETag']
+        self.user.username = 'roberta'
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['author']['username'], 'roberta')
+        self.assertNotEqual(self.client.get(issue_url)['ETag'], issue_etag)
+
+    def test_detail_invalidated_by_contributor(self):
+        self.client.get(self.url)
+        other = self.create_user('julie')
+        Contributor.objects.create(user_id=other, project_id=self.project)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['contributors']), 2)
+
+    def test_summary_invalidated_by_comment(self):
+        self.client.get('/api/projects/project_summary/')
+        before = project_summary_cache.stats()
+
+        response = self.client.get('/api/projects/project_summary/')
+        self.assertEqual(response.data['results'][0]['comment_count'], 0)
+        after_hit = project_summary_cache.stats()
+        self.assertEqual(after_hit['hits'], before['hits'] + 1)
+
+        self.create_comment(self.user, self.issue)
+        response = self.client.get('/api/projects/project_summary/')
+        self.assertEqual(response.data['results'][0]['comment_count'], 1)
+        self.assertEqual(
+            project_summary_cache.stats()['misses'], after_hit['misses'] + 1
+            )
+
+    @override_settings(RESPONSE_CACHE_MAX_ENTRY_SIZE=10)
+    def test_oversized_entries_are_not_stored(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+    def test_replica_reads_are_not_stored(self):
+        # Une réplique en retard ne remplit pas le cache
+        with mock.patch(
+            'api.response_cache.read_from_replica', return_value=True
+        ):
+            self.client.get(self.url)
+            self.client.get('/api/projects/project_summary/')
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(project_summary_cache.stats()['replica_reads'], 1)
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+
+
+class ChangesTest(ProjectTestCase):
+    """
+    Vérifie la synchronisation incrémentale et les tombstones
+    """
+
+    def sync(self, since, limit=None):
+        params = {'since': since}
+        if limit:
+            params['limit'] = limit
+        response = self.client.get('/api/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_only_new_changes_are_returned(self):
+        cursor = self.sync(0)['cursor']
+        issue = self.create_issue(self.user, self.project)
+
+        data = self.sync(cursor)
+        self.assertEqual(
+            [(c['model'], c['id'], c['action']) for c in data['changes']],
+            [('issue', issue.id, 'created')]
+        )
+        self.assertEqual(data['changes'][0]['data']['title'], 'Issue')
+        self.assertEqual(self.sync(data['cursor'])['changes'], [])
+
+    def test_delete_leaves_tombstone(self):
+        issue = self.create_issue(self.user, self.project)
+        self.create_comment(self.user, issue)
+        cursor = self.sync(0)['cursor']
+        issue_id = issue.id
+        issue.delete()
+
+        changes = self.sync(cursor)['changes']
+        self.assertEqual(
+            sorted((c['model'], c['action']) for c in changes),
+            [('comment', 'deleted'), ('issue', 'deleted')]
+        )
+        self.assertIn(issue_id, [c['id'] for c in changes])
+        self.assertIsNone(changes[0]['data'])
+
+    def test_changes_are_merged_and_paginated(self):
+        issue = self.create_issue(self.user, self.project)
+        issue.title = 'Modifiée'
+        issue.save()
+        data = self.sync(0, limit=2)
+        self.assertTrue(data['has_more'])
+
+        data = self.sync(data['cursor'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(
+            [(c['model'], c['action']) for c in data['changes']],
+            [('issue', 'updated')]
+        )
+
+    def test_other_projects_are_excluded(self):
+        other = self.create_user('julie')
+        project = self.create_project(other, [], title='Autre')
+        cursor = self.sync(0)['cursor']
+        self.create_issue(self.user, project)
+        self.assertEqual(self.sync(cursor)['changes'], [])
+
+    def test_joined_project_is_resynced(self):
+        other = self.create_user('julie')
+        project = self.create_project(other, [], title='Autre')
+        issue = self.create_issue(self.user, project)
+        # Le curseur dépasse l'historique du projet encore invisible
+        self.create_issue(self.user, self.project)
+        data = self.sync(0)
+        self.assertEqual(data['resync'], [])
+
+        Contributor.objects.create(user_id=self.user, project_id=project)
+        data = self.sync(data['cursor'])
+        self.assertEqual(data['resync'], [project.id])
+        self.assertEqual(
+            [c['model'] for c in data['changes']], ['contributor']
+            )
+
+        # Historique complet du projet rejoint
+        response = self.client.get(
+            '/api/changes/', {'since': 0, 'project': project.id}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted((c['model'], c['id']) for c in response.data['changes']
+                   if c['model'] != 'contributor'),
+            [('issue', issue.id), ('project', project.id)]
+        )
+
+        # Un projet créé après `since` est déjà complet
+        project = self.create_project(self.user, title='Nouveau')
+        self.assertEqual(self.sync(data['cursor'])['resync'], [])
+
+    def test_resync_requires_membership(self):
+        other = self.create_user('julie')
+        project = self.create_project(other, [], title='Autre')
+        response = self.client.get(
+            '/api/changes/', {'since': 0, 'project': project.id}
+            )
+        self.assertEqual(response.status_code, 403)
+
+    def test_removed_membership_is_reported(self):
+        cursor = self.sync(0)['cursor']
+        Contributor.objects.filter(user_id=self.user).delete()
+        changes = self.sync(cursor)['changes']
+        self.assertEqual(
+            [(c['model'], c['action']) for c in changes],
+            [('contributor', 'deleted')]
+        )
+
+    def test_late_commit_is_not_skipped(self):
+        issue = self.create_issue(self.user, self.project)
+        cursor = self.sync(0)['cursor']
+        late_id = Change.objects.latest('id').id + 1
+
+        # Une transaction plus courte valide un id plus grand...
+        Change.objects.create(
+            id=late_id + 1,
+            model=Change.Model.ISSUE,
+            object_id=issue.id,
+            project_id=self.project.id,
+            action=Change.Action.UPDATED
+        )
+        data = self.sync(cursor)
+        self.assertEqual(len(data['changes']), 1)
+
+        # ... avant la transaction longue qui avait réservé late_id
+        Change.objects.create(
+            id=late_id,
+            model=Change.Model.ISSUE,
+            object_id=issue.id,
+            project_id=self.project.id,
+            action=Change.Action.DELETED
+        )
+        changes = self.sync(data['cursor'])['changes']
+        self.assertEqual(
+            [(c['id'], c['action']) for c in changes],
+            [(issue.id, 'deleted')]
+        )
+        self.assertGreater(changes[0]['cursor'], data['cursor'])
+
+    def test_cascade_tombstones_are_inserted_once(self):
+        for _ in range(3):
+            issue = self.create_issue(self.user, self.project)
+            for _ in range(2):
+                self.create_comment(self.user, issue)
+        cursor = self.sync(0)['cursor']
+        comments = Comment.objects.filter(
+            issue_id__project_id=self.project
+            ).order_by('id')
+        comment_ids = list(comments.values_list('id', flat=True))
+        project_id = self.project.id
+
+        # Commentaires seuls : une requête pour leurs projets
+        with CaptureQueriesContext(connection) as context:
+            Comment.objects.filter(pk__in=comment_ids[:2]).delete()
+        sql = [query['sql'] for query in context.captured_queries]
+        self.assertEqual(
+            len([s for s in sql if s.startswith('INSERT INTO "api_change"')]),
+            1
+        )
+        self.assertEqual(
+            len([s for s in sql if 'FROM "api_issue"' in s
+                 and s.startswith('SELECT')]),
+            1
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            self.project.delete()
+        self.assertEqual(
+            len([query for query in context.captured_queries
+                 if query['sql'].startswith('INSERT INTO "api_change"')]),
+            1
+        )
+
+        tombstones = Change.objects.filter(
+            id__gt=cursor, action=Change.Action.DELETED
+            )
+        self.assertEqual(
+            sorted(tombstones.filter(
+                model=Change.Model.COMMENT
+                ).values_list('object_id', 'project_id')),
+            [(pk, project_id) for pk in comment_ids]
+        )
+        self.assertEqual(
+            sorted(tombstones.values_list('model', flat=True)),
+            sorted(
+                [Change.Model.COMMENT] * 6 + [Change.Model.CONTRIBUTOR]
+                + [Change.Model.ISSUE] * 3 + [Change.Model.PROJECT]
+            )
+        )
+
+
+class EventStreamTest(ProjectTestCase):
+    """
+    Vérifie le flux d'événements : filtrage par projet, relecture
+    après reconnexion et débordement des clients lents
+    """
+
+    authenticate = False
+
+    def change(self, cursor, project_id=None):
+        return Change(
+            id=cursor,
+            sequence=cursor,
+            model=Change.Model.ISSUE,
+            object_id=cursor,
+            project_id=project_id or self.project.id,
+            action=Change.Action.CREATED
+        )
+
+    def test_authentication_is_required(self):
+        response = self.client.get('/api/events/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_only_member_projects_are_streamed(self):
+        stream = stream_events(self.user.id, {self.project.id})
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        get_broker().publish([
+            self.change(1, project_id=self.project.id + 1),
+            self.change(2),
+        ])
+        event = await anext(stream)
+        self.assertTrue(event.startswith('id: 2\nevent: issue.created\n'))
+        await stream.aclose()
+        self.assertEqual(get_broker().subscriptions, set())
+
+    @override_settings(EVENT_QUEUE_SIZE=2)
+    async def test_slow_consumer_overflows(self):
+        stream = stream_events(self.user.id, {self.project.id})
+        await anext(stream)
+        get_broker().publish([self.change(cursor) for cursor in (1, 2, 3)])
+        # Les événements en attente sont abandonnés : le client reprend
+        # depuis le dernier curseur reçu
+        self.assertEqual(
+            await anext(stream), 'event: overflow\ndata: {"cursor": 0}\n\n'
+            )
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    @override_settings(EVENT_HEARTBEAT_SECONDS=0.01)
+    async def test_keepalive(self):
+        stream = stream_events(self.user.id, {self.project.id})
+        await anext(stream)
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+        await stream.aclose()
+
+    async def test_missed_events_are_replayed(self):
+        issue = await Issue.objects.acreate(
+            title='Issue',
+            description='Description',
+            author_id=self.user,
+            project_id=self.project,
+            status='TO_DO',
+            priority='LOW',
+            tag='BUG'
+        )
+        stream = stream_events(
+            self.user.id, {self.project.id}, last_event_id=0
+            )
+        await anext(stream)
+        event = await anext(stream)
+        self.assertIn('event: issue.created', event)
+        self.assertIn(f'"id": {issue.id}', event)
+        await stream.aclose()
+
+    @override_settings(EVENT_HEARTBEAT_SECONDS=0.01)
+    async def test_removed_project_is_no_longer_streamed(self):
+        stream = stream_events(self.user.id, {self.project.id})
+        await anext(stream)
+        await Contributor.objects.filter(user_id=self.user).adelete()
+        get_broker().publish([
+            Change(
+                id=1,
+                sequence=1,
+                model=Change.Model.CONTRIBUTOR,
+                object_id=1,
+                project_id=self.project.id,
+                user_id=self.user.id,
+                action=Change.Action.DELETED
+            ),
+            self.change(2),
+        ])
+        self.assertEqual(
+            await anext(stream),
+            'event: membership\ndata: {"project_ids": []}\n\n'
+        )
+        # L'événement du projet quitté n'est pas envoyé
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+        await stream.aclose()
+
+    @override_settings(EVENT_HEARTBEAT_SECONDS=0.01)
+    async def test_deactivated_user_stream_is_closed(self):
+        stream = stream_events(self.user.id, {self.project.id})
+        await anext(stream)
+        # Le keepalive ne relit pas les appartenances
+        await User.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+
+        def deactivate():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save()
+
+        await sync_to_async(deactivate)()
+        self.assertEqual(
+            await anext(stream), 'event: revoked\ndata: {}\n\n'
+            )
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(get_broker().subscriptions, set())
+
+    def test_invalid_last_event_id(self):
+        self.user.set_password('Tfe45+ef')
+        self.user.save()
+        access = self.client.post(
+            '/api/token/', {'username': 'robert', 'password': 'Tfe45+ef'}
+            ).data['access']
+        response = self.client.get(
+            '/api/events/',
+            HTTP_AUTHORIZATION=f'Bearer {access}',
+            HTTP_LAST_EVENT_ID='abc'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_changes_are_published_after_commit(self):
+        with mock.patch.object(get_broker(), 'dispatch') as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                issue = self.create_issue(self.user, self.project)
+                dispatch.assert_not_called()
+        events = dispatch.call_args.args[0]
+        self.assertEqual(
+            [(e['model'], e['id'], e['action']) for e in events],
+            [('issue', issue.id, 'created')]
+        )
+
+
+@override_settings(ASYNC_READ_VIEWS=True)
+class AsyncReadViewTest(ProjectTestCase):
+    """
+    Vérifie que les lectures asynchrones renvoient les mêmes réponses
+    que les viewsets synchrones
+    """
+
+    def setUp(self):
+        super().setUp()
+        for index in range(12):
+            issue = self.create_issue(
+                self.user,
+                self.project,
+                title=f'Issue {index}',
+                priority='HIGH' if index % 2 else 'LOW'
+            )
+        self.issue = issue
+        self.comment = self.create_comment(self.user, issue)
+
+    def assertSameResponse(self, path):
+        sync = self.client.get(f'/api/{path}')
+        asynchronous = self.client.get(f'/api/async/{path}')
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        # Les liens de pagination restent sur les URLs asynchrones
+        self.assertEqual(
+            asynchronous.content.replace(b'/api/async/', b'/api/'),
+            sync.content
+        )
+        # L'ETag d'une liste dépend aussi de l'URL
+        self.assertEqual(
+            asynchronous.has_header('ETag'), sync.has_header('ETag')
+            )
+        return sync, asynchronous
+
+    def test_lists_match(self):
+        self.assertSameResponse('projects/')
+        self.assertSameResponse('issues/?page=2')
+        self.assertSameResponse('issues/?priority=HIGH&ordering=-id')
+        self.assertSameResponse('issues/?pagination=cursor&page_size=5')
+        self.assertSameResponse('comments/')
+
+    def test_details_match(self):
+        for path in [
+            f'projects/{self.project.id}/',
+            f'issues/{self.issue.id}/',
+            f'comments/{self.comment.id}/',
+        ]:
+            sync, asynchronous = self.assertSameResponse(path)
+            self.assertEqual(asynchronous['ETag'], sync['ETag'])
+
+    def test_project_detail_cache_is_shared(self):
+        cache.clear()
+        path = f'projects/{self.project.id}/'
+        self.assertEqual(self.client.get(f'/api/{path}')['X-Cache'], 'MISS')
+        sync, asynchronous = self.assertSameResponse(path)
+        self.assertEqual(asynchronous['X-Cache'], 'HIT')
+
+    def test_errors_match(self):
+        self.assertSameResponse('issues/?status=UNKNOWN')
+        self.assertSameResponse('issues/?page=9')
+        self.assertSameResponse('issues/0/')
+        self.client.force_authenticate(user=None)
+        self.assertSameResponse('comments/')
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/async/issues/')['ETag']
+        response = self.client.get(
+            '/api/async/issues/', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_projects_are_hidden(self):
+        other = self.create_user('julie')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f'/api/async/issues/{self.issue.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ASYNC_READ_VIEWS=False)
+    def test_disabled_by_default(self):
+        response = self.client.get(f'/api/async/issues/{self.issue.id}/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SHARED_CACHE=True)
+class StatelessAuthenticationTest(ProjectTestCase):
+    """
+    Vérifie que les jetons sont acceptés sans lecture de l'utilisateur
+    tant que son compte n'a pas changé
+    """
+
+    password = 'Tfe45+ef'
+    # Authentification par jetons
+    authenticate = False
+
+    def setUp(self):
+        super().setUp()
+        self.tokens = self.obtain_tokens('robert')
+
+    def obtain_tokens(self, username):
+        response = self.client.post(
+            '/api/token/', {'username': username, 'password': 'Tfe45+ef'}
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get(self, path, access=None):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {access or self.tokens['access']}"
+            )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        user_queries = [
+            query for query in context.captured_queries
+            if 'FROM "api_user_user"' in query['sql']
+        ]
+        return response, user_queries
+
+    def test_user_is_not_loaded(self):
+        response, user_queries = self.get('/api/issues/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
+
+    def test_local_cache_checks_database(self):
+        # Cache propre au processus : une révocation ne serait pas vue
+        # par les autres processus
+        with override_settings(SHARED_CACHE=None):
+            self.assertFalse(cache_is_shared())
+            response, user_queries = self.get('/api/issues/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(user_queries), 1)
+
+        redis = {'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache'
+        }}
+        with override_settings(SHARED_CACHE=None, CACHES=redis):
+            self.assertTrue(cache_is_shared())
+            self.assertEqual(check_shared_cache(None), [])
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['api.W001']
+        )
+
+    def test_changed_account_is_checked_in_database(self):
+        self.user.first_name = 'Robert'
+        self.user.save()
+        response, user_queries = self.get('/api/issues/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(user_queries), 1)
+
+        # Un jeton rafraîchi redevient sans état
+        response = self.client.post(
+            '/api/token/refresh/', {'refresh': self.tokens['refresh']}
+            )
+        response, user_queries = self.get(
+            '/api/issues/', response.data['access']
+            )
+        self.assertEqual(user_queries, [])
+
+    def test_revoked_tokens_are_rejected(self):
+        self.user.set_password('Nouveau+45')
+        self.user.save()
+        response, _ = self.get('/api/issues/')
+        self.assertEqual(response.status_code, 401)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post(
+            '/api/token/refresh/', {'refresh': self.tokens['refresh']}
+            )
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(ASYNC_READ_VIEWS=True)
+    def test_async_views_check_tokens_the_same_way(self):
+        response, user_queries = self.get('/api/async/issues/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
+        with override_settings(SHARED_CACHE=None):
+            response, user_queries = self.get('/api/async/issues/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(user_queries), 1)
+
+        self.user.set_password('Nouveau+45')
+        self.user.save()
+        response, _ = self.get('/api/async/issues/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_permissions_compare_primary_keys(self):
+        url = f'/api/projects/{self.project.id}/'
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}"
+            )
+        response = self.client.patch(url, {'title': 'Renommé'})
+        self.assertEqual(response.status_code, 200)
+
+        self.create_user('julie')
+        access = self.obtain_tokens('julie')['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = self.client.patch(url, {'title': 'Volé'})
+        self.assertEqual(response.status_code, 403)
+
+
+class DatabaseConfigTest(APITestCase):
+    """
+    Vérifie la configuration de la base par variables d'environnement
+    """
+
+    def test_sqlite_is_tuned_by_default(self):
+        config = database_config({}, settings.BASE_DIR)
+        self.assertEqual(config['NAME'], settings.BASE_DIR / 'db.sqlite3')
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        # Le mode WAL modifie le fichier de la base : sur demande
+        self.assertNotIn('init_command', config['OPTIONS'])
+
+        config = database_config({'DB_SQLITE_WAL': '1'}, settings.BASE_DIR)
+        self.assertIn('journal_mode=WAL', config['OPTIONS']['init_command'])
+
+        config = database_config(
+            {'DB_SQLITE_TUNING': '0'}, settings.BASE_DIR
+            )
+        self.assertNotIn('OPTIONS', config)
+
+    def test_postgresql_pool_or_persistent_connections(self):
+        environ = {'DB_ENGINE': 'postgresql', 'DB_HOST': 'db'}
+        config = database_config(environ, settings.BASE_DIR)
+        self.assertEqual(config['HOST'], 'db')
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+        config = database_config(
+            {**environ, 'DB_POOL': '1'}, settings.BASE_DIR
+            )
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 10)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTest(ProjectTestCase):
+    """
+    Vérifie le choix de la base par le routeur : lectures des vues
+    marquées sur la réplique, écritures et lectures qui suivent une
+    écriture sur la base principale
+    """
+
+    def setUp(self):
+        # Fenêtres laissées par les écritures des autres tests
+        cache.clear()
+        self.user = self.create_user('robert')
+        self.other = self.create_user('julie')
+        # Cookies du client, renvoyés à chaque requête
+        self.cookies = {}
+
+    def route(self, method, view, user, write=False):
+        """
+        Rejoue le passage d'une requête dans le middleware et retourne
+        les bases choisies (lecture, puis écriture et lecture)
+        """
+        databases = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            # Comme DRF après l'authentification
+            request.user = user
+            databases.append(Issue.objects.all().db)
+            if write:
+                databases.append(router.db_for_write(Issue))
+                databases.append(Issue.objects.all().db)
+            self.read_replica = read_from_replica()
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = RequestFactory().generic(method, '/')
+        request.COOKIES.update(self.cookies)
+        # Hors de la transaction du test, comme une vraie requête
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            response = middleware(request)
+        self.cookies.update(
+            (name, morsel.value) for name, morsel in response.cookies.items()
+        )
+        return databases
+
+    def test_safe_requests_read_from_replica(self):
+        view = IssueViewSet.as_view({'get': 'list'})
+        self.assertEqual(self.route('GET', view, self.user), ['replica1'])
+        self.assertTrue(self.read_replica)
+
+    def test_other_views_read_from_primary(self):
+        self.assertEqual(
+            self.route('GET', ChangesView.as_view(), self.user), ['default']
+            )
+        view = IssueViewSet.as_view({'post': 'create'})
+        self.assertEqual(self.route('POST', view, self.user), ['default'])
+        self.assertFalse(self.read_replica)
+
+    def test_reads_after_write_stay_on_primary(self):
+        view = IssueViewSet.as_view({'get': 'list'})
+        self.assertEqual(
+            self.route('GET', view, self.user, write=True),
+            ['replica1', 'default', 'default']
+        )
+        # Fenêtre de lecture sur la base principale pour l'auteur
+        # de l'écriture seulement
+        self.assertEqual(self.route('GET', view, self.user), ['default'])
+        self.assertEqual(self.route('GET', view, self.other), ['replica1'])
+
+    def test_sticky_reads_follow_the_client(self):
+        view = IssueViewSet.as_view({'get': 'list'})
+        self.route('GET', view, self.user, write=True)
+        # Requête suivante servie par un autre processus (cache local
+        # vide) : le cookie signé suffit
+        cache.clear()
+        self.assertEqual(self.route('GET', view, self.user), ['default'])
+
+        # Un cookie modifié ou expiré est ignoré
+        self.cookies[STICKY_COOKIE] = str(self.user.pk)
+        self.assertEqual(self.route('GET', view, self.user), ['replica1'])
+
+        # Client sans cookies : le cache n'est utilisé que s'il est
+        # partagé entre les processus
+        self.cookies.clear()
+        self.route('GET', view, self.user, write=True)
+        self.cookies.clear()
+        self.assertEqual(self.route('GET', view, self.user), ['replica1'])
+        with override_settings(SHARED_CACHE=True):
+            self.route('GET', view, self.user, write=True)
+            self.cookies.clear()
+            self.assertEqual(
+                self.route('GET', view, self.user), ['default']
+                )
+
+    def test_no_routing_outside_requests(self):
+        self.assertEqual(Issue.objects.all().db, 'default')
+
+
+class PerformanceInstrumentationTest(ProjectTestCase):
+    """
+    Vérifie les mesures par vue : Server-Timing, seuil de requêtes
+    SQL et export au format Prometheus
+    """
+
+    def setUp(self):
+        registry.reset()
+        super().setUp()
+        self.create_issue(self.user, self.project)
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/issues/')
+        self.assertIn(
+            f'desc="{len(context.captured_queries)} queries"',
+            response['Server-Timing']
+        )
+        self.assertNotIn('X-Query-Threshold-Exceeded', response)
+
+        stats = registry.views['IssueViewSet.list']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['queries'], len(context.captured_queries))
+        self.assertGreater(stats['serialization_time'], 0)
+        self.assertEqual(stats['response_bytes'], len(response.content))
+
+    @override_settings(PERF_QUERY_THRESHOLD=1)
+    def test_query_threshold(self):
+        with self.assertLogs('api.performance', 'WARNING') as logs:
+            response = self.client.get('/api/issues/')
+        self.assertIn('IssueViewSet.list', logs.output[0])
+        self.assertRegex(response['X-Query-Threshold-Exceeded'], r'^\d+ > 1$')
+        self.assertEqual(registry.views['IssueViewSet.list']['nplusone'], 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/issues/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 404)
+        with override_settings(PERF_METRICS_TOKEN='secret'):
+            response = self.client.get(
+                '/api/metrics/', HTTP_AUTHORIZATION='Bearer autre'
+                )
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get('/api/metrics/')
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(
+                '/api/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'softdesk_request_duration_seconds_count'
+            '{view="IssueViewSet.list"} 1',
+            response.content.decode()
+        )
+
+
+class BenchmarkSuiteTest(APITestCase):
+    """
+    Vérifie le générateur de données et la suite de benchmarks
+    """
+
+    def test_generate_dataset(self):
+        result = generate_dataset(
+            users=6, projects=3, contributors=3, issues=4, comments=2
+            )
+        owner = result.pop('owner')
+        self.assertEqual(result, {
+            'users': 6, 'projects': 3, 'contributors': 9,
+            'issues': 12, 'comments': 24,
+        })
+        self.assertEqual(
+            Contributor.objects.filter(user_id=owner).count(), 3
+            )
+        self.assertTrue(Project.objects.filter(author_id=owner).exists())
+        self.assertEqual(
+            Change.objects.filter(model=Change.Model.COMMENT).count(), 24
+            )
+        self.assertTrue(
+            self.client.login(
+                username=owner.username, password='Synthetic+2024'
+                )
+        )
+
+    def test_every_router_route_is_measured(self):
+        measured = {route for route, method, path, body in ENDPOINTS}
+        self.assertEqual(router_routes() - measured, set())
+
+    @override_settings(PERF_QUERY_THRESHOLD=None)
+    def test_bench_endpoints(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'baseline.json'
+            call_command(
+                'bench_endpoints',
+                scales='small',
+                repeat=1,
+                baseline=path,
+                save=True,
+                host='testserver',
+                stdout=io.StringIO()
+            )
+            baseline = json.loads(path.read_text())['scales']
+        endpoints = baseline['small']['endpoints']
+        self.assertEqual(len(endpoints), len(ENDPOINTS))
+        for key, stats in endpoints.items():
+            self.assertLess(stats['status'], 400, key)
+        # Les données générées sont annulées
+        self.assertFalse(Project.objects.exists())
+
+    def test_compare(self):
+        baseline = {'small': {'endpoints': {
+            'GET /api/issues/': {'status': 200, 'p50_ms': 10, 'queries': 3},
+        }}}
+
+        def results(status, p50_ms, queries):
+            return {'small': {'endpoints': {'GET /api/issues/': {
+                'status': status, 'p50_ms': p50_ms, 'queries': queries,
+            }}}}
+
+        self.assertEqual(compare(baseline, results(200, 14, 3), 0.5), [])
+        self.assertEqual(
+            len(compare(baseline, results(500, 16, 4), 0.5)), 3
+            )
+
+
+class UserDeletionJobTest(ProjectTestCase):
+    """
+    Vérifie la suppression d'un utilisateur en arrière-plan, par lots
+    """
+
+    def setUp(self):
+        self.user = self.create_user('robert')
+        self.other = self.create_user('julie')
+        self.project = self.create_project(
+            self.user, [self.user, self.other]
+            )
+        self.other_project = self.create_project(
+            self.other, [self.other, self.user]
+            )
+        for index in range(3):
+            issue = self.create_issue(self.user, self.project)
+            self.create_comment(self.other, issue)
+            self.create_comment(self.user, issue)
+        # Contenus de l'utilisateur dans le projet d'un autre
+        self.other_issue = self.create_issue(self.other, self.other_project)
+        self.create_comment(self.user, self.other_issue)
+        self.kept_comment = self.create_comment(self.other, self.other_issue)
+        own_issue = self.create_issue(self.user, self.other_project)
+        self.create_comment(self.other, own_issue)
+        self.client.force_authenticate(user=self.user)
+
+    def request_deletion(self):
+        response = self.client.delete(
+            f'/api_user/users/{self.user.id}/delete_user/'
+            )
+        self.assertEqual(response.status_code, 202)
+        return response
+
+    def assert_deleted(self):
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(
+            list(Issue.objects.values_list('id', flat=True)),
+            [self.other_issue.id]
+        )
+        self.assertEqual(
+            list(Comment.objects.values_list('id', flat=True)),
+            [self.kept_comment.id]
+        )
+        self.assertEqual(
+            list(Contributor.objects.values_list('user_id', flat=True)),
+            [self.other.id]
+        )
+
+    def test_delete_user_is_accepted(self):
+        response = self.request_deletion()
+        job = DeletionJob.objects.get()
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(
+            response['Location'],
+            f'http://testserver/api_user/deletion_jobs/{job.id}/'
+        )
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        # Rien n'est supprimé pendant la requête ; une seconde demande
+        # retourne le même job
+        self.assertEqual(Comment.objects.count(), 9)
+        self.request_deletion()
+        self.assertEqual(DeletionJob.objects.count(), 1)
+
+        # Le suivi se lit sans authentification
+        self.client.force_authenticate(user=None)
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], str(job.id))
+
+    def test_rows_added_during_the_job_are_deleted(self):
+        self.request_deletion()
+        job = claim(DeletionJob.objects.get().pk)
+        while delete_chunk(job, STEPS[0], 100):
+            pass
+        # Après l'étape des commentaires, un autre utilisateur commente
+        # une issue de l'utilisateur et en crée une dans son projet
+        issue = Issue.objects.filter(author_id=self.user).first()
+        self.create_comment(self.other, issue)
+        late_issue = self.create_issue(self.other, self.project)
+        self.create_comment(self.other, late_issue)
+
+        run_job(job, chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assert_deleted()
+        self.assertEqual(job.progress['comments'], 10)
+        self.assertEqual(job.progress['issues'], 5)
+
+    def test_run_job_in_chunks(self):
+        self.request_deletion()
+        job = claim(DeletionJob.objects.get().pk)
+        self.assertIsNotNone(job)
+        # Un seul worker à la fois
+        self.assertIsNone(claim(job.pk))
+
+        with CaptureQueriesContext(connection) as context:
+            run_job(job, chunk_size=2)
+        self.assert_deleted()
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assertEqual(job.progress, {
+            'comments': 8, 'issues': 4, 'contributors': 3,
+            'projects': 1, 'user': 1,
+        })
+        # Suppressions en masse : aucune requête par objet supprimé
+        self.assertFalse(any(
+            'WHERE "api_comment"."id" = ' in query['sql']
+            for query in context.captured_queries
+        ))
+        # Les tombstones sont écrites par le job
+        deleted = Change.objects.filter(action=Change.Action.DELETED)
+        self.assertEqual(
+            deleted.filter(model=Change.Model.COMMENT).count(), 8
+            )
+        self.assertTrue(deleted.filter(
+            model=Change.Model.PROJECT, object_id=self.project.pk
+            ).exists())
+
+    def test_resume_after_crash(self):
+        self.request_deletion()
+        job = claim(DeletionJob.objects.get().pk)
+        delete_chunk(job, STEPS[0], 3)
+        # Arrêt du worker : le bail expire, un autre worker reprend
+        DeletionJob.objects.filter(pk=job.pk).update(locked_until=None)
+
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assert_deleted()
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assertEqual(job.progress['comments'], 8)
+
+
+class CounterTest(ProjectTestCase):
+    """
+    Vérifie les compteurs dénormalisés des projets et des issues
+    """
+
+    def issue_data(self, index=0, project_id=None):
+        return {
+            'title': f'Issue {index}',
+            'description': 'Description',
+            'project_id': project_id or self.project.id,
+            'status': 'TO_DO',
+            'priority': 'LOW',
+            'tag': 'BUG',
+        }
+
+    def assert_counts(self, project, issues, comments, contributors):
+        project.refresh_from_db()
+        self.assertEqual(
+            (
+                project.issue_count,
+                project.comment_count,
+                project.contributor_count
+            ),
+            (issues, comments, contributors)
+        )
+
+    def test_counters_follow_api(self):
+        response = self.client.post(
+            '/api/issues/', self.issue_data(), format='json'
+            )
+        issue_id = response.data['id']
+        for _ in range(2):
+            self.client.post(
+                '/api/comments/',
+                {'description': 'Commentaire', 'issue_id': issue_id},
+                format='json'
+            )
+        self.assert_counts(self.project, 1, 2, 1)
+        issue = Issue.objects.get(pk=issue_id)
+        self.assertEqual(issue.comment_count, 2)
+        self.assertIsNotNone(issue.last_comment_at)
+        self.assertIsNotNone(self.project.last_activity_at)
+
+        comment = Comment.objects.filter(issue_id=issue).first()
+        self.client.delete(f'/api/comments/{comment.id}/')
+        issue.refresh_from_db()
+        self.assertEqual(issue.comment_count, 1)
+        self.assert_counts(self.project, 1, 1, 1)
+
+        # Suppression en cascade : l'issue emporte son commentaire
+        self.client.delete(f'/api/issues/{issue_id}/')
+        self.assert_counts(self.project, 0, 0, 1)
+
+    def test_counters_follow_bulk_paths(self):
+        users = [
+            self.create_user(f'membre{index}') for index in range(3)
+        ]
+        self.client.post(
+            '/api/contributors/bulk/',
+            {
+                'project_id': self.project.id,
+                'user_ids': [user.id for user in users]
+            },
+            format='json'
+        )
+        self.client.post(
+            '/api/issues/bulk/',
+            [self.issue_data(index) for index in range(4)],
+            format='json'
+        )
+        self.assert_counts(self.project, 4, 0, 4)
+
+        # Déplacement d'une issue : les deux projets sont recalculés
+        other = self.create_project(self.user, title='Autre')
+        issue = Issue.objects.filter(project_id=self.project).first()
+        response = self.client.patch(
+            '/api/issues/bulk/',
+            [{'id': issue.id, 'project_id': other.id}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_counts(self.project, 3, 0, 4)
+        self.assert_counts(other, 1, 0, 1)
+
+    def create_thread(self, author, issues=2, comments=(3, 2)):
+        # Issues de `author` dans le projet, commentées par robert
+        for index in range(issues):
+            issue = Issue.objects.create(
+                author_id=author, project_id=self.project,
+                **{
+                    key: value for key, value in self.issue_data(index).items()
+                    if key != 'project_id'
+                }
+            )
+            for _ in range(comments[index]):
+                self.create_comment(self.user, issue)
+
+    def test_counters_follow_user_deletion(self):
+        # Cascade depuis un utilisateur : ses issues emportent leurs
+        # commentaires, décomptés une seule fois
+        other = self.create_user('julie')
+        Contributor.objects.create(user_id=other, project_id=self.project)
+        self.create_thread(other)
+        self.create_thread(self.user, issues=1, comments=(1,))
+        self.create_comment(other, Issue.objects.get(author_id=self.user))
+        self.assert_counts(self.project, 3, 7, 2)
+
+        other.delete()
+        self.assert_counts(self.project, 1, 1, 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(
+            Issue.objects.get(author_id=self.user).comment_count, 1
+            )
+
+    def test_counters_follow_queryset_deletion(self):
+        self.create_thread(self.user)
+        issue = Issue.objects.order_by('id').first()
+        # Un commentaire et son issue dans la même suppression
+        Comment.objects.filter(issue_id=issue).first().delete()
+        Issue.objects.filter(pk=issue.pk).delete()
+        self.assert_counts(self.project, 1, 2, 1)
+
+        Comment.objects.filter(issue_id__project_id=self.project).delete()
+        self.assert_counts(self.project, 1, 0, 1)
+        self.assertFalse(Issue.objects.exclude(comment_count=0).exists())
+
+    def test_reconcile_fixes_drift(self):
+        generate_dataset(
+            users=5, projects=2, contributors=3, issues=2, comments=2
+            )
+        project = Project.objects.filter(
+            author_id__username='synthetic_0'
+            ).get()
+        self.assert_counts(project, 2, 4, 3)
+
+        Project.objects.update(issue_count=0, comment_count=99)
+        Issue.objects.update(comment_count=0)
+        out = io.StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('3 projets vérifiés', out.getvalue())
+        self.assert_counts(project, 0, 99, 3)
+
+        out = io.StringIO()
+        call_command('reconcile_counters', '--batch-size', '1', stdout=out)
+        self.assertIn('corrigés sur 3 projets et 4 issues', out.getvalue())
+        self.assert_counts(project, 2, 4, 3)
+        self.assertFalse(Issue.objects.exclude(comment_count=2).exists())
+
+
+class SparseFieldsTest(ProjectTestCase):
+    """
+    Vérifie ?fields= et ?expand= sur les issues et commentaires
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.issue = self.create_issue(self.user, self.project)
+        for _ in range(3):
+            self.create_comment(self.user, self.issue)
+
+    def list_query(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        query = [
+            query['sql'] for query in context.captured_queries
+            if 'LIMIT' in query['sql']
+        ][0]
+        return response.data['results'], query
+
+    def test_default_output_unchanged(self):
+        results, query = self.list_query('/api/comments/')
+        self.assertEqual(results[0]['author_name'], 'robert')
+        self.assertEqual(results[0]['issue_title'], 'Issue')
+        self.assertEqual(
+            results[0]['issue_link'],
+            f'http://testserver/api/issues/{self.issue.id}/'
+        )
+        self.assertIn('"api_user_user"', query)
+
+    def test_fields_skip_joins(self):
+        with mock.patch(
+            'api.serializers.CommentSerializer.get_issue_link'
+        ) as get_issue_link:
+            results, query = self.list_query(
+                '/api/comments/?fields=id,description'
+                )
+        get_issue_link.assert_not_called()
+        self.assertEqual(set(results[0]), {'id', 'description'})
+        self.assertNotIn('"api_user_user"', query)
+
+        results, query = self.list_query(
+            '/api/issues/?fields=id,project_name'
+            )
+        self.assertEqual(
+            results[0], {'id': self.issue.id, 'project_name': 'Projet'}
+            )
+
+    def test_expand(self):
+        results, query = self.list_query('/api/issues/?expand=author')
+        self.assertEqual(results[0]['author_name'], 'robert')
+        self.assertNotIn('project_name', results[0])
+        self.assertIn('status', results[0])
+        self.assertIn('"api_user_user"', query)
+
+        results, query = self.list_query('/api/issues/?expand=')
+        self.assertNotIn('author_name', results[0])
+        self.assertNotIn('"api_user_user"', query)
+
+    def test_unknown_fields(self):
+        response = self.client.get('/api/issues/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/comments/?expand=project')
+        self.assertEqual(response.status_code, 400)
+
+    def test_writes_return_all_fields(self):
+        response = self.client.post(
+            '/api/comments/?fields=id',
+            {'description': 'Commentaire', 'issue_id': self.issue.id},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['issue_title'], 'Issue')
+
+
+class FastListTest(ProjectTestCase):
+    """
+    Vérifie que les listes lues avec values() sont identiques, octet
+    pour octet, à celles des serializers
+    """
+
+    def setUp(self):
+        self.user = self.create_user('rené')
+        self.client.force_authenticate(user=self.user)
+        self.project = self.create_project(
+            self.user, title='Projet “spécial”'
+            )
+        for index, text in enumerate(['Été', 'ligne\u2028fin', 'a\x01"b\\']):
+            issue = self.create_issue(
+                self.user,
+                self.project,
+                title=text,
+                description=f'Description {index}'
+            )
+            self.create_comment(self.user, issue, description=text)
+
+    def assert_same_bytes(self, url):
+        with CaptureQueriesContext(connection) as context:
+            fast = self.client.get(url)
+        # Seules les colonnes de la réponse sont lues
+        self.assertFalse(any(
+            '."updated_at"' in query['sql'] and 'LIMIT' in query['sql']
+            for query in context.captured_queries
+        ))
+        with override_settings(FAST_LIST_RESPONSES=False):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_lists_match_serializers(self):
+        for url in [
+            '/api/issues/',
+            '/api/issues/?ordering=-id&status=TO_DO',
+            '/api/issues/?fields=id,title&expand=author',
+            '/api/comments/',
+            '/api/comments/?pagination=cursor&page_size=2',
+            '/api/comments/?fields=id,issue_link',
+        ]:
+            self.assert_same_bytes(url)
+
+        # Curseur de la page suivante, calculé depuis une ligne de values()
+        response = self.client.get(
+            '/api/comments/?pagination=cursor&page_size=2'
+            )
+        self.assert_same_bytes(response.data['next'])
+
+    def test_browsable_api_uses_serializers(self):
+        response = self.client.get('/api/issues/?format=api')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Projet “spécial”')
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'text': 'é\u2028\u2029\x00"\\/',
+            'date': Issue.objects.first().time_created,
+            'uuid': Comment.objects.first().uuid,
+            1: [None, True, 1.5],
+        }
+        # Entier refusé par orjson : rendu de DRF
+        for value in [data, {'big': 2 ** 70}]:
+            self.assertEqual(
+                FastJSONRenderer().render(value), JSONRenderer().render(value)
+                )
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2')
+        )
+
+
+class CompressionTest(ProjectTestCase):
+    """
+    Vérifie la compression des réponses selon Accept-Encoding
+    """
+
+    def setUp(self):
+        super().setUp()
+        Issue.objects.bulk_create([
+            Issue(
+                title=f'Issue {index}',
+                description='Description assez longue ' * 5,
+                author_id=self.user,
+                project_id=self.project,
+                status='TO_DO',
+                priority='LOW',
+                tag='BUG'
+            )
+            for index in range(60)
+        ])
+
+    def test_gzip_negotiated(self):
+        url = f'/api/issues/?project_id={self.project.id}'
+        plain = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+            )
+
+        # ETag propre à l'encodage, reconnu par If-None-Match
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+        response = self.client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_compressed(self):
+        url = f'/api/issues/?project_id={self.project.id}'
+        for accept_encoding in ['identity', 'gzip;q=0', 'deflate']:
+            response = self.client.get(
+                url, HTTP_ACCEPT_ENCODING=accept_encoding
+                )
+            self.assertFalse(response.has_header('Content-Encoding'))
+        # Réponse trop petite
+        response = self.client.get(
+            '/api/issues/?fields=id&page_size=1&pagination=cursor',
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        # API navigable : HTML avec le jeton CSRF (BREACH)
+        response = self.client.get(
+            url + '&format=api', HTTP_ACCEPT_ENCODING='gzip'
+            )
+        self.assertGreater(len(response.content), 1024)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_export_stream_compressed(self):
+        url = f'/api/projects/{self.project.id}/export/'
+        plain = b''.join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), plain
+            )
+
+    def test_choose_encoding(self):
+        preferred = 'br' if 'br' in CODECS else 'gzip'
+        self.assertEqual(choose_encoding('gzip;q=0.5, br'), preferred)
+        self.assertEqual(choose_encoding('*'), preferred)
+        self.assertEqual(choose_encoding('GZIP'), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0, br;q=0'))
+        self.assertIsNone(choose_encoding(''))
+
+    @skipUnless('br' in CODECS, 'paquet brotli non installé')
+    def test_brotli_negotiated(self):
+        import brotli
+        url = f'/api/issues/?project_id={self.project.id}'
+        plain = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
@@ -2,8 +2,11 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ProjectViewSet,
-    ContributorViewSet, CommentViewSet, IssueViewSet
+    ContributorViewSet, CommentViewSet, IssueViewSet, SearchView,
+    ChangesView, event_stream
     )
+from .instrumentation import metrics_view
+from .async_views import AsyncProjectView, AsyncIssueView, AsyncCommentView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView, TokenRefreshView
     )
@@ -17,6 +20,17 @@ router.register('comments', CommentViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('search/', SearchView.as_view(), name='search'),
+    path('changes/', ChangesView.as_view(), name='changes'),
+    path('events/', event_stream, name='events'),
+    path('metrics/', metrics_view, name='metrics'),
+    # Lectures asynchrones (ASGI) : mêmes réponses que les viewsets
+    path('async/projects/', AsyncProjectView.as_view()),
+    path('async/projects/<int:pk>/', AsyncProjectView.as_view()),
+    path('async/issues/', AsyncIssueView.as_view()),
+    path('async/issues/<int:pk>/', AsyncIssueView.as_view()),
+    path('async/comments/', AsyncCommentView.as_view()),
+    path('async/comments/<int:pk>/', AsyncCommentView.as_view()),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
@@ -1,24 +1,55 @@
-from rest_framework import viewsets, generics
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import viewsets, generics, serializers
+from rest_framework.filters import OrderingFilter
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import AuthenticationFailed
 from .models import Project, Contributor, Issue, Comment
 from .serializers import (
     ProjectSerializer, ContributorSerializer,
-    IssueSerializer, CommentSerializer, ProjectDetailSerializer
+    IssueSerializer, CommentSerializer, ProjectSummarySerializer,
+    ContributorBulkSerializer, IssueBulkSerializer
     )
 from api_user.models import User
 from .permissions import ProjectPermission, ContributorPermission
+from .pagination import SelectablePaginationMixin
+from .membership import get_membership, load_membership, MemberQuerysetMixin
+from .summary import summary_queryset, build_summary_context
+from .bulk import add_contributors, remove_contributors
+from .export import stream_export, EXPORT_CONTENT_TYPES
+from .search import get_search_backend
+from .filters import QueryParamFilter, RankedOrderingFilter, choice_rank
+from .conditional import ConditionalGetMixin
+from .response_cache import project_detail_cache, project_summary_cache
+from .changes import changes_since
+from .events import stream_events
+from .authentication import StatelessJWTAuthentication
+from .instrumentation import InstrumentedViewMixin
+from .counters import reconcile_counters
+from .sparse import SparseFieldsMixin
+from .fast_list import FastListMixin
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(
+    InstrumentedViewMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     """
     Vue pour gérer les projets : création,
     mise à jour, suppression, et récupération
     """
-    queryset = Project.objects.all()
+    # Auteur et contributeurs chargés en amont pour éviter le N+1
+    queryset = Project.objects.select_related(
+        'author_id'
+        ).prefetch_related('contributor_id')
+    # Lectures servies par les répliques (voir api.replicas)
+    replica_reads = True
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated, ProjectPermission]
 
@@ -27,7 +58,60 @@ class ProjectViewSet(viewsets.ModelViewSet):
         Associe l'utilisateur authentifié
         comme auteur du projet lors de sa création
         """
-        serializer.save(author_id=self.request.user)
+        serializer.save(author_id_id=self.request.user.pk)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Détail d'un projet, servi depuis le cache tant que la version
+        du projet n'a pas changé (voir api.response_cache)
+        """
+        pk = kwargs['pk']
+        if not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+
+        pk = int(pk)
+        response, versions = self.cached_detail(pk)
+        if response is None:
+            response = self.detail_response(pk, self.get_object(), versions)
+        return response
+
+    def cached_detail(self, pk):
+        """
+        Réponse du détail en cache (ou None) et versions lues, à
+        repasser à detail_response. Partagé avec AsyncProjectView
+        """
+        # Les liens éventuels dépendent de l'hôte de la requête
+        variant = self.request.get_host()
+        entries, versions = project_detail_cache.get_many([pk], variant)
+        if pk not in entries:
+            return None, versions
+        etag, last_modified, data = entries[pk]
+        # Permissions vérifiées comme pour un projet chargé, sur un
+        # projet reconstruit depuis l'entrée (sans requête)
+        self.check_object_permissions(
+            self.request,
+            Project(pk=pk, author_id_id=data['author']['id'])
+        )
+        response = self.conditional_response(
+            etag, last_modified, lambda: Response(data)
+            )
+        response['X-Cache'] = 'HIT'
+        return response, versions
+
+    def detail_response(self, pk, instance, versions):
+        # Sérialise le projet chargé et le met en cache
+        etag, last_modified = self.object_version(instance)
+        data = self.get_serializer(instance).data
+        project_detail_cache.set_many(
+            {pk: (etag, last_modified, dict(data))},
+            versions,
+            self.request.get_host()
+        )
+        response = self.conditional_response(
+            etag, last_modified, lambda: Response(data)
+            )
+        response['X-Cache'] = 'MISS'
+        return response
 
     @action(
         detail=False,
@@ -36,21 +120,87 @@ class ProjectViewSet(viewsets.ModelViewSet):
     )
     def project_summary(self, request):
         """
-        Retourne un résumé paginé de tous les projets
+        Retourne un résumé paginé de tous les projets, avec un
+        nombre de requêtes fixe quelle que soit la taille des projets.
+        Le résumé de chaque projet est mis en cache par version
         """
         paginator = PageNumberPagination()
         paginator.page_size = 10
-        projects = Project.objects.all()
+        projects = Project.objects.order_by('-time_created', '-id').only('id')
         result_page = paginator.paginate_queryset(projects, request)
-        serializer = ProjectDetailSerializer(result_page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        project_ids = [project.id for project in result_page]
+
+        variant = request.get_host()
+        summaries, versions = project_summary_cache.get_many(
+            project_ids, variant
+            )
+        missing = [pk for pk in project_ids if pk not in summaries]
+        if missing:
+            projects = list(summary_queryset().filter(id__in=missing))
+            context = build_summary_context(projects, request)
+            serializer = ProjectSummarySerializer(
+                projects, many=True, context=context
+                )
+            computed = {row['id']: dict(row) for row in serializer.data}
+            project_summary_cache.set_many(computed, versions, variant)
+            summaries.update(computed)
+
+        return paginator.get_paginated_response(
+            [summaries[pk] for pk in project_ids if pk in summaries]
+            )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated, IsAdminUser]
+    )
+    def cache_stats(self, request):
+        """
+        Compteurs de succès / échecs du cache des réponses projets
+        """
+        return Response({
+            'project_detail': project_detail_cache.stats(),
+            'project_summary': project_summary_cache.stats(),
+        })
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """
+        Exporte en flux les issues et commentaires d'un projet,
+        au format NDJSON (par défaut) ou CSV avec ?output=csv.
+        Réservé aux contributeurs et à l'auteur du projet
+        """
+        membership = get_membership(request)
+        if not (membership.is_contributor(pk) or membership.is_author(pk)):
+            return Response(
+                {'detail': "Vous devez être contributeur du projet"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {'detail': "Format d'export inconnu (ndjson ou csv)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            stream_export(pk, output),
+            content_type=EXPORT_CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="project-{pk}.{output}"'
+        )
+        return response
 
 
-class ContributorViewSet(viewsets.ModelViewSet):
+class ContributorViewSet(
+    InstrumentedViewMixin, MemberQuerysetMixin, viewsets.ModelViewSet
+):
     """
     Vue pour gérer les contributeurs : ajout, suppression, etc
     """
-    queryset = Contributor.objects.all()
+    queryset = Contributor.objects.select_related('user_id', 'project_id')
     serializer_class = ContributorSerializer
     permission_classes = [IsAuthenticated]
 
@@ -60,10 +210,9 @@ class ContributorViewSet(viewsets.ModelViewSet):
         uniquement si l'utilisateur est l'auteur du projet
         """
         project_id = request.data.get('project_id')
-        project = Project.objects.get(pk=project_id)
 
         # Vérifier que l'utilisateur est bien l'auteur du projet
-        if project.author_id != request.user:
+        if not get_membership(request).is_author(project_id):
             return Response(
                 {
                     'detail': (
@@ -77,6 +226,35 @@ class ContributorViewSet(viewsets.ModelViewSet):
         # Si l'utilisateur est l'auteur, crée le contributeur
         return super().create(request, *args, **kwargs)
 
+    @action(detail=False, methods=['post', 'delete'])
+    def bulk(self, request):
+        """
+        Ajoute (POST) ou retire (DELETE) plusieurs contributeurs
+        d'un projet, uniquement si l'utilisateur est l'auteur du projet.
+        Retourne le résultat pour chaque id d'utilisateur
+        """
+        serializer = ContributorBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        project_id = serializer.validated_data['project_id']
+        user_ids = serializer.validated_data['user_ids']
+
+        if not get_membership(request).is_author(project_id):
+            return Response(
+                {
+                    'detail': (
+                        "Vous n'êtes pas autorisé à modifier "
+                        "les contributeurs de ce projet"
+                    )
+                },
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if request.method == 'POST':
+            results = add_contributors(project_id, user_ids)
+        else:
+            results = remove_contributors(project_id, user_ids)
+        return Response({'project_id': project_id, 'results': results})
+
     @action(
         detail=False,
         methods=['delete'],
@@ -95,7 +273,7 @@ class ContributorViewSet(viewsets.ModelViewSet):
         project = Project.objects.get(pk=project_id)
 
         # Vérifier que l'utilisateur est bien l'auteur du projet
-        if project.author_id != request.user:
+        if project.author_id_id != request.user.pk:
             return Response(
                 {
                     'detail': (
@@ -117,39 +295,296 @@ class ContributorViewSet(viewsets.ModelViewSet):
         )
 
 
-class IssueViewSet(viewsets.ModelViewSet):
+class IssueViewSet(
+    InstrumentedViewMixin,
+    ConditionalGetMixin,
+    FastListMixin,
+    SelectablePaginationMixin,
+    SparseFieldsMixin,
+    MemberQuerysetMixin,
+    viewsets.ModelViewSet
+):
     """
     Vue pour gérer les issues : création,
     mise à jour, suppression, et récupération
     """
-    queryset = Issue.objects.all()
+    queryset = Issue.objects.select_related('author_id', 'project_id')
+    # Un projet renommé change aussi les issues affichées
+    related_objects = ('project_id',)
+    # Lectures servies par les répliques (voir api.replicas)
+    replica_reads = True
     serializer_class = IssueSerializer
     permission_classes = [IsAuthenticated, ContributorPermission]
+    filter_backends = [QueryParamFilter, RankedOrderingFilter]
+    # ex : ?project_id=1&status=TO_DO,IN_PROGRESS&priority=HIGH
+    filter_params = {
+        'project_id': ('project_id', serializers.IntegerField()),
+        'author_id': ('author_id', serializers.IntegerField()),
+        'status': (
+            'status__in', serializers.ChoiceField(Issue.Status.choices)
+            ),
+        'priority': (
+            'priority__in', serializers.ChoiceField(Issue.Priority.choices)
+            ),
+        'tag': ('tag__in', serializers.ChoiceField(Issue.Tag.choices)),
+        'created_after': ('time_created__gte', serializers.DateTimeField()),
+        'created_before': ('time_created__lt', serializers.DateTimeField()),
+    }
+    ordering_fields = ['time_created', 'status', 'priority', 'tag', 'id']
+    # ?ordering=priority : par importance, pas par ordre alphabétique
+    ordering_ranks = {'priority': choice_rank('priority', Issue.Priority)}
+    ordering = ['time_created', 'id']
 
     def perform_create(self, serializer):
         """
         Associe l'utilisateur courant comme
         auteur de l'issue lors de sa création
         """
-        serializer.save(author_id=self.request.user)
+        serializer.save(author_id_id=self.request.user.pk)
 
+    def perform_update(self, serializer):
+        """
+        Recalcule les compteurs des deux projets
+        si l'issue change de projet
+        """
+        previous = serializer.instance.project_id_id
+        issue = serializer.save()
+        if issue.project_id_id != previous:
+            reconcile_counters(
+                project_ids=[previous, issue.project_id_id], issue_ids=[]
+                )
+
+    def get_bulk_batch_size(self):
+        # Taille des lots d'écriture, bornée à la valeur par défaut x10
+        try:
+            batch_size = int(self.request.query_params['batch_size'])
+        except (KeyError, ValueError):
+            return settings.BULK_BATCH_SIZE
+        return max(1, min(batch_size, settings.BULK_BATCH_SIZE * 10))
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request):
+        """
+        Importe (POST) ou modifie (PATCH) une liste d'issues.
+        Les écritures sont faites avec bulk_create / bulk_update
+        par lots de ?batch_size= lignes
+        """
+        context = self.get_serializer_context()
+        context['batch_size'] = self.get_bulk_batch_size()
 
-class CommentViewSet(viewsets.ModelViewSet):
+        if request.method == 'POST':
+            serializer = IssueBulkSerializer(
+                data=request.data,
+                many=True,
+                max_length=settings.BULK_MAX_ITEMS,
+                context=context
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save(author_id_id=request.user.pk)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        serializer = IssueBulkSerializer(
+            self.get_queryset(),
+            data=request.data,
+            many=True,
+            partial=True,
+            max_length=settings.BULK_MAX_ITEMS,
+            context=context
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class CommentViewSet(
+    InstrumentedViewMixin,
+    ConditionalGetMixin,
+    FastListMixin,
+    SelectablePaginationMixin,
+    SparseFieldsMixin,
+    MemberQuerysetMixin,
+    viewsets.ModelViewSet
+):
     """
     Vue pour gérer les commentaires : création,
     mise à jour, suppression, et récupération
     """
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('author_id', 'issue_id')
+    related_objects = ('issue_id',)
+    project_lookup = 'issue_id__project_id'
+    # Lectures servies par les répliques (voir api.replicas)
+    replica_reads = True
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, ContributorPermission]
+    filter_backends = [QueryParamFilter, OrderingFilter]
+    filter_params = {
+        'project_id': ('issue_id__project_id', serializers.IntegerField()),
+        'issue_id': ('issue_id', serializers.IntegerField()),
+        'author_id': ('author_id', serializers.IntegerField()),
+        'created_after': ('time_created__gte', serializers.DateTimeField()),
+        'created_before': ('time_created__lt', serializers.DateTimeField()),
+    }
+    ordering_fields = ['time_created', 'id']
+    ordering = ['time_created', 'id']
 
     def perform_create(self, serializer):
-        serializer.save(author_id=self.request.user)
+        serializer.save(author_id_id=self.request.user.pk)
+
+
+class SearchView(APIView):
+    """
+    Recherche plein texte dans les issues et commentaires des projets
+    de l'utilisateur : ?q=<mots>&page=<n>. Les résultats sont classés
+    par pertinence
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'detail': "Le paramètre q est obligatoire"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+        except ValueError:
+            page = 1
+
+        # Un résultat de plus pour savoir s'il existe une page suivante
+        hits = get_search_backend().search(
+            query,
+            request.user.pk,
+            limit=self.page_size + 1,
+            offset=(page - 1) * self.page_size
+        )
+        next_link = None
+        if len(hits) > self.page_size:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'page', page + 1
+                )
+        return Response({
+            'next': next_link,
+            'results': hits[:self.page_size],
+        })
+
+
+class ChangesView(APIView):
+    """
+    Synchronisation incrémentale : retourne les créations, modifications
+    et suppressions (tombstones) survenues depuis le curseur ?since=
+    dans les projets de l'utilisateur. Le client repasse `cursor`
+    tant que `has_more` est vrai. Les projets rejoints depuis `since`
+    sont listés dans `resync` : leur historique complet se lit avec
+    ?project=<id>&since=0
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_classes = {
+        'project': ProjectSerializer,
+        'contributor': ContributorSerializer,
+        'issue': IssueSerializer,
+        'comment': CommentSerializer,
+    }
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            since = max(0, int(params.get('since', 0)))
+            limit = min(
+                max(1, int(params.get('limit', settings.SYNC_PAGE_SIZE))),
+                settings.SYNC_PAGE_SIZE
+            )
+            project_id = params.get('project')
+            if project_id is not None:
+                project_id = int(project_id)
+        except ValueError:
+            return Response(
+                {'detail': "since, limit et project doivent être des entiers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        membership = get_membership(request)
+        if project_id is not None and project_id not in membership.project_ids:
+            return Response(
+                {'detail': "Vous devez être contributeur du projet"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        changes, cursor, has_more, resync = changes_since(
+            request.user.pk,
+            membership.project_ids,
+            since,
+            limit,
+            project_id=project_id
+        )
+        context = {'request': request}
+        for change in changes:
+            obj = change.pop('object')
+            serializer_class = self.serializer_classes[change['model']]
+            change['data'] = (
+                None if obj is None
+                else serializer_class(obj, context=context).data
+            )
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'resync': resync,
+            'changes': changes,
+        })
+
+
+def authenticate_stream(request):
+    # Vue Django asynchrone : l'authentification JWT de DRF est
+    # appliquée à la main, dans un thread (accès éventuel à la base)
+    try:
+        result = StatelessJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def event_stream(request):
+    """
+    Flux SSE (text/event-stream) des créations, modifications et
+    suppressions d'issues et de commentaires dans les projets de
+    l'utilisateur. Chaque connexion reste ouverte sans occuper de
+    thread quand l'application est servie en ASGI (softdesk.asgi).
+    Les projets suivis sont ceux de l'utilisateur, relus quand ses
+    appartenances changent (voir api.events.stream_events)
+    """
+    user = await sync_to_async(authenticate_stream)(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': "Authentification requise"},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id is not None:
+        # Un curseur illisible ne rejoue pas tout l'historique
+        if not last_event_id.isdigit():
+            return JsonResponse(
+                {'detail': "Last-Event-ID doit être un curseur (entier)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        last_event_id = int(last_event_id)
+    membership = await sync_to_async(load_membership)(user.pk)
+
+    response = StreamingHttpResponse(
+        stream_events(user.pk, membership.project_ids, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Désactive la mise en tampon des proxys (nginx)
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 class ProjectListView(generics.ListAPIView):
     """
     Vue pour lister tous les projets
     """
-    queryset = Project.objects.all()
+    queryset = Project.objects.select_related(
+        'author_id'
+        ).prefetch_related('contributor_id')
     serializer_class = ProjectSerializer
@@ -0,0 +1,270 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from api.models import Project, Contributor, Issue, Comment, Change
+from api.changes import record_deletions
+from api.counters import reconcile_counters
+from api.membership import invalidate_membership
+from api.response_cache import bump_project_version
+from .models import User, DeletionJob
+
+
+logger = logging.getLogger('api_user.deletion')
+
+ACTIVE = [DeletionJob.Status.PENDING, DeletionJob.Status.RUNNING]
+
+# Étapes, dans l'ordre des dépendances (un objet est supprimé avant
+# ceux qu'il référence) : (nom, modèle, lignes de l'utilisateur,
+# projet et utilisateur journalisés). Commentaires et issues : ceux de
+# ses projets, et ceux qu'il a écrits ailleurs (avec les commentaires
+# des autres sur ses issues)
+STEPS = [
+    (
+        'comments',
+        Comment,
+        lambda user_id: Q(author_id=user_id)
+        | Q(issue_id__author_id=user_id)
+        | Q(issue_id__project_id__author_id=user_id),
+        'issue_id__project_id',
+        None,
+    ),
+    (
+        'issues',
+        Issue,
+        lambda user_id: Q(author_id=user_id)
+        | Q(project_id__author_id=user_id),
+        'project_id',
+        None,
+    ),
+    (
+        'contributors',
+        Contributor,
+        lambda user_id: Q(user_id=user_id)
+        | Q(project_id__author_id=user_id),
+        'project_id',
+        'user_id',
+    ),
+    (
+        'projects',
+        Project,
+        lambda user_id: Q(author_id=user_id),
+        'id',
+        None,
+    ),
+]
+STEP_NAMES = [step[0] for step in STEPS] + ['user']
+STEP_BY_MODEL = {model: name for name, model, *_ in STEPS}
+
+# Lignes qui référencent celles d'une étape, créées après le passage
+# de leur propre étape (commentaire d'un autre sur une issue de
+# l'utilisateur pendant la suppression...) : (modèle, lien vers la
+# ligne de l'étape, projet et utilisateur journalisés), dans l'ordre
+# des dépendances. Elles sont supprimées dans le lot de leur parent
+DEPENDENTS = {
+    Issue: [
+        (Comment, 'issue_id', 'issue_id__project_id', None),
+    ],
+    Project: [
+        (Comment, 'issue_id__project_id', 'issue_id__project_id', None),
+        (Issue, 'project_id', 'project_id', None),
+        (Contributor, 'project_id', 'project_id', 'user_id'),
+    ],
+}
+
+CHANGE_MODELS = {
+    Comment: Change.Model.COMMENT,
+    Issue: Change.Model.ISSUE,
+    Contributor: Change.Model.CONTRIBUTOR,
+    Project: Change.Model.PROJECT,
+}
+
+
+def _lease():
+    return timezone.now() + timedelta(seconds=settings.DELETION_LEASE_SECONDS)
+
+
+def enqueue_deletion(user):
+    """
+    Crée le job de suppression de l'utilisateur, ou retourne celui en
+    cours. Le compte est désactivé tout de suite : ses jetons ne sont
+    plus acceptés pendant la suppression
+    """
+    with transaction.atomic():
+        job = DeletionJob.objects.filter(
+            user_id=user.pk, status__in=ACTIVE
+            ).first()
+        if job is None:
+            job = DeletionJob.objects.create(user_id=user.pk)
+        if user.is_active:
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+        if settings.DELETION_JOB_THREAD:
+            job_id = job.pk
+            transaction.on_commit(lambda: start_worker(job_id))
+    return job
+
+
+def claim(job_id):
+    """
+    Prend le job s'il est à traiter et qu'aucun worker n'a de bail
+    en cours dessus. Retourne le job, ou None
+    """
+    now = timezone.now()
+    claimed = DeletionJob.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        pk=job_id,
+        status__in=ACTIVE,
+    ).update(status=DeletionJob.Status.RUNNING, locked_until=_lease())
+    if claimed:
+        return DeletionJob.objects.get(pk=job_id)
+    return None
+
+
+def delete_rows(model, rows):
+    """
+    Supprime les lignes (id, projet, utilisateur) sans charger les
+    objets ni envoyer de signaux, et journalise leurs tombstones.
+    Retourne les issues dont des commentaires ont été supprimés
+    """
+    deleted = model.objects.filter(pk__in=[row[0] for row in rows])
+    issue_ids = []
+    if model is Comment:
+        issue_ids = list(deleted.values_list('issue_id', flat=True).distinct())
+    deleted._raw_delete(model.objects.db)
+    record_deletions(CHANGE_MODELS[model], rows)
+    return issue_ids
+
+
+def select_rows(queryset, project_lookup, user_lookup):
+    return [
+        (object_id, project_id, user_id if user_lookup else None)
+        for object_id, project_id, user_id in queryset.values_list(
+            'id', project_lookup, user_lookup or 'id'
+            )
+    ]
+
+
+def delete_chunk(job, step, chunk_size):
+    """
+    Supprime au plus `chunk_size` lignes de l'étape, sans charger les
+    objets ni envoyer de signaux : les tombstones du journal, les
+    compteurs et versions de cache des projets et les appartenances
+    sont mis à jour ici pour tout le lot. Les lignes du lot sont
+    verrouillées, et celles qui les référencent (DEPENDENTS) sont
+    supprimées avant elles. La progression est enregistrée dans la
+    même transaction : après un arrêt, le job reprend au lot suivant.
+    Retourne le nombre de lignes supprimées
+    """
+    name, model, condition, project_lookup, user_lookup = step
+    progress = {name: 0}
+    with transaction.atomic():
+        rows = select_rows(
+            model.objects.filter(condition(job.user_id))
+            .select_for_update()
+            .order_by('id')[:chunk_size],
+            project_lookup,
+            user_lookup
+        )
+        if rows:
+            ids = [row[0] for row in rows]
+            touched = list(rows)
+            issue_ids = []
+            for dependent, link, *lookups in DEPENDENTS.get(model, []):
+                dependent_rows = select_rows(
+                    dependent.objects.filter(**{f'{link}__in': ids}),
+                    *lookups
+                )
+                if dependent_rows:
+                    issue_ids += delete_rows(dependent, dependent_rows)
+                    touched += dependent_rows
+                    dependent_name = STEP_BY_MODEL[dependent]
+                    progress[dependent_name] = (
+                        progress.get(dependent_name, 0) + len(dependent_rows)
+                    )
+            issue_ids += delete_rows(model, rows)
+            progress[name] += len(rows)
+            project_ids = {row[1] for row in touched}
+            # Compteurs, ETag des listes et cache de réponses des
+            # projets touchés
+            reconcile_counters(project_ids=project_ids, issue_ids=issue_ids)
+            Project.objects.filter(pk__in=project_ids).update(
+                updated_at=timezone.now()
+                )
+            for project_id in project_ids:
+                bump_project_version(project_id)
+            for user_id in {row[2] for row in touched if row[2]}:
+                invalidate_membership(user_id)
+
+        job.step = name
+        for step_name, count in progress.items():
+            job.progress[step_name] = job.progress.get(step_name, 0) + count
+        job.locked_until = _lease()
+        job.save(update_fields=['step', 'progress', 'locked_until'])
+    return len(rows)
+
+
+def finish(job):
+    # Plus rien ne référence l'utilisateur que des tables de Django
+    # (groupes, permissions, journal de l'admin)
+    with transaction.atomic():
+        User.objects.filter(pk=job.user_id).delete()
+        job.step = 'user'
+        job.progress['user'] = 1
+        job.status = DeletionJob.Status.DONE
+        job.locked_until = None
+        job.finished_at = timezone.now()
+        job.save()
+
+
+def run_job(job, chunk_size=None):
+    """
+    Exécute (ou reprend à son étape) un job pris avec claim()
+    """
+    chunk_size = chunk_size or settings.DELETION_CHUNK_SIZE
+    start = STEP_NAMES.index(job.step) if job.step else 0
+    try:
+        for step in STEPS[start:]:
+            while delete_chunk(job, step, chunk_size) == chunk_size:
+                pass
+        finish(job)
+    except Exception as error:
+        logger.exception('Suppression %s en échec', job.pk)
+        DeletionJob.objects.filter(pk=job.pk).update(
+            status=DeletionJob.Status.FAILED,
+            error=str(error),
+            locked_until=None
+        )
+
+
+def run_pending_jobs():
+    """
+    Traite les jobs en attente, et reprend ceux dont le worker s'est
+    arrêté (bail expiré). Retourne le nombre de jobs traités
+    """
+    job_ids = DeletionJob.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=timezone.now()),
+        status__in=ACTIVE,
+    ).order_by('time_created').values_list('id', flat=True)
+    count = 0
+    for job_id in list(job_ids):
+        job = claim(job_id)
+        if job is not None:
+            run_job(job)
+            count += 1
+    return count
+
+
+def start_worker(job_id):
+    def work():
+        try:
+            job = claim(job_id)
+            if job is not None:
+                run_job(job)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=work, daemon=True).start()
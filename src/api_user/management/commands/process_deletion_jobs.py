@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from api_user.deletion import run_pending_jobs
+from api_user.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les suppressions d'utilisateurs en attente, et reprend "
+        "celles dont le worker s'est arrêté (bail expiré). Avec --loop, "
+        "tourne en continu (DELETION_JOB_THREAD = False en production)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Attente (s) entre deux recherches de jobs avec --loop'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Relance depuis le début les jobs en échec'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            # Les étapes ne suppriment que ce qui reste : les rejouer
+            # depuis le début est sans risque
+            retried = DeletionJob.objects.filter(
+                status=DeletionJob.Status.FAILED
+            ).update(status=DeletionJob.Status.PENDING, step='', error='')
+            self.stdout.write(f'{retried} job(s) en échec relancé(s)')
+
+        while True:
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write(f'{count} suppression(s) traitée(s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
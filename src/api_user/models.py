@@ -1,3 +1,4 @@
+import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import MinValueValidator
@@ -14,3 +15,35 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class DeletionJob(models.Model):
+    """
+    Suppression d'un utilisateur et de ses données (droit à l'oubli),
+    exécutée par lots en arrière-plan (voir api_user.deletion).
+    L'utilisateur est une simple colonne : il disparaît à la fin.
+    L'id (UUID) sert aussi de lien de suivi, lisible sans
+    authentification
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_id = models.BigIntegerField(db_index=True)
+    status = models.CharField(
+        max_length=7, choices=Status.choices, default=Status.PENDING
+        )
+    # Étape en cours et nombre de lignes supprimées par étape
+    step = models.CharField(max_length=12, blank=True)
+    progress = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    # Bail du worker qui traite le job : passé ce délai sans nouveau
+    # lot, un autre worker reprend le job (arrêt brutal)
+    locked_until = models.DateTimeField(null=True)
+    time_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True)
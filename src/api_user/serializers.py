@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from .models import User
+from .models import User, DeletionJob
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -62,3 +62,21 @@ def update(self, instance, validated_data):
         user.save()
 
     return user
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    status_url = serializers.HyperlinkedIdentityField(
+        view_name='deletionjob-detail'
+        )
+
+    class Meta:
+        model = DeletionJob
+        fields = [
+            'id',
+            'status',
+            'step',
+            'progress',
+            'time_created',
+            'finished_at',
+            'status_url'
+            ]
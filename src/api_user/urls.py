@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet
+from .views import UserViewSet, DeletionJobViewSet
 
 router = DefaultRouter()
 router.register('users', UserViewSet)
+router.register('deletion_jobs', DeletionJobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,18 +1,21 @@
-from rest_framework import viewsets
+from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-from .models import User
-from api.models import Project, Contributor
-from .serializers import UserSerializer
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from .models import User, DeletionJob
+from api.instrumentation import InstrumentedViewMixin
+from .deletion import enqueue_deletion
+from .serializers import UserSerializer, DeletionJobSerializer
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     Vue pour gérer les utilisateurs : création, modification, suppression, etc
     """
     queryset = User.objects.all()
+    # Lectures servies par les répliques (voir api.replicas)
+    replica_reads = True
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
@@ -24,21 +27,28 @@ class UserViewSet(viewsets.ModelViewSet):
     )
     def delete_user(self, request, pk=None):
         """
-        Supprime un utilisateur, ainsi que tous
-        les projets et contributions associés
+        Supprime un utilisateur, ainsi que tous ses projets, issues,
+        commentaires et contributions, en arrière-plan par lots
+        (voir api_user.deletion). Le compte est désactivé tout de
+        suite ; la réponse 202 donne le lien de suivi
         """
-        user = self.get_object()
-
-        # Supprimer les projets où l'utilisateur est l'auteur
-        Project.objects.filter(author_id=user).delete()
-
-        # Supprimer les contributions de l'utilisateur
-        Contributor.objects.filter(user_id=user).delete()
-
-        # Supprimer l'utilisateur lui-même
-        user.delete()
-
+        job = enqueue_deletion(self.get_object())
+        data = DeletionJobSerializer(job, context={'request': request}).data
         return Response(
-            {'status': 'Utilisateur supprimé'},
-            status=status.HTTP_204_NO_CONTENT
+            data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': data['status_url']}
         )
+
+
+class DeletionJobViewSet(
+    InstrumentedViewMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
+    """
+    Suivi d'une suppression d'utilisateur. Le jeton de l'utilisateur
+    supprimé n'est plus valide : l'UUID du job suffit pour le lire
+    """
+    queryset = DeletionJob.objects.all()
+    serializer_class = DeletionJobSerializer
+    authentication_classes = []
+    permission_classes = [AllowAny]
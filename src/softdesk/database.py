@@ -0,0 +1,108 @@
+"""
+Configuration de la base de données à partir des variables
+d'environnement.
+
+- DB_ENGINE : 'sqlite' (par défaut) ou 'postgresql'
+- DB_NAME : chemin du fichier SQLite, ou nom de la base PostgreSQL
+- SQLite : DB_SQLITE_TUNING=0 revient au réglage par défaut de Django
+  (écritures différées), DB_SQLITE_TIMEOUT (s) ; DB_SQLITE_WAL=1
+  active le mode WAL, qui modifie le fichier de la base (voir
+  SQLITE_INIT_COMMAND)
+- PostgreSQL : DB_USER, DB_PASSWORD, DB_HOST, DB_PORT ;
+  DB_POOL=1 active le pool de connexions de psycopg 3
+  (DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT),
+  sinon les connexions sont persistantes (DB_CONN_MAX_AGE, en s)
+- DB_REPLICAS : répliques en lecture, séparées par des virgules
+  (chemins de fichiers SQLite, ou hôtes PostgreSQL)
+"""
+
+# WAL : les lecteurs ne bloquent plus l'écrivain (et inversement).
+# synchronous=NORMAL ne synchronise le disque qu'aux checkpoints, ce
+# qui reste sûr en WAL (au pire, perte des dernières transactions
+# en cas de coupure de courant, jamais de corruption).
+# Sur demande seulement (DB_SQLITE_WAL=1) : le mode est enregistré
+# dans le fichier de la base, et crée à côté les fichiers -wal / -shm
+SQLITE_INIT_COMMAND = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+)
+
+
+def _flag(environ, name, default):
+    return environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_config(environ, base_dir):
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('DB_NAME', base_dir / 'db.sqlite3'),
+    }
+    options = {}
+    if _flag(environ, 'DB_SQLITE_WAL', '0'):
+        options['init_command'] = SQLITE_INIT_COMMAND
+    if _flag(environ, 'DB_SQLITE_TUNING', '1'):
+        options.update({
+            # Attente (s) du verrou d'écriture avant "database is locked"
+            'timeout': int(environ.get('DB_SQLITE_TIMEOUT', 20)),
+            # Verrou d'écriture pris au début de la transaction : évite
+            # l'échec immédiat d'une transaction qui passe de la
+            # lecture à l'écriture pendant qu'une autre écrit
+            'transaction_mode': 'IMMEDIATE',
+        })
+    if options:
+        config['OPTIONS'] = options
+    return config
+
+
+def postgresql_config(environ):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'softdesk'),
+        'USER': environ.get('DB_USER', 'softdesk'),
+        'PASSWORD': environ.get('DB_PASSWORD', ''),
+        'HOST': environ.get('DB_HOST', 'localhost'),
+        'PORT': environ.get('DB_PORT', '5432'),
+        # Vérifie une connexion réutilisée avant la requête suivante
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if _flag(environ, 'DB_POOL', '0'):
+        # Le pool et CONN_MAX_AGE sont incompatibles
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS'] = {
+            'pool': {
+                'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(environ.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+    else:
+        config['CONN_MAX_AGE'] = int(environ.get('DB_CONN_MAX_AGE', 60))
+    return config
+
+
+def database_config(environ, base_dir):
+    engine = environ.get('DB_ENGINE', 'sqlite')
+    if engine == 'postgresql':
+        return postgresql_config(environ)
+    if engine == 'sqlite':
+        return sqlite_config(environ, base_dir)
+    raise ValueError(f'DB_ENGINE inconnu : {engine}')
+
+
+def replica_configs(environ, primary):
+    """
+    Bases 'replica1', 'replica2'... : mêmes réglages que la base
+    principale, sur un autre fichier (SQLite) ou un autre hôte
+    """
+    replicas = {}
+    names = environ.get('DB_REPLICAS', '').split(',')
+    for index, name in enumerate(filter(None, names), start=1):
+        config = dict(primary)
+        if primary['ENGINE'].endswith('sqlite3'):
+            config['NAME'] = name
+        else:
+            config['HOST'] = name
+        # En test, la réplique pointe sur la base de test principale
+        config['TEST'] = {'MIRROR': 'default'}
+        replicas[f'replica{index}'] = config
+    return replicas
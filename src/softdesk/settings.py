@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
+from .database import database_config, replica_configs
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,11 +48,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En premier : mesure aussi le temps des autres middlewares
+    'api.instrumentation.PerformanceMiddleware',
+    # Juste après : les tailles mesurées sont celles envoyées
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.replicas.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,12 +86,21 @@ WSGI_APPLICATION = 'softdesk.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite par défaut ; PostgreSQL avec DB_ENGINE=postgresql
+# (voir softdesk/database.py pour les variables disponibles)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(os.environ, BASE_DIR),
 }
+DATABASES.update(replica_configs(os.environ, DATABASES['default']))
+
+# Lectures des vues marquées `replica_reads` sur les répliques
+# (voir api/replicas.py). Après une écriture, les lectures de
+# l'utilisateur restent REPLICA_STICKY_SECONDS secondes sur la base
+# principale, le temps que les répliques rattrapent leur retard
+# (cookie signé, et cache s'il est partagé)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 5
 
 
 # Password validation
@@ -130,15 +146,119 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT sans lecture de l'utilisateur en base, seulement avec un
+        # cache partagé (CACHE_REDIS_URL, voir CACHES) ; avec le cache
+        # local par défaut, l'utilisateur est lu à chaque requête comme
+        # avec JWTAuthentication (voir api.authentication)
+        'api.authentication.StatelessJWTAuthentication',
     ],
     'PAGE_SIZE': 10,
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberPagination',
+    # JSON encodé par orjson s'il est installé (voir api.renderers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    # Jetons révoqués par un changement de mot de passe
+    "CHECK_REVOKE_TOKEN": True,
+    "TOKEN_OBTAIN_SERIALIZER": "api.authentication.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.authentication.TokenRefreshSerializer",
 }
 
 AUTH_USER_MODEL  = 'api_user.User'
+
+# Cache Django (version des comptes, appartenances, réponses des
+# projets). Par défaut, cache local à chaque processus : les jetons
+# sont alors vérifiés en base à chaque requête et les appartenances
+# ne sont pas mises en cache (aucun gain de StatelessJWTAuthentication
+# ni de MEMBERSHIP_CACHE_TIMEOUT). Profil de production, partagé entre
+# les processus : CACHE_REDIS_URL=redis://localhost:6379/0 (paquet
+# redis)
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Le cache par défaut est-il vu par tous les processus ? None : déduit
+# du backend (Redis, Memcached, base). Sans cache partagé, les jetons
+# sont vérifiés en base à chaque requête (voir api.caches)
+SHARED_CACHE = None
+
+# Cache des réponses détail / résumé des projets : durée de vie (s)
+# et taille maximale d'une entrée (octets)
+RESPONSE_CACHE_TIMEOUT = 600
+RESPONSE_CACHE_MAX_ENTRY_SIZE = 256 * 1024
+
+# Synchronisation incrémentale (/api/changes/) : nombre maximum de
+# changements par réponse
+SYNC_PAGE_SIZE = 500
+
+# Durée (en secondes) du cache des appartenances aux projets.
+# None ou 0 désactive le cache entre les requêtes. Ignorée sans cache
+# partagé (un contributeur retiré garderait son accès dans les autres
+# processus) : 300 avec le profil Redis.
+MEMBERSHIP_CACHE_TIMEOUT = 300 if CACHE_REDIS_URL else 0
+
+# Import d'issues en masse : taille des lots d'écriture par défaut
+# (modifiable avec ?batch_size=) et nombre maximum d'issues par requête
+BULK_BATCH_SIZE = 500
+BULK_MAX_ITEMS = 50000
+
+# Flux d'événements (/api/events/) : diffusion en mémoire dans le
+# processus, ou 'api.events.ChangeLogBroker' pour lire le journal des
+# changements (plusieurs workers). File bornée par connexion, au-delà
+# de laquelle le client doit se resynchroniser, et intervalles (s)
+# entre deux messages keepalive et deux lectures du journal
+EVENT_BROKER = 'api.events.InProcessBroker'
+EVENT_QUEUE_SIZE = 1000
+EVENT_HEARTBEAT_SECONDS = 15
+EVENT_POLL_INTERVAL = 1
+
+# Lectures asynchrones (/api/async/, voir api/async_views.py) :
+# désactivées (404) tant qu'un test de charge (bench_async_reads) ne
+# montre pas un meilleur débit qu'en synchrone
+ASYNC_READ_VIEWS = False
+
+# Mesures de performance (voir api/instrumentation.py) : en-tête
+# Server-Timing, seuil de requêtes SQL au-delà duquel une requête est
+# signalée (N+1 probable, None pour désactiver) et jeton d'accès à
+# /api/metrics/ (endpoint désactivé sans jeton)
+PERF_SERVER_TIMING = True
+PERF_QUERY_THRESHOLD = 30
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN')
+
+# Suppression d'un utilisateur en arrière-plan (voir api_user/deletion.py) :
+# lignes supprimées par lot (une transaction par lot), bail (s) d'un
+# worker sur un job, et exécution dans un thread du serveur après la
+# requête. Sans thread, lancer `python manage.py process_deletion_jobs`
+DELETION_CHUNK_SIZE = 1000
+DELETION_LEASE_SECONDS = 60
+DELETION_JOB_THREAD = True
+
+# Listes d'issues et de commentaires lues avec values() plutôt que par
+# les serializers, pour les réponses JSON (voir api/fast_list.py)
+FAST_LIST_RESPONSES = True
+
+# Compression des réponses (voir api/compression.py) : encodages par
+# ordre de préférence ('br' seulement si le paquet brotli est
+# installé), taille minimale (octets) d'une réponse compressée et
+# niveaux de compression
+COMPRESSION_ENCODINGS = ['br', 'gzip']
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5